@@ -1 +1,2 @@
+python -m service.worker &
 streamlit run ui/app.py --server.headless true --server.port 8503 --server.address 0.0.0.0
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import json
+import zlib
+import base64
+import contextvars
+from typing import Any, Dict, List, Tuple, Union
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.redis import RedisSaver
+from langgraph.checkpoint.redis.aio import AsyncRedisSaver
+from langgraph.checkpoint.redis.base import BaseRedisSaver
+from langgraph.checkpoint.redis.jsonplus_redis import JsonPlusRedisSerializer
+from langgraph.checkpoint.redis.util import to_storage_safe_id, to_storage_safe_str
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd")
+CHECKPOINT_COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "256"))
+
+ENCODINGS = ("raw", "zlib", "zstd")
+
+# Size of the checkpoint document being written, picked up by the blob dump of the same put
+_checkpoint_document_bytes = contextvars.ContextVar("checkpoint_document_bytes", default=0)
+
+
+class CompactSerializer(JsonPlusRedisSerializer):
+    """
+    Serializer for checkpoint blobs and task writes: msgpack, compressed with zstd (zlib when
+    zstandard is not installed) above min_bytes, then base64 since the Redis savers keep blobs in JSON
+    documents. The type tag records the encoding, e.g. "zstd_msgpack". Values written with the plain
+    json/base64 types of older checkpoints still load.
+    """
+
+    def __init__(self, compression: str = CHECKPOINT_COMPRESSION, level: int = CHECKPOINT_COMPRESSION_LEVEL, min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES):
+        super().__init__()
+        if compression == "zstd" and zstandard is None:
+            logger.warning("⚠️ zstandard is not installed, compressing checkpoints with zlib")
+            compression = "zlib"
+        self.compression = compression if compression in ENCODINGS else "raw"
+        self.level = level
+        self.min_bytes = min_bytes
+
+    def compress(self, data: bytes) -> Tuple[str, bytes]:
+        if self.compression == "raw" or len(data) < self.min_bytes:
+            return "raw", data
+        if self.compression == "zstd":
+            return "zstd", zstandard.compress(data, self.level)
+        return "zlib", zlib.compress(data, min(self.level, 9))
+
+    def dumps_sized(self, obj: Any) -> Tuple[str, str, int]:
+        # msgpack from the base serializer, not the JSON strings the Redis serializer writes
+        type_, data = JsonPlusSerializer.dumps_typed(self, obj)
+        encoding, encoded = self.compress(data)
+        return f"{encoding}_{type_}", base64.b64encode(encoded).decode("ascii"), len(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, str]:
+        type_, blob, _ = self.dumps_sized(obj)
+        return type_, blob
+
+    def loads_typed(self, data: Tuple[str, Union[str, bytes]]) -> Any:
+        type_, blob = data
+        encoding, _, inner_type = type_.partition("_")
+        if encoding not in ENCODINGS or not inner_type:
+            return super().loads_typed(data)
+
+        encoded = base64.b64decode(blob if isinstance(blob, bytes) else blob.encode("ascii"))
+        if encoding == "zstd":
+            if zstandard is None:
+                raise ValueError("This checkpoint is zstd-compressed, install zstandard to read it")
+            encoded = zstandard.decompress(encoded)
+        elif encoding == "zlib":
+            encoded = zlib.decompress(encoded)
+        return JsonPlusSerializer.loads_typed(self, (inner_type, encoded))
+
+
+class CompactCheckpointMixin:
+    """
+    Storage changes shared by the sync and async Redis savers:
+    - The checkpoint document no longer repeats every channel value inline. Reads rebuild the values
+      from the per-version blobs anyway, so only channels that changed in a step are written again.
+    - Blobs are encoded once with the compact serializer, and the stored size of each checkpoint is logged.
+    Both methods override private helpers of langgraph-checkpoint-redis 0.0.x, which is why pyproject pins that series.
+    """
+
+    def _dump_checkpoint(self, checkpoint) -> Dict[str, Any]:
+        checkpoint_data = json.loads(self.serde.dumps({**checkpoint, "channel_values": {}}))
+        document = {"type": "json", **checkpoint_data, "pending_sends": []}
+        _checkpoint_document_bytes.set(len(json.dumps(document)))
+        return document
+
+    def _dump_blobs(self, thread_id: str, checkpoint_ns: str, values: Dict[str, Any], versions) -> List[Tuple[str, Dict[str, Any]]]:
+        if not versions:
+            return []
+
+        storage_safe_thread_id = to_storage_safe_id(thread_id)
+        storage_safe_checkpoint_ns = to_storage_safe_str(checkpoint_ns)
+
+        blobs = []
+        raw_bytes = 0
+        stored_bytes = 0
+        for channel, version in versions.items():
+            if channel in values:
+                type_, blob, raw_size = self.serde.dumps_sized(values[channel])
+                raw_bytes += raw_size
+                stored_bytes += len(blob)
+            else:
+                type_, blob = "empty", None
+            key = BaseRedisSaver._make_redis_checkpoint_blob_key(storage_safe_thread_id, storage_safe_checkpoint_ns, channel, str(version))
+            blobs.append((key, {
+                "thread_id": storage_safe_thread_id,
+                "checkpoint_ns": storage_safe_checkpoint_ns,
+                "channel": channel,
+                "version": str(version),
+                "type": type_,
+                "blob": blob,
+            }))
+
+        document_bytes = _checkpoint_document_bytes.get()
+        logger.info(
+            f"💾 Checkpoint for thread {thread_id}: {(document_bytes + stored_bytes) / 1024:.1f} KB stored "
+            f"({document_bytes / 1024:.1f} KB document + {stored_bytes / 1024:.1f} KB for {len(blobs)} changed fields, "
+            f"{raw_bytes / 1024:.1f} KB msgpack before {self.serde.compression} compression)"
+        )
+        return blobs
+
+
+class CompactRedisSaver(CompactCheckpointMixin, RedisSaver):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.serde = CompactSerializer()
+
+
+class CompactAsyncRedisSaver(CompactCheckpointMixin, AsyncRedisSaver):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.serde = CompactSerializer()
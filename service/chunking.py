@@ -0,0 +1,216 @@
+import io
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+from service.retrieval import tokenize
+
+import dotenv
+dotenv.load_dotenv()
+
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", "200"))
+CHUNKING_MIN_CHARS = int(os.getenv("CHUNKING_MIN_CHARS", "50000"))
+CHUNKING_MIN_KEEP_RATIO = float(os.getenv("CHUNKING_MIN_KEEP_RATIO", "0.1"))
+
+CHUNK_CACHE_ENTRIES = 8
+
+ROW_PATTERN = re.compile(r"^Row (\d+),")
+
+
+class TableChunk(BaseModel):
+    sheet: str = Field(description="The sheet the rows belong to, empty for CSV files", default="")
+    header: str = Field(description="The numbered header row of the table", default="")
+    start_row: int = Field(description="The first row number in the chunk", default=0)
+    end_row: int = Field(description="The last row number in the chunk", default=0)
+    rows: List[str] = Field(description="The numbered rows in the chunk", default=[])
+    tokens: FrozenSet[str] = Field(description="The search tokens found in the chunk rows", default=frozenset())
+
+
+def split_row(row: str) -> Tuple[str, List[str]]:
+    label, _, cells = row.partition(",")
+    return label, cells.split(",")
+
+
+def iter_lines(content: str) -> Iterator[str]:
+    for line in io.StringIO(content):
+        yield line.rstrip("\n")
+
+
+# Chunks of recently chunked tables, keyed by content hash so the cache never holds the table text itself
+_chunk_cache: "OrderedDict[Tuple[str, int], Optional[Tuple[TableChunk, ...]]]" = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+
+def chunk_table_content(content: str, rows_per_chunk: int = CHUNK_ROWS) -> Optional[Tuple[TableChunk, ...]]:
+    # Every task mapped to a table chunks it again, so the last few results are kept
+    key = (hashlib.sha256(content.encode("utf-8")).hexdigest(), rows_per_chunk)
+    with _chunk_cache_lock:
+        if key in _chunk_cache:
+            _chunk_cache.move_to_end(key)
+            return _chunk_cache[key]
+
+    chunks = chunk_table_rows(iter_lines(content), rows_per_chunk)
+    with _chunk_cache_lock:
+        _chunk_cache[key] = chunks
+        while len(_chunk_cache) > CHUNK_CACHE_ENTRIES:
+            _chunk_cache.popitem(last=False)
+    return chunks
+
+
+def chunk_table_rows(lines: Iterable[str], rows_per_chunk: int = CHUNK_ROWS) -> Optional[Tuple[TableChunk, ...]]:
+    """
+    Split parsed CSV/Excel rows into row-range chunks that carry their sheet and header row.
+    Lines are consumed incrementally, so a row generator such as iter_csv_rows can be passed directly.
+    Returns None when the content is not made only of numbered table rows.
+    """
+    chunks = []
+    sheet = ""
+    header = ""
+    pending = []
+
+    def flush():
+        if pending:
+            chunks.append(TableChunk(
+                sheet=sheet,
+                header=header,
+                start_row=int(ROW_PATTERN.match(pending[0]).group(1)),
+                end_row=int(ROW_PATTERN.match(pending[-1]).group(1)),
+                rows=list(pending),
+                tokens=frozenset(tokenize("\n".join(pending))),
+            ))
+            pending.clear()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.startswith("Sheet: "):
+            flush()
+            sheet = line[len("Sheet: "):]
+            header = ""
+            continue
+
+        match = ROW_PATTERN.match(line)
+        if match is None:
+            return None
+        if not header:
+            header = line
+            continue
+
+        pending.append(line)
+        if len(pending) >= rows_per_chunk:
+            flush()
+
+    flush()
+    return tuple(chunks) if chunks else None
+
+
+def project_row(row: str, columns: List[int]) -> str:
+    label, cells = split_row(row)
+    return ",".join([label] + [cells[i] if i < len(cells) else "" for i in columns])
+
+
+def row_ranges(chunks: List[TableChunk]) -> str:
+    # Contiguous chunks of the same table are merged into one range
+    ranges = []
+    for chunk in chunks:
+        if ranges and ranges[-1][0] == chunk.sheet and ranges[-1][2] + 1 == chunk.start_row:
+            ranges[-1][2] = chunk.end_row
+        else:
+            ranges.append([chunk.sheet, chunk.start_row, chunk.end_row])
+    return ", ".join((f"sheet {sheet} " if sheet else "") + f"rows {start}-{end}" for sheet, start, end in ranges)
+
+
+def omitted_rows_note(chunks: Tuple[TableChunk, ...], selected: List[TableChunk], terms: set) -> str:
+    selected_ids = {id(chunk) for chunk in selected}
+    omitted = [chunk for chunk in chunks if id(chunk) not in selected_ids]
+    kept_rows = sum(len(chunk.rows) for chunk in selected)
+    omitted_rows = sum(len(chunk.rows) for chunk in omitted)
+    return (
+        f"[Note: this table is incomplete. Only the row ranges containing {', '.join(sorted(terms))} are included "
+        f"({kept_rows} of {kept_rows + omitted_rows} data rows). Omitted: {row_ranges(omitted)} ({omitted_rows} rows).]"
+    )
+
+
+def omitted_columns_note(projections: Dict[tuple, Optional[List[int]]]) -> str:
+    tables = []
+    for (sheet, header), columns in projections.items():
+        label, cells = split_row(header)
+        if columns is None:
+            tables.append((f"sheet {sheet}: " if sheet else "") + "omitted entirely")
+            continue
+        omitted = [cell for i, cell in enumerate(cells) if i not in columns]
+        if omitted:
+            tables.append((f"sheet {sheet}: " if sheet else "") + "omitted columns " + ", ".join(omitted))
+    if not tables:
+        return ""
+    return f"[Note: this table is incomplete. Only the columns named in the task or read by its checks are included; {'; '.join(tables)}.]"
+
+
+def select_relevant_rows(task: str, content: str, fits_budget: bool = False, check_columns: Optional[Callable[[List[str]], List[str]]] = None) -> Optional[str]:
+    """
+    Render only the chunks of a large table that match the task, keeping the header and the original row numbers.
+    Chunks are filtered by task terms that appear in the rows; if none do and the table does not fit the input budget, the
+    columns named in the task, plus the columns check_columns picks from the header, are projected instead.
+    A note at the top lists what was left out. When the filter would keep less than CHUNKING_MIN_KEEP_RATIO of the rows,
+    the rows are not filtered, since a verdict over so few rows is unlikely to hold for the whole table.
+    """
+    if len(content) < CHUNKING_MIN_CHARS:
+        return None
+
+    chunks = chunk_table_content(content)
+    if not chunks:
+        return None
+
+    task_terms = set(tokenize(task))
+    # Terms found in most chunks cannot narrow the rows down, so only rarer ones act as filters
+    discriminative_terms = {term for term in task_terms if sum(term in chunk.tokens for chunk in chunks) <= len(chunks) // 2}
+    selected = []
+    matched_terms = set()
+    projections = {}
+    for chunk in chunks:
+        _, header_cells = split_row(chunk.header)
+        column_tokens = [set(tokenize(cell)) for cell in header_cells]
+        header_terms = set().union(*column_tokens) if column_tokens else set()
+        filter_terms = (task_terms - header_terms) & discriminative_terms
+
+        if filter_terms & chunk.tokens:
+            selected.append(chunk)
+            matched_terms |= filter_terms & chunk.tokens
+        if (chunk.sheet, chunk.header) not in projections:
+            checked = set(check_columns(header_cells)) if check_columns else set()
+            matched = [i for i, (cell, tokens) in enumerate(zip(header_cells, column_tokens)) if tokens & task_terms or cell in checked]
+            projections[(chunk.sheet, chunk.header)] = ([0] + [i for i in matched if i != 0]) if matched else None
+
+    total_rows = sum(len(chunk.rows) for chunk in chunks)
+    if selected and sum(len(chunk.rows) for chunk in selected) >= CHUNKING_MIN_KEEP_RATIO * total_rows:
+        return omitted_rows_note(chunks, selected, matched_terms) + "\n" + render_chunks(selected)
+
+    # Dropping columns can hide what the model needs to judge a row, so it is only done when the table would not fit otherwise
+    if not fits_budget and any(columns is not None for columns in projections.values()):
+        rendered = []
+        for chunk in chunks:
+            columns = projections.get((chunk.sheet, chunk.header))
+            if columns is None:
+                continue
+            rendered.append(chunk.model_copy(update={
+                "header": project_row(chunk.header, columns),
+                "rows": [project_row(row, columns) for row in chunk.rows],
+            }))
+        return omitted_columns_note(projections) + "\n" + render_chunks(rendered)
+
+    return None
+
+
+def render_chunks(chunks: List[TableChunk]) -> str:
+    blocks = []
+    current_table = None
+    for chunk in chunks:
+        if (chunk.sheet, chunk.header) != current_table:
+            current_table = (chunk.sheet, chunk.header)
+            blocks.append((f"Sheet: {chunk.sheet}\n" if chunk.sheet else "") + chunk.header)
+        blocks.append(f"[Rows {chunk.start_row}-{chunk.end_row}]\n" + "\n".join(chunk.rows))
+    return "\n".join(blocks)
@@ -0,0 +1,139 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from redis import Redis
+from service.logger import logger
+from service.storage import STORAGE_BACKEND
+
+import dotenv
+dotenv.load_dotenv()
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "cache/documents")
+DOCUMENT_STORE_TTL_SECONDS = int(os.getenv("DOCUMENT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+DOCUMENT_STORE_MEMORY_CHARS = int(os.getenv("DOCUMENT_STORE_MEMORY_CHARS", str(64 * 1024 * 1024)))
+
+EVICT_INTERVAL_SECONDS = 3600
+
+
+class DocumentStore:
+    """
+    Content-addressed store of parsed document text, keyed by the sha256 of the text. Graph state
+    only carries these IDs, and the text is loaded when a node needs it. With a Redis client the
+    documents are also kept in Redis, so workers on other hosts can load them.
+    Documents not read for ttl_seconds are removed.
+    """
+
+    def __init__(self, store_dir: str, ttl_seconds: int, memory_chars: int, redis_client: Optional[Redis] = None):
+        self.store_dir = store_dir
+        self.ttl_seconds = ttl_seconds
+        self.memory_chars = memory_chars
+        self.redis = redis_client
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.store_dir, doc_id[:2], f"{doc_id}.txt")
+
+    def _key(self, doc_id: str) -> str:
+        return f"audit:docs:{doc_id}"
+
+    def _remember(self, doc_id: str, content: str):
+        # Bounded by total characters rather than entries, since a few large spreadsheets can outweigh hundreds of memos
+        if len(content) > self.memory_chars:
+            return
+        with self._lock:
+            if doc_id in self._memory:
+                self._memory.move_to_end(doc_id)
+                return
+            self._memory[doc_id] = content
+            self._memory_size += len(content)
+            while self._memory_size > self.memory_chars:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _write(self, doc_id: str, content: str):
+        path = self._path(doc_id)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def put(self, content: str) -> str:
+        doc_id = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self._write(doc_id, content)
+        if self.redis is not None:
+            self.redis.set(self._key(doc_id), content.encode("utf-8"), ex=self.ttl_seconds)
+        self._remember(doc_id, content)
+        self.evict_expired()
+        return doc_id
+
+    def get(self, doc_id: str) -> str:
+        if not doc_id:
+            return ""
+
+        with self._lock:
+            if doc_id in self._memory:
+                self._memory.move_to_end(doc_id)
+                return self._memory[doc_id]
+
+        path = self._path(doc_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            # Bump the mtime so expiry treats this document as recently used
+            os.utime(path)
+        except OSError:
+            content = None
+
+        if content is None and self.redis is not None:
+            with self.redis.pipeline() as pipe:
+                pipe.get(self._key(doc_id))
+                pipe.expire(self._key(doc_id), self.ttl_seconds)
+                data, _ = pipe.execute()
+            if data is not None:
+                content = data.decode("utf-8")
+                self._write(doc_id, content)
+
+        if content is None:
+            raise KeyError(f"Document {doc_id} is not in the document store")
+
+        self._remember(doc_id, content)
+        return content
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_evict < EVICT_INTERVAL_SECONDS:
+                return
+            self._last_evict = now
+
+        removed = 0
+        for root, _, files in os.walk(self.store_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    if now - os.stat(path).st_mtime > self.ttl_seconds:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logger.info(f"🧹 Removed {removed} expired documents from {self.store_dir}")
+
+
+def build_document_store() -> DocumentStore:
+    redis_client = Redis.from_url(os.getenv("REDIS_URI")) if STORAGE_BACKEND == "redis" else None
+    return DocumentStore(DOCUMENT_STORE_DIR, DOCUMENT_STORE_TTL_SECONDS, DOCUMENT_STORE_MEMORY_CHARS, redis_client)
+
+
+document_store = build_document_store()
@@ -0,0 +1,23 @@
+import re
+from typing import List
+
+TABLE_HEADER_PATTERN = re.compile(r'^(?:Sheet: (?P<sheet>.*)\n)?Row 1,(?P<header>.*)$', re.MULTILINE)
+
+
+def detect_table_schemas(content: str, max_tables: int = 10) -> List[str]:
+    # Parsed CSV and Excel files always start each table with its header as "Row 1"
+    schemas = []
+    for match in TABLE_HEADER_PATTERN.finditer(content):
+        columns = ", ".join(cell for cell in match.group("header").split(",") if cell)
+        sheet = match.group("sheet")
+        schemas.append(f"Sheet {sheet}: {columns}" if sheet else columns)
+        if len(schemas) >= max_tables:
+            break
+    return schemas
+
+
+def content_sample(content: str, max_chars: int) -> str:
+    if len(content) <= max_chars:
+        return content
+    cut = content.rfind("\n", 0, max_chars)
+    return content[:cut if cut > 0 else max_chars]
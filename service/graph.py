@@ -1,51 +1,134 @@
 import time
 import os
-from typing import List
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+from redis import ConnectionPool, Redis
+from redis.asyncio import ConnectionPool as AsyncConnectionPool, Redis as AsyncRedis
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.redis import RedisSaver
 from service.states import State
 from service.logger import logger
+from service.progress import ProgressTracker
+from service.checkpoints import CompactRedisSaver, CompactAsyncRedisSaver
 from service.nodes import (
+    file_parser,
+    relevance_gate,
+    dispatch_files,
     metadata_extractor, 
     tasks_parser, 
     document_to_task_mapper, 
     execution_agent, 
     reporter, 
     relevance_to_SOX_and_financial_standards,
-    is_relevant
+    dispatch_tasks,
+    rule_engine,
+    arelevance_to_SOX_and_financial_standards,
+    afile_parser,
+    ametadata_extractor,
+    atasks_parser,
+    adocument_to_task_mapper,
+    arule_engine,
+    aexecution_agent,
+    areporter,
 )
 
+EXECUTION_MAX_CONCURRENCY = int(os.getenv("EXECUTION_MAX_CONCURRENCY", "8"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_RETRY_SECONDS = int(os.getenv("REDIS_RETRY_SECONDS", "60"))
 
-def build_graph():
-    logger.info("🏗️ Building LangGraph architecture...")
+_graph = None
+_redis_client = None
+_last_connect_attempt = 0.0
+_graph_lock = threading.Lock()
+
+# Async Redis clients and the async Redis saver are bound to the event loop that created them
+_async_graph = None
+_async_redis_client = None
+_async_graph_loop = None
+_async_graph_lock = None
+_async_last_connect_attempt = 0.0
+
+
+def create_checkpointer():
+    redis_uri = os.getenv("REDIS_URI")
+    if not redis_uri:
+        raise ValueError("REDIS_URI is not set")
+
+    pool = ConnectionPool.from_url(
+        redis_uri,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        socket_keepalive=True,
+    )
+    redis_client = Redis(connection_pool=pool)
+    try:
+        redis_client.ping()
+        checkpointer = CompactRedisSaver(redis_client=redis_client)
+        checkpointer.setup()
+    except Exception:
+        pool.disconnect()
+        raise
+    logger.info(f"🧰 Redis checkpointer connected (pool size: {REDIS_MAX_CONNECTIONS})")
+    return checkpointer, redis_client
+
+
+async def acreate_checkpointer():
+    redis_uri = os.getenv("REDIS_URI")
+    if not redis_uri:
+        raise ValueError("REDIS_URI is not set")
+
+    pool = AsyncConnectionPool.from_url(
+        redis_uri,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        socket_keepalive=True,
+    )
+    redis_client = AsyncRedis(connection_pool=pool)
+    try:
+        await redis_client.ping()
+        checkpointer = CompactAsyncRedisSaver(redis_client=redis_client)
+        await checkpointer.asetup()
+    except Exception:
+        await pool.disconnect()
+        raise
+    logger.info(f"🧰 Async Redis checkpointer connected (pool size: {REDIS_MAX_CONNECTIONS})")
+    return checkpointer, redis_client
+
+
+def build_graph(checkpointer=None, use_async: bool = False):
+    logger.info(f"🏗️ Building LangGraph architecture{' (async nodes)' if use_async else ''}...")
     
     try:
         builder = StateGraph(State)
-        builder.add_node("relevance_to_sox_and_financial_standards", relevance_to_SOX_and_financial_standards)
-        builder.add_node("metadata_extractor", metadata_extractor)
-        builder.add_node("tasks_parser", tasks_parser)
-        builder.add_node("document_to_task_mapper", document_to_task_mapper)
-        builder.add_node("execution_agent", execution_agent)
-        builder.add_node("reporter", reporter)
+        builder.add_node("relevance_to_sox_and_financial_standards", arelevance_to_SOX_and_financial_standards if use_async else relevance_to_SOX_and_financial_standards)
+        builder.add_node("file_parser", afile_parser if use_async else file_parser)
+        builder.add_node("metadata_extractor", ametadata_extractor if use_async else metadata_extractor)
+        builder.add_node("tasks_parser", atasks_parser if use_async else tasks_parser)
+        builder.add_node("relevance_gate", relevance_gate)
+        builder.add_node("document_to_task_mapper", adocument_to_task_mapper if use_async else document_to_task_mapper)
+        builder.add_node("rule_engine", arule_engine if use_async else rule_engine)
+        builder.add_node("execution_agent", aexecution_agent if use_async else execution_agent)
+        builder.add_node("reporter", areporter if use_async else reporter)
 
+        # Files are parsed speculatively next to the relevance check and task parsing, and the gate waits for all three;
+        # metadata extraction only starts once the audit is known to be relevant
         builder.add_edge(START, "relevance_to_sox_and_financial_standards")
-        builder.add_conditional_edges("relevance_to_sox_and_financial_standards", is_relevant, {"stop": "reporter", "continue": "metadata_extractor"})
-        builder.add_edge("metadata_extractor", "tasks_parser")
-        builder.add_edge("tasks_parser", "document_to_task_mapper")
-        builder.add_edge("document_to_task_mapper", "execution_agent")
+        builder.add_edge(START, "tasks_parser")
+        builder.add_edge(START, "file_parser")
+        builder.add_edge(["relevance_to_sox_and_financial_standards", "tasks_parser", "file_parser"], "relevance_gate")
+        builder.add_conditional_edges("relevance_gate", dispatch_files, ["metadata_extractor", "document_to_task_mapper", "reporter"])
+        builder.add_edge("metadata_extractor", "document_to_task_mapper")
+        builder.add_edge("document_to_task_mapper", "rule_engine")
+        builder.add_conditional_edges("rule_engine", dispatch_tasks, ["execution_agent", "reporter"])
         builder.add_edge("execution_agent", "reporter")
         builder.add_edge("reporter", END)
 
         logger.info("🔗 Graph edges configured successfully")
 
-        
-        
-        try:
-            with RedisSaver.from_conn_string(os.getenv("REDIS_URI")) as checkpointer:
-                checkpointer.setup()
-                graph = builder.compile(checkpointer=checkpointer)
-        except Exception as e:
-            logger.warning(f"⚠️ Redis not available, running without checkpointing: {e}")
+        if checkpointer is not None:
+            graph = builder.compile(checkpointer=checkpointer)
+        else:
             graph = builder.compile()
             logger.info("✅ Graph compiled without checkpointing")
         
@@ -56,76 +139,450 @@ def build_graph():
         logger.error(f"❌ Error building graph: {str(e)}")
         raise
 
+
+def redis_healthy() -> bool:
+    if _redis_client is None:
+        return False
+    try:
+        return bool(_redis_client.ping())
+    except Exception as e:
+        logger.warning(f"⚠️ Redis health check failed: {e}")
+        return False
+
+
 def compile_graph():
-    graph = build_graph()
-    return graph
+    """
+    Return the process-wide compiled graph, building it on first use. The graph is rebuilt with a fresh
+    Redis pool when the health check fails, and a graph running without checkpointing retries Redis
+    every REDIS_RETRY_SECONDS.
+    """
+    global _graph, _redis_client, _last_connect_attempt
+
+    with _graph_lock:
+        if _graph is not None:
+            if _redis_client is not None and redis_healthy():
+                return _graph
+            if _redis_client is None and time.time() - _last_connect_attempt < REDIS_RETRY_SECONDS:
+                return _graph
+            logger.info("🔄 (Re)connecting the Redis checkpointer...")
+
+        _last_connect_attempt = time.time()
+        if _redis_client is not None:
+            # Runs still in flight hold the old graph and its pool, so only idle connections are closed;
+            # the pool reconnects lazily if those runs need it and is released with the old graph
+            try:
+                _redis_client.connection_pool.disconnect(inuse_connections=False)
+            except Exception:
+                pass
+            _redis_client = None
+
+        checkpointer = None
+        try:
+            checkpointer, _redis_client = create_checkpointer()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis not available, running without checkpointing: {e}")
+
+        _graph = build_graph(checkpointer)
+        return _graph
+
+
+async def aredis_healthy() -> bool:
+    if _async_redis_client is None:
+        return False
+    try:
+        return bool(await _async_redis_client.ping())
+    except Exception as e:
+        logger.warning(f"⚠️ Redis health check failed: {e}")
+        return False
+
+
+async def acompile_graph():
+    """
+    Async counterpart of compile_graph for the event loop it is awaited on. The graph uses the async
+    nodes and an AsyncRedisSaver; it is rebuilt when awaited from a different event loop.
+    """
+    global _async_graph, _async_redis_client, _async_graph_loop, _async_graph_lock, _async_last_connect_attempt
+
+    loop = asyncio.get_running_loop()
+    if _async_graph_loop is not loop:
+        # Clients from a previous loop cannot be reused or closed here, so they are simply dropped
+        _async_graph = None
+        _async_redis_client = None
+        _async_graph_loop = loop
+        _async_graph_lock = asyncio.Lock()
+        _async_last_connect_attempt = 0.0
+
+    async with _async_graph_lock:
+        if _async_graph is not None:
+            if _async_redis_client is not None and await aredis_healthy():
+                return _async_graph
+            if _async_redis_client is None and time.time() - _async_last_connect_attempt < REDIS_RETRY_SECONDS:
+                return _async_graph
+            logger.info("🔄 (Re)connecting the async Redis checkpointer...")
+
+        _async_last_connect_attempt = time.time()
+        if _async_redis_client is not None:
+            # As in compile_graph, in-flight runs keep the old pool; only its idle connections are closed
+            try:
+                await _async_redis_client.connection_pool.disconnect(inuse_connections=False)
+            except Exception:
+                pass
+            _async_redis_client = None
+
+        checkpointer = None
+        try:
+            checkpointer, _async_redis_client = await acreate_checkpointer()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis not available, running without checkpointing: {e}")
+
+        _async_graph = build_graph(checkpointer, use_async=True)
+        return _async_graph
+
+
+def initial_state_for(data_path: str, tasks: List[str]) -> State:
+    tasks_string = "\n".join(f"{i+1}. {task}" for i, task in enumerate(tasks))
+    logger.info(f"📋 Formatted tasks:\n{tasks_string}")
+
+    return State(
+        data_path=data_path,
+        tasks_raw=tasks_string
+    )
+
+
+def run_config(thread_id: str, callbacks: Optional[list] = None) -> dict:
+    config = {"configurable": {"thread_id": thread_id}, "max_concurrency": EXECUTION_MAX_CONCURRENCY}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+
+def format_response(result: dict, start_time: float) -> dict:
+    execution_time = time.time() - start_time
+    logger.info(f"⏱️ Graph execution completed in {execution_time:.2f} seconds")
+    
+    success = bool(result["reporter"] and len(result["execution_task_output"]) > 0)
+    logger.info(f"✅ Execution success: {success}")
+
+    if not result['relevance_to_sox_and_financial_standards'].is_relevant:
+        return {
+            "success": True,
+            "report": result['reporter'],
+            "execution_time": time.time() - start_time,
+            "documents_processed": None,
+            "tasks_count": None,
+            "execution_details": None,
+        }
+    
+    execution_details = []
+    for task_output in result["execution_task_output"]:
+        execution_details.append({
+            "task": task_output.task,
+            "output": task_output.output,
+            "status": task_output.pass_or_fail
+        })
+    
+    response = {
+        "success": success,
+        "report": result["reporter"],
+        "execution_details": execution_details,
+        "documents_processed": len(result["docs_content_with_metadata"]),
+        "tasks_count": len(result["tasks_parsed"].tasks) if result["tasks_parsed"] else 0,
+        "execution_time": execution_time
+    }
+    
+    logger.info("🎉 Audit execution completed successfully!")
+    return response
+
+
+def error_response(e: Exception, start_time: Optional[float]) -> dict:
+    logger.error(f"❌ Error during audit execution: {str(e)}")
+    return {
+        "success": False,
+        "error": str(e),
+        "execution_time": time.time() - start_time if start_time is not None else 0
+    }
+
+
+STREAM_MODES = ["updates", "custom", "values"]
+
+
+def resumable_state(graph, config: dict):
+    """
+    Return the checkpointed state values of an unfinished run on this thread, or None when there is
+    nothing to resume (no checkpointer, no checkpoint, or the run already reached the end).
+    """
+    try:
+        snapshot = graph.get_state(config)
+    except ValueError:
+        return None
+    return snapshot.values if snapshot.next else None
+
+
+async def aresumable_state(graph, config: dict):
+    try:
+        snapshot = await graph.aget_state(config)
+    except ValueError:
+        return None
+    return snapshot.values if snapshot.next else None
+
+
+def log_token_usage(tracker: ProgressTracker):
+    usage = tracker.token_usage()
+    if usage["input_tokens"]:
+        logger.info(
+            f"🔢 Model usage: {usage['input_tokens']} input tokens ({usage['cached_input_tokens']} cached, "
+            f"{usage['cached_input_tokens'] / usage['input_tokens']:.0%}), {usage['output_tokens']} output tokens"
+        )
+
+
+def graph_events(graph, graph_input, config: dict, tracker: ProgressTracker) -> Iterator[dict]:
+    for mode, chunk in graph.stream(graph_input, config=config, stream_mode=STREAM_MODES):
+        yield from tracker.events(mode, chunk)
+        token_event = tracker.token_event()
+        if token_event:
+            yield token_event
+
+
+async def agraph_events(graph, graph_input, config: dict, tracker: ProgressTracker) -> AsyncIterator[dict]:
+    async for mode, chunk in graph.astream(graph_input, config=config, stream_mode=STREAM_MODES):
+        for event in tracker.events(mode, chunk):
+            yield event
+        token_event = tracker.token_event()
+        if token_event:
+            yield token_event
+
+
+def stream(thread_id: str, data_path: str, tasks: List[str], resume: bool = False) -> Iterator[dict]:
+    """
+    Run the audit and yield progress events as they happen. With resume=True an unfinished run on
+    thread_id continues from its last checkpoint instead of starting over. Events:
+    - {"event": "progress", "stage", "current", "total", "item"} for parse, metadata, execution and report steps
+    - {"event": "node", "node"} when a graph node finishes
+    - {"event": "task_result", "task_index", "task", "status", "output", "file_name"} as each task completes
+    - {"event": "tokens", "input_tokens", "cached_input_tokens", "uncached_input_tokens", "output_tokens", "total_tokens"}
+      when model token usage grows; cached_input_tokens were served from the provider's prompt cache
+    - {"event": "result", "result"} once at the end, with the same payload invoke() returns
+    """
+    logger.info(f"🎬 Starting streamed audit execution for thread: {thread_id}")
+    logger.info(f"📁 Data path: {data_path}")
+    logger.info(f"📝 Tasks count: {len(tasks)}")
+
+    start_time = None
+    try:
+        initial_state = initial_state_for(data_path, tasks)
+        tracker = ProgressTracker()
+
+        logger.info("🚀 Streaming graph execution...")
+        start_time = time.time()
+
+        graph = compile_graph()
+        config = run_config(thread_id, [tracker.usage])
+        graph_input = initial_state
+        values = resumable_state(graph, config) if resume else None
+        if values is not None:
+            logger.info(f"♻️ Resuming thread {thread_id} from its last checkpoint")
+            tracker.resume_from(values)
+            graph_input = None
+
+        yield from graph_events(graph, graph_input, config, tracker)
+        log_token_usage(tracker)
+        result = format_response(tracker.final_state, start_time)
+    except Exception as e:
+        result = error_response(e, start_time)
+
+    yield {"event": "result", "result": result}
+
+
+async def astream(thread_id: str, data_path: str, tasks: List[str], resume: bool = False) -> AsyncIterator[dict]:
+    """
+    Async counterpart of stream(), running the async graph; yields the same events.
+    """
+    logger.info(f"🎬 Starting streamed async audit execution for thread: {thread_id}")
+    logger.info(f"📁 Data path: {data_path}")
+    logger.info(f"📝 Tasks count: {len(tasks)}")
+
+    start_time = None
+    try:
+        initial_state = initial_state_for(data_path, tasks)
+        tracker = ProgressTracker()
+
+        logger.info("🚀 Streaming async graph execution...")
+        start_time = time.time()
+
+        graph = await acompile_graph()
+        config = run_config(thread_id, [tracker.usage])
+        graph_input = initial_state
+        values = await aresumable_state(graph, config) if resume else None
+        if values is not None:
+            logger.info(f"♻️ Resuming thread {thread_id} from its last checkpoint")
+            tracker.resume_from(values)
+            graph_input = None
+
+        async for event in agraph_events(graph, graph_input, config, tracker):
+            yield event
+        log_token_usage(tracker)
+        result = format_response(tracker.final_state, start_time)
+    except Exception as e:
+        result = error_response(e, start_time)
+
+    yield {"event": "result", "result": result}
+
+
+def checkpoint_snapshot(graph, config: dict):
+    try:
+        snapshot = graph.get_state(config)
+    except ValueError:
+        raise ValueError("Resuming needs the Redis checkpointer, which is not available")
+    if not snapshot.values:
+        raise ValueError(f"No checkpoint found for thread {config['configurable']['thread_id']}")
+    return snapshot
+
+
+async def acheckpoint_snapshot(graph, config: dict):
+    try:
+        snapshot = await graph.aget_state(config)
+    except ValueError:
+        raise ValueError("Resuming needs the Redis checkpointer, which is not available")
+    if not snapshot.values:
+        raise ValueError(f"No checkpoint found for thread {config['configurable']['thread_id']}")
+    return snapshot
+
+
+def resume_stream(thread_id: str) -> Iterator[dict]:
+    """
+    Continue an interrupted audit on thread_id from its last checkpoint and yield the same events as
+    stream(). Parsed files, extracted file metadata and executed tasks that were checkpointed are not
+    redone; only the remaining files and tasks run. A thread whose run already finished yields its
+    stored result without running anything.
+    """
+    logger.info(f"♻️ Resuming audit execution for thread: {thread_id}")
+
+    start_time = time.time()
+    try:
+        tracker = ProgressTracker()
+        graph = compile_graph()
+        config = run_config(thread_id, [tracker.usage])
+        snapshot = checkpoint_snapshot(graph, config)
+        tracker.resume_from(snapshot.values)
+
+        if snapshot.next:
+            logger.info(f"⏭️ Continuing with {', '.join(snapshot.next)} ({tracker.completed_files}/{tracker.total_files} files and {tracker.completed_tasks}/{tracker.total_tasks} tasks checkpointed)")
+            yield from graph_events(graph, None, config, tracker)
+            log_token_usage(tracker)
+        else:
+            logger.info(f"✅ Thread {thread_id} already finished, returning its checkpointed result")
+
+        result = format_response(tracker.final_state, start_time)
+    except Exception as e:
+        result = error_response(e, start_time)
+
+    yield {"event": "result", "result": result}
+
+
+async def aresume_stream(thread_id: str) -> AsyncIterator[dict]:
+    """
+    Async counterpart of resume_stream(), running the async graph; yields the same events.
+    """
+    logger.info(f"♻️ Resuming async audit execution for thread: {thread_id}")
+
+    start_time = time.time()
+    try:
+        tracker = ProgressTracker()
+        graph = await acompile_graph()
+        config = run_config(thread_id, [tracker.usage])
+        snapshot = await acheckpoint_snapshot(graph, config)
+        tracker.resume_from(snapshot.values)
+
+        if snapshot.next:
+            logger.info(f"⏭️ Continuing with {', '.join(snapshot.next)} ({tracker.completed_files}/{tracker.total_files} files and {tracker.completed_tasks}/{tracker.total_tasks} tasks checkpointed)")
+            async for event in agraph_events(graph, None, config, tracker):
+                yield event
+            log_token_usage(tracker)
+        else:
+            logger.info(f"✅ Thread {thread_id} already finished, returning its checkpointed result")
+
+        result = format_response(tracker.final_state, start_time)
+    except Exception as e:
+        result = error_response(e, start_time)
+
+    yield {"event": "result", "result": result}
+
+
+def resume(thread_id: str, on_event: Optional[Callable[[dict], None]] = None) -> dict:
+    result = None
+    for event in resume_stream(thread_id):
+        if on_event is not None:
+            on_event(event)
+        if event["event"] == "result":
+            result = event["result"]
+    return result
+
+
+async def aresume(thread_id: str, on_event: Optional[Callable[[dict], None]] = None) -> dict:
+    result = None
+    async for event in aresume_stream(thread_id):
+        if on_event is not None:
+            on_event(event)
+        if event["event"] == "result":
+            result = event["result"]
+    return result
+
+
+def invoke(thread_id: str, data_path: str, tasks: List[str], on_event: Optional[Callable[[dict], None]] = None) -> dict:
+    if on_event is not None:
+        result = None
+        for event in stream(thread_id, data_path, tasks):
+            on_event(event)
+            if event["event"] == "result":
+                result = event["result"]
+        return result
 
-def invoke(thread_id: str, data_path: str, tasks: List[str]) -> dict:
     logger.info(f"🎬 Starting audit execution for thread: {thread_id}")
     logger.info(f"📁 Data path: {data_path}")
     logger.info(f"📝 Tasks count: {len(tasks)}")
     
+    start_time = None
     try:
-        
-        tasks_string = "\n".join(f"{i+1}. {task}" for i, task in enumerate(tasks))
-        logger.info(f"📋 Formatted tasks:\n{tasks_string}")
-        
-        initial_state = State(
-            data_path=data_path,
-            tasks_raw=tasks_string
-        )
+        initial_state = initial_state_for(data_path, tasks)
         
         logger.info("🚀 Invoking graph execution...")
         start_time = time.time()
 
         graph = compile_graph()
-        
-        result = graph.invoke(
-            initial_state,
-            config={"configurable": {"thread_id": thread_id}}
-        )
-        
-        
-        execution_time = time.time() - start_time
-        logger.info(f"⏱️ Graph execution completed in {execution_time:.2f} seconds")
-        
-        success = bool(result["reporter"] and len(result["execution_task_output"]) > 0)
-        logger.info(f"✅ Execution success: {success}")
-
-        if not result['relevance_to_sox_and_financial_standards'].is_relevant:
-            return {
-                "success": True,
-                "report": result['reporter'],
-                "execution_time": time.time() - start_time,
-                "documents_processed": None,
-                "tasks_count": None,
-                "execution_details": None,
-            }
-        
-        execution_details = []
-        for task_output in result["execution_task_output"]:
-            execution_details.append({
-                "task": task_output.task,
-                "output": task_output.output,
-                "status": task_output.pass_or_fail
-            })
-        
-        response = {
-            "success": success,
-            "report": result["reporter"],
-            "execution_details": execution_details,
-            "documents_processed": len(result["docs_content_with_metadata"]),
-            "tasks_count": len(result["tasks_parsed"].tasks) if result["tasks_parsed"] else 0,
-            "execution_time": execution_time
-        }
-        
-        logger.info("🎉 Audit execution completed successfully!")
-        return response
+        tracker = ProgressTracker()
+        result = graph.invoke(initial_state, config=run_config(thread_id, [tracker.usage]))
+        log_token_usage(tracker)
+        return format_response(result, start_time)
         
     except Exception as e:
-        logger.error(f"❌ Error during audit execution: {str(e)}")
-        return {
-            "success": False,
-            "error": str(e),
-            "execution_time": time.time() - start_time if 'start_time' in locals() else 0
-        } 
\ No newline at end of file
+        return error_response(e, start_time)
+
+
+async def ainvoke(thread_id: str, data_path: str, tasks: List[str], on_event: Optional[Callable[[dict], None]] = None) -> dict:
+    if on_event is not None:
+        result = None
+        async for event in astream(thread_id, data_path, tasks):
+            on_event(event)
+            if event["event"] == "result":
+                result = event["result"]
+        return result
+
+    logger.info(f"🎬 Starting async audit execution for thread: {thread_id}")
+    logger.info(f"📁 Data path: {data_path}")
+    logger.info(f"📝 Tasks count: {len(tasks)}")
+
+    start_time = None
+    try:
+        initial_state = initial_state_for(data_path, tasks)
+
+        logger.info("🚀 Invoking async graph execution...")
+        start_time = time.time()
+
+        graph = await acompile_graph()
+        tracker = ProgressTracker()
+        result = await graph.ainvoke(initial_state, config=run_config(thread_id, [tracker.usage]))
+        log_token_usage(tracker)
+        return format_response(result, start_time)
+
+    except Exception as e:
+        return error_response(e, start_time)
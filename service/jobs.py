@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+from redis import Redis
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "sqlite")
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "cache/jobs.sqlite")
+JOBS_TTL_SECONDS = int(os.getenv("JOBS_TTL_SECONDS", str(7 * 24 * 3600)))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+JSON_COLUMNS = ("tasks", "progress", "last_node", "tokens", "partial_results", "result")
+LEASE_COLUMNS = {"worker_id": "TEXT", "lease_expires_at": "REAL", "attempts": "INTEGER NOT NULL DEFAULT 0"}
+LEASE_EXPIRED_ERROR = "The audit was abandoned by its workers too many times"
+
+
+class JobStore:
+    """
+    SQLite-backed audit job queue. Holds each job's status, latest progress, partial task results
+    and final result, so any process on this host can submit, run or watch a job.
+    A running job is leased to one worker; when the lease is not renewed the job is queued again.
+    """
+
+    def __init__(self, path: str, lease_seconds: int = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            if not self._initialized:
+                with self._lock:
+                    if not self._initialized:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.execute(
+                            "CREATE TABLE IF NOT EXISTS jobs ("
+                            "id TEXT PRIMARY KEY, thread_id TEXT NOT NULL, data_path TEXT NOT NULL, tasks TEXT NOT NULL, "
+                            "status TEXT NOT NULL, progress TEXT, last_node TEXT, tokens TEXT, "
+                            "partial_results TEXT NOT NULL DEFAULT '[]', result TEXT, error TEXT, "
+                            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, updated_at REAL NOT NULL)"
+                        )
+                        existing = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+                        for column, definition in LEASE_COLUMNS.items():
+                            if column not in existing:
+                                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                        connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+                        self._initialized = True
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(self, data_path: str, tasks: List[str], thread_id: Optional[str] = None) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, thread_id, data_path, tasks, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                # Each job gets its own checkpoint thread unless the caller asks to continue one
+                (job_id, thread_id or job_id, data_path, json.dumps(tasks), JOB_QUEUED, now, now),
+            )
+        logger.info(f"📨 Queued audit job {job_id} ({len(tasks)} tasks, {data_path})")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """
+        Atomically lease the oldest queued job to worker_id and return it, or None when the queue is empty.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "UPDATE jobs SET status = ?, worker_id = ?, lease_expires_at = ?, attempts = attempts + 1, started_at = ?, updated_at = ? "
+                    "WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) "
+                    "RETURNING *",
+                    (JOB_RUNNING, worker_id, now + self.lease_seconds, now, now, JOB_QUEUED),
+                ).fetchone()
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return self._to_dict(row) if row is not None else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        Extend the lease of a running job. Returns False when the worker no longer holds it.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, worker_id, JOB_RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def reclaim_expired(self) -> int:
+        """
+        Queue again the running jobs whose lease expired, failing those out of attempts. Returns how many were reclaimed.
+        """
+        now = time.time()
+        failed_result = json.dumps({"success": False, "error": LEASE_EXPIRED_ERROR})
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                failed = connection.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, worker_id = NULL, finished_at = ?, updated_at = ? "
+                    "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                    (JOB_FAILED, failed_result, LEASE_EXPIRED_ERROR, now, now, JOB_RUNNING, now, self.max_attempts),
+                ).rowcount
+                requeued = connection.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, updated_at = ? WHERE status = ? AND lease_expires_at < ?",
+                    (JOB_QUEUED, now, JOB_RUNNING, now),
+                ).rowcount
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        if failed or requeued:
+            logger.warning(f"⚠️ Reclaimed {requeued + failed} audit jobs with expired leases ({requeued} queued again, {failed} failed)")
+        return failed + requeued
+
+    def record_event(self, job_id: str, event: dict):
+        now = time.time()
+        kind = event.get("event")
+        with self._connect() as connection:
+            if kind == "task_result":
+                connection.execute(
+                    "UPDATE jobs SET partial_results = json_insert(partial_results, '$[#]', json(?)), updated_at = ? WHERE id = ?",
+                    (json.dumps(event), now, job_id),
+                )
+            elif kind == "progress":
+                connection.execute("UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?", (json.dumps(event), now, job_id))
+            elif kind == "node":
+                connection.execute("UPDATE jobs SET last_node = ?, updated_at = ? WHERE id = ?", (json.dumps(event), now, job_id))
+            elif kind == "tokens":
+                connection.execute("UPDATE jobs SET tokens = ?, updated_at = ? WHERE id = ?", (json.dumps(event), now, job_id))
+
+    def finish(self, job_id: str, result: dict, worker_id: str) -> bool:
+        """
+        Store the final result if worker_id still holds the job's lease. Returns whether it did.
+        """
+        now = time.time()
+        status = JOB_SUCCEEDED if result.get("success", False) else JOB_FAILED
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, worker_id = NULL, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, json.dumps(result, default=str), result.get("error"), now, now, job_id, worker_id, JOB_RUNNING),
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"⚠️ Dropping result of audit job {job_id}: worker {worker_id} no longer holds its lease")
+            return False
+        logger.info(f"🏁 Audit job {job_id} {status}")
+        return True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for column in JSON_COLUMNS:
+            if job.get(column) is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+
+REDIS_CLAIM_SCRIPT = """
+local id = redis.call('RPOP', KEYS[1])
+if not id then return false end
+local key = ARGV[1] .. id
+redis.call('ZADD', KEYS[2], ARGV[4], id)
+redis.call('HSET', key, 'status', 'running', 'worker_id', ARGV[2], 'lease_expires_at', ARGV[4], 'started_at', ARGV[3], 'updated_at', ARGV[3])
+redis.call('HINCRBY', key, 'attempts', 1)
+return id
+"""
+
+REDIS_HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'worker_id') ~= ARGV[1] or redis.call('HGET', KEYS[1], 'status') ~= 'running' then return 0 end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+redis.call('HSET', KEYS[1], 'lease_expires_at', ARGV[2], 'updated_at', ARGV[4])
+return 1
+"""
+
+REDIS_RECLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local failed = 0
+for _, id in ipairs(expired) do
+  redis.call('ZREM', KEYS[1], id)
+  local key = ARGV[1] .. id
+  if tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[3]) then
+    redis.call('HSET', key, 'status', 'failed', 'result', ARGV[4], 'error', ARGV[5], 'worker_id', '', 'finished_at', ARGV[2], 'updated_at', ARGV[2])
+    failed = failed + 1
+  else
+    redis.call('HSET', key, 'status', 'queued', 'worker_id', '', 'updated_at', ARGV[2])
+    redis.call('RPUSH', KEYS[2], id)
+  end
+end
+return {#expired, failed}
+"""
+
+REDIS_FINISH_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'worker_id') ~= ARGV[1] or redis.call('HGET', KEYS[1], 'status') ~= 'running' then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[6])
+redis.call('HSET', KEYS[1], 'status', ARGV[2], 'result', ARGV[3], 'error', ARGV[4], 'worker_id', '', 'finished_at', ARGV[5], 'updated_at', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+redis.call('EXPIRE', KEYS[3], ARGV[7])
+return 1
+"""
+
+REDIS_FLOAT_FIELDS = ("created_at", "started_at", "finished_at", "updated_at", "lease_expires_at")
+
+
+class RedisJobStore:
+    """
+    Redis-backed audit job queue shared by worker processes on any number of hosts, with the same
+    interface as JobStore. Claims, lease renewals, takeovers and results are Lua scripts, so two
+    workers can never hold the same job.
+    """
+
+    def __init__(self, redis_client: Redis, lease_seconds: int = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS, ttl_seconds: int = JOBS_TTL_SECONDS, prefix: str = "audit:jobs"):
+        self.redis = redis_client
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.queue_key = f"{prefix}:queue"
+        self.leases_key = f"{prefix}:leases"
+        self.job_prefix = f"{prefix}:job:"
+        self._claim = redis_client.register_script(REDIS_CLAIM_SCRIPT)
+        self._heartbeat = redis_client.register_script(REDIS_HEARTBEAT_SCRIPT)
+        self._reclaim = redis_client.register_script(REDIS_RECLAIM_SCRIPT)
+        self._finish = redis_client.register_script(REDIS_FINISH_SCRIPT)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.job_prefix}{job_id}"
+
+    def _results_key(self, job_id: str) -> str:
+        return f"{self.job_prefix}{job_id}:results"
+
+    def submit(self, data_path: str, tasks: List[str], thread_id: Optional[str] = None) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self.redis.pipeline() as pipe:
+            pipe.hset(self._job_key(job_id), mapping={
+                "id": job_id,
+                "thread_id": thread_id or job_id,
+                "data_path": data_path,
+                "tasks": json.dumps(tasks),
+                "status": JOB_QUEUED,
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            })
+            pipe.lpush(self.queue_key, job_id)
+            pipe.execute()
+        logger.info(f"📨 Queued audit job {job_id} ({len(tasks)} tasks, {data_path})")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        now = time.time()
+        job_id = self._claim(keys=[self.queue_key, self.leases_key], args=[self.job_prefix, worker_id, now, now + self.lease_seconds])
+        return self.get(job_id.decode("utf-8")) if job_id else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        now = time.time()
+        return bool(self._heartbeat(keys=[self._job_key(job_id), self.leases_key], args=[worker_id, now + self.lease_seconds, job_id, now]))
+
+    def reclaim_expired(self) -> int:
+        now = time.time()
+        failed_result = json.dumps({"success": False, "error": LEASE_EXPIRED_ERROR})
+        expired, failed = self._reclaim(keys=[self.leases_key, self.queue_key], args=[self.job_prefix, now, self.max_attempts, failed_result, LEASE_EXPIRED_ERROR])
+        if expired:
+            logger.warning(f"⚠️ Reclaimed {expired} audit jobs with expired leases ({expired - failed} queued again, {failed} failed)")
+        return expired
+
+    def record_event(self, job_id: str, event: dict):
+        now = time.time()
+        kind = event.get("event")
+        if kind == "task_result":
+            with self.redis.pipeline() as pipe:
+                pipe.rpush(self._results_key(job_id), json.dumps(event))
+                pipe.hset(self._job_key(job_id), "updated_at", now)
+                pipe.execute()
+        elif kind in ("progress", "tokens"):
+            self.redis.hset(self._job_key(job_id), mapping={kind: json.dumps(event), "updated_at": now})
+        elif kind == "node":
+            self.redis.hset(self._job_key(job_id), mapping={"last_node": json.dumps(event), "updated_at": now})
+
+    def finish(self, job_id: str, result: dict, worker_id: str) -> bool:
+        now = time.time()
+        status = JOB_SUCCEEDED if result.get("success", False) else JOB_FAILED
+        finished = self._finish(
+            keys=[self._job_key(job_id), self.leases_key, self._results_key(job_id)],
+            args=[worker_id, status, json.dumps(result, default=str), result.get("error") or "", now, job_id, self.ttl_seconds],
+        )
+        if not finished:
+            logger.warning(f"⚠️ Dropping result of audit job {job_id}: worker {worker_id} no longer holds its lease")
+            return False
+        logger.info(f"🏁 Audit job {job_id} {status}")
+        return True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.redis.pipeline() as pipe:
+            pipe.hgetall(self._job_key(job_id))
+            pipe.lrange(self._results_key(job_id), 0, -1)
+            fields, results = pipe.execute()
+        if not fields:
+            return None
+
+        job = {key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()}
+        for column in JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job.get(column) else None
+        for column in REDIS_FLOAT_FIELDS:
+            job[column] = float(job[column]) if job.get(column) else None
+        job["attempts"] = int(job.get("attempts") or 0)
+        job["error"] = job.get("error") or None
+        job["worker_id"] = job.get("worker_id") or None
+        job["partial_results"] = [json.loads(result) for result in results]
+        return job
+
+
+def build_job_store():
+    if JOBS_BACKEND == "redis":
+        return RedisJobStore(Redis.from_url(os.getenv("REDIS_URI")))
+
+    db_dir = os.path.dirname(JOBS_DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    return JobStore(JOBS_DB_PATH)
+
+
+job_store = build_job_store()
@@ -0,0 +1,216 @@
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Type
+
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage, BaseMessage
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+
+def messages_digest(messages: List[BaseMessage]) -> str:
+    payload = json.dumps(
+        [{"type": message.type, "content": message.content} for message in messages],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(schema: Optional[Type[BaseModel]]) -> str:
+    if schema is None:
+        return "text"
+    schema_json = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return f"{schema.__name__}:{hashlib.sha256(schema_json.encode('utf-8')).hexdigest()[:16]}"
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed store of model responses with TTL expiry and least-recently-used size eviction.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                with self._lock:
+                    if not self._initialized:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.execute(
+                            "CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                            "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+                        )
+                        connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used_at)")
+                        self._initialized = True
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def key_for(self, model_name: str, reasoning_effort: Optional[str], schema: Optional[Type[BaseModel]], messages: List[BaseMessage]) -> str:
+        raw_key = f"{model_name}|{reasoning_effort}|{schema_fingerprint(schema)}|{messages_digest(messages)}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                connection.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key: str, value: str):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedStructuredOutput:
+    def __init__(self, cached_model: "CachedChatModel", schema: Type[BaseModel]):
+        self.cached_model = cached_model
+        self.schema = schema
+        self.runnable = cached_model.model.with_structured_output(schema)
+
+    def invoke(self, messages: List[BaseMessage], bypass_cache: bool = False) -> BaseModel:
+        cache = self.cached_model.cache
+        key = self.cached_model.key_for(self.schema, messages)
+
+        if not (bypass_cache or self.cached_model.bypass):
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"💾 LLM cache hit for {self.schema.__name__}")
+                return self.schema.model_validate_json(cached)
+
+        response = self.runnable.invoke(messages)
+        cache.put(key, response.model_dump_json())
+        return response
+
+    async def ainvoke(self, messages: List[BaseMessage], bypass_cache: bool = False) -> BaseModel:
+        cache = self.cached_model.cache
+        key = self.cached_model.key_for(self.schema, messages)
+
+        # SQLite calls are blocking, so they run off the event loop
+        if not (bypass_cache or self.cached_model.bypass):
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                logger.info(f"💾 LLM cache hit for {self.schema.__name__}")
+                return self.schema.model_validate_json(cached)
+
+        response = await self.runnable.ainvoke(messages)
+        await asyncio.to_thread(cache.put, key, response.model_dump_json())
+        return response
+
+
+class CachedChatModel:
+    """
+    Memoizing wrapper around a chat model, keyed by model name, reasoning effort,
+    output schema and the full message list.
+    """
+
+    def __init__(self, model, cache: LLMResponseCache, bypass: bool = False):
+        self.model = model
+        self.cache = cache
+        self.bypass = bypass
+
+    def key_for(self, schema: Optional[Type[BaseModel]], messages: List[BaseMessage]) -> str:
+        return self.cache.key_for(
+            getattr(self.model, "model_name", ""),
+            getattr(self.model, "reasoning_effort", None),
+            schema,
+            messages,
+        )
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> CachedStructuredOutput:
+        return CachedStructuredOutput(self, schema)
+
+    def invoke(self, messages: List[BaseMessage], bypass_cache: bool = False) -> AIMessage:
+        key = self.key_for(None, messages)
+
+        if not (bypass_cache or self.bypass):
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("💾 LLM cache hit for text response")
+                return AIMessage(content=cached)
+
+        response = self.model.invoke(messages)
+        self.cache.put(key, response.content)
+        return response
+
+    async def ainvoke(self, messages: List[BaseMessage], bypass_cache: bool = False) -> AIMessage:
+        key = self.key_for(None, messages)
+
+        if not (bypass_cache or self.bypass):
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                logger.info("💾 LLM cache hit for text response")
+                return AIMessage(content=cached)
+
+        response = await self.model.ainvoke(messages)
+        await asyncio.to_thread(self.cache.put, key, response.content)
+        return response
+
+
+def build_llm_cache() -> LLMResponseCache:
+    cache_dir = os.path.dirname(LLM_CACHE_PATH)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    return LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, enabled=LLM_CACHE_ENABLED)
@@ -1,16 +1,33 @@
 import os
-from service.states import State, DocMetadata, Tasks, DocumentWithMetadata, DocumentToTaskMapper, ExecutionAgent, Reporter, RelevanceToSoxAndFinancialStandards
+import asyncio
+import threading
+from functools import lru_cache
+from typing import List, Tuple
+from service.states import State, DocMetadata, Tasks, DocumentWithMetadata, ParsedFile, FileMetadataInput, TaskDocumentSelection, DocumentToTaskMapper, ExecutionAgent, Reporter, RelevanceToSoxAndFinancialStandards, TaskExecutionInput, TaskDocumentAssignments, TaskDocumentRouting
 from service.prompts import (
     METADATA_EXTRACTOR_PROMPT, 
     TASK_PARSER_PROMPT, 
     DOCUMENT_TO_TASK_MAPPER_PROMPT,
+    BATCHED_DOCUMENT_TO_TASK_MAPPER_PROMPT,
+    METADATA_DOCUMENT_ROUTER_PROMPT,
     EXECUTION_AGENT_PROMPT,
     REPORTER_PROMPT,
+    REPORT_SUMMARY_PROMPT,
     REFLECTOR_PROMPT,
     RELEVANCE_TO_SOX_AND_FINANCIAL_STANDARDS_PROMPT,
 )
 from service.parsers import parse_directory_files
+from service.storage import local_data_path
+from service.document_store import document_store
+from service.documents import detect_table_schemas, content_sample
+from service.retrieval import load_or_build_index
+from service.chunking import select_relevant_rows
+from service.rules import rules_for_task, run_rules, format_findings, task_columns
+from service.llm_cache import CachedChatModel, build_llm_cache, LLM_CACHE_BYPASS
+from service.progress import emit_progress
+from service.token_budget import input_budget, estimate_tokens, truncate_to_tokens, split_content, pack_by_budget, call_with_split, acall_with_split
 from langchain_core.messages import SystemMessage, HumanMessage
+from langgraph.types import Send
 from langchain_openai import ChatOpenAI
 from service.logger import logger
 import dotenv
@@ -18,7 +35,55 @@ import dotenv
 dotenv.load_dotenv()
 
     
-model = ChatOpenAI(model=os.getenv("MODEL_NAME"), reasoning_effort=os.getenv("REASONING_EFFORT"), api_key=os.getenv("OPENAI_API_KEY"))
+MODEL_NAME = os.getenv("MODEL_NAME")
+
+model = CachedChatModel(
+    ChatOpenAI(model=MODEL_NAME, reasoning_effort=os.getenv("REASONING_EFFORT"), api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None),
+    build_llm_cache(),
+    bypass=LLM_CACHE_BYPASS,
+)
+
+METADATA_MAX_CONCURRENCY = int(os.getenv("METADATA_MAX_CONCURRENCY", "8"))
+MAPPER_MODE = os.getenv("MAPPER_MODE", "batched")
+MAPPER_TASK_BATCH_SIZE = max(1, int(os.getenv("MAPPER_TASK_BATCH_SIZE", "25")))
+MAPPER_SAMPLE_CHARS = int(os.getenv("MAPPER_SAMPLE_CHARS", "500"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_RERANK = os.getenv("RETRIEVAL_RERANK", "false").lower() == "true"
+RULES_MODE = os.getenv("RULES_MODE", "assist")
+REPORTER_MODE = os.getenv("REPORTER_MODE", "template")
+ASYNC_MAX_CONCURRENCY = max(1, int(os.getenv("ASYNC_MAX_CONCURRENCY", "8")))
+
+# Rough allowances for message framing and per-document wrappers when planning against the input budget
+MESSAGE_OVERHEAD_TOKENS = 50
+BLOCK_OVERHEAD_TOKENS = 50
+TRUNCATION_NOTE = "\n[... truncated to fit the model context]"
+TRUNCATION_NOTE_TOKENS = 20
+
+
+async def gather_bounded(coroutines, limit: int = ASYNC_MAX_CONCURRENCY, return_exceptions: bool = False) -> list:
+    # Like asyncio.gather, but with at most `limit` model calls in flight and results kept in order
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines), return_exceptions=return_exceptions)
+
+
+async def gather_prefix_warmed(coroutines, limit: int = ASYNC_MAX_CONCURRENCY) -> list:
+    # For calls sharing a long prompt prefix: the provider only caches a prefix once a call with it has
+    # been processed, so the first call runs alone and the rest are sent once the prefix is cached
+    coroutines = list(coroutines)
+    if len(coroutines) < 2:
+        return await gather_bounded(coroutines, limit)
+    try:
+        first = await coroutines[0]
+    except BaseException:
+        for coroutine in coroutines[1:]:
+            coroutine.close()
+        raise
+    return [first] + await gather_bounded(coroutines[1:], limit)
 
 
 def relevance_to_SOX_and_financial_standards(state: State):
@@ -30,49 +95,152 @@ def relevance_to_SOX_and_financial_standards(state: State):
     ]
 
     response = model.with_structured_output(RelevanceToSoxAndFinancialStandards).invoke(messages)
-    state.relevance_to_sox_and_financial_standards = response
-    return state
+    return {"relevance_to_sox_and_financial_standards": response}
+
+
+async def arelevance_to_SOX_and_financial_standards(state: State):
+    logger.info("🔍 Starting relevance to SOX and financial standards...")
+
+    messages = [
+        SystemMessage(content=RELEVANCE_TO_SOX_AND_FINANCIAL_STANDARDS_PROMPT),
+        HumanMessage(content=str(state.tasks_raw))
+    ]
+
+    response = await model.with_structured_output(RelevanceToSoxAndFinancialStandards).ainvoke(messages)
+    return {"relevance_to_sox_and_financial_standards": response}
+
+def safe_str(value):
+    if isinstance(value, dict):
+        return str(value.get('name', value.get('text', str(value))))
+    return str(value) if value else ""
+
+
+def metadata_messages(file: ParsedFile) -> list:
+    # Describing a file does not take all of it, so a file too large for one call is cut short
+    max_tokens = input_budget(MODEL_NAME) - estimate_tokens(METADATA_EXTRACTOR_PROMPT, MODEL_NAME) - MESSAGE_OVERHEAD_TOKENS
+    content = file.content
+    if estimate_tokens(content, MODEL_NAME) > max_tokens:
+        content = truncate_to_tokens(content, max_tokens - TRUNCATION_NOTE_TOKENS, MODEL_NAME) + TRUNCATION_NOTE
+        logger.info(f"✂️ Truncated {file.file_name} to fit the metadata extractor's context")
+    return [
+        SystemMessage(content=METADATA_EXTRACTOR_PROMPT),
+        HumanMessage(content=f"File Name: {file.file_name}\nFile Content: \n{content}")
+    ]
+
+
+def document_with_metadata(file: ParsedFile, response: DocMetadata) -> DocumentWithMetadata:
+    return DocumentWithMetadata(
+        name=safe_str(file.file_name), 
+        purpose=safe_str(response.purpose), 
+        possible_use_cases=safe_str(response.possible_use_cases), 
+        doc_id=file.doc_id
+    )
+
+
+def extract_file_metadata(file: ParsedFile) -> DocumentWithMetadata:
+    response = model.with_structured_output(DocMetadata).invoke(metadata_messages(file))
+    return document_with_metadata(file, response)
+
+
+async def aextract_file_metadata(file: ParsedFile) -> DocumentWithMetadata:
+    # Building the prompt loads the document and counts its tokens, so it stays off the event loop
+    messages = await asyncio.to_thread(metadata_messages, file)
+    response = await model.with_structured_output(DocMetadata).ainvoke(messages)
+    return document_with_metadata(file, response)
+
+
+def file_parser(state: State):
+    logger.info("📄 Parsing files...")
 
-def metadata_extractor(state: State):
-    logger.info("🔍 Starting metadata extraction from files...")
-    
     try:
-        files = parse_directory_files(state.data_path)
+        files = parse_directory_files(local_data_path(state.data_path))
         logger.info(f"📁 Found {len(files)} files to process in {state.data_path}")
-        
-        for i, file in enumerate(files, 1):
-            logger.info(f"🔎 Processing file {i}/{len(files)}: {file['file_name']}")
-            
-            messages = [
-                SystemMessage(content=METADATA_EXTRACTOR_PROMPT),
-                HumanMessage(content=f"File Name: {file['file_name']}\nFile Content: \n{file['content']}")
-            ]
-            
-            response = model.with_structured_output(DocMetadata).invoke(messages)
-            
-            def safe_str(value):
-                if isinstance(value, dict):
-                    return str(value.get('name', value.get('text', str(value))))
-                return str(value) if value else ""
-            
-            state.docs_content_with_metadata.append(
-                DocumentWithMetadata(
-                    name=safe_str(file['file_name']), 
-                    purpose=safe_str(response.purpose), 
-                    possible_use_cases=safe_str(response.possible_use_cases), 
-                    content=file['content']
-                )
-            )
-            logger.info(f"✅ Successfully processed: {file['file_name']} | Purpose: {response.purpose}")
-        
-        logger.info(f"🎉 Metadata extraction completed! Processed {len(files)} files successfully")
-        return state
-        
+        # The text goes to the document store once; state and checkpoints only carry its ID
+        return {"parsed_files": [ParsedFile(file_name=file['file_name'], doc_id=document_store.put(file['content'])) for file in files]}
+
     except Exception as e:
-        logger.error(f"❌ Error in metadata extraction: {str(e)}")
+        logger.error(f"❌ Error parsing files: {str(e)}")
         raise
 
 
+async def afile_parser(state: State):
+    # Fetching and parsing the files is blocking work, so it stays off the event loop
+    return await asyncio.to_thread(file_parser, state)
+
+
+def relevance_gate(state: State):
+    # Joins the relevance check, task parsing and file parsing, which run in parallel from the start
+    if state.relevance_to_sox_and_financial_standards.is_relevant:
+        logger.info("✅ Task is relevant to SOX and financial standards")
+        return {}
+
+    logger.info(f"❌ Task is not relevant to SOX and financial standards, discarding {len(state.parsed_files)} speculatively parsed files")
+    return {"parsed_files": []}
+
+
+def dispatch_files(state: State):
+    if not state.relevance_to_sox_and_financial_standards.is_relevant:
+        return "reporter"
+
+    if not state.parsed_files:
+        logger.info("⚠️ No files to analyze, skipping to the mapper")
+        return "document_to_task_mapper"
+
+    # One graph task per file, so a resumed run only extracts metadata for files that are not checkpointed yet
+    logger.info(f"🚀 Fanning out {len(state.parsed_files)} files to the metadata extractor (max in-flight: {METADATA_MAX_CONCURRENCY})...")
+    return [Send("metadata_extractor", FileMetadataInput(file_index=i, file=file)) for i, file in enumerate(state.parsed_files)]
+
+
+# Caps metadata calls across all sync runs in the process, independently of the graph's max_concurrency
+metadata_slots = threading.BoundedSemaphore(max(1, METADATA_MAX_CONCURRENCY))
+_ametadata_slots = None
+_ametadata_slots_loop = None
+
+
+def ametadata_slots() -> asyncio.Semaphore:
+    # The async nodes share one event loop, so they are capped by an asyncio semaphore bound to it
+    global _ametadata_slots, _ametadata_slots_loop
+
+    loop = asyncio.get_running_loop()
+    if _ametadata_slots_loop is not loop:
+        _ametadata_slots = asyncio.Semaphore(max(1, METADATA_MAX_CONCURRENCY))
+        _ametadata_slots_loop = loop
+    return _ametadata_slots
+
+
+def fallback_document(payload: FileMetadataInput, e: Exception) -> DocumentWithMetadata:
+    logger.error(f"❌ Metadata extraction failed for {payload.file.file_name}: {str(e)}")
+    return DocumentWithMetadata(name=safe_str(payload.file.file_name), doc_id=payload.file.doc_id)
+
+
+def metadata_extractor(payload: FileMetadataInput):
+    logger.info(f"🔍 Extracting metadata from file {payload.file_index + 1}: {payload.file.file_name}")
+
+    try:
+        with metadata_slots:
+            document = extract_file_metadata(payload.file)
+        logger.info(f"✅ Successfully processed file {payload.file_index + 1}: {payload.file.file_name} | Purpose: {document.purpose}")
+    except Exception as e:
+        document = fallback_document(payload, e)
+
+    document.file_index = payload.file_index
+    return {"docs_content_with_metadata": [document]}
+
+
+async def ametadata_extractor(payload: FileMetadataInput):
+    logger.info(f"🔍 Extracting metadata from file {payload.file_index + 1}: {payload.file.file_name}")
+
+    try:
+        async with ametadata_slots():
+            document = await aextract_file_metadata(payload.file)
+        logger.info(f"✅ Successfully processed file {payload.file_index + 1}: {payload.file.file_name} | Purpose: {document.purpose}")
+    except Exception as e:
+        document = fallback_document(payload, e)
+
+    document.file_index = payload.file_index
+    return {"docs_content_with_metadata": [document]}
+
+
 def tasks_parser(state: State):
     logger.info("📋 Starting task parsing...")
     
@@ -86,63 +254,671 @@ def tasks_parser(state: State):
         ]
 
         response = model.with_structured_output(Tasks).invoke(messages)
-        state.tasks_parsed = response
         
         logger.info(f"✅ Successfully parsed {len(response.tasks)} tasks:")
         for i, task in enumerate(response.tasks, 1):
             logger.info(f"   {i}. 🎯 {task}")
         
-        return state
+        return {"tasks_parsed": response}
         
     except Exception as e:
         logger.error(f"❌ Error in task parsing: {str(e)}")
         raise
 
 
-def document_to_task_mapper(state: State):
-    logger.info("🔗 Starting document-to-task mapping...")
-    
-    for task in state.tasks_parsed.tasks:
-        organized_docs = ""
-        i = 1
-        for doc in state.docs_content_with_metadata: 
-            organized_docs += "\n\n" + str(i) + ". File Name: " + doc.name + "\nFile Purpose: " + doc.purpose + "\nFile Possible Use Cases: " + doc.possible_use_cases + "\nFile Content: \n<start document_content of " + doc.name + ">\n" + doc.content + "\n<end document_content of " + doc.name + ">\n\n"
-            i += 1
+async def atasks_parser(state: State):
+    logger.info("📋 Starting task parsing...")
+
+    try:
+        tasks = state.tasks_raw
+        logger.info(f"📝 Raw tasks input: {tasks[:100]}..." if len(tasks) > 100 else f"📝 Raw tasks input: {tasks}")
 
         messages = [
-            SystemMessage(content=DOCUMENT_TO_TASK_MAPPER_PROMPT),
-            HumanMessage(content="Task: " + task + "\n\nDocuments to map: " + str(organized_docs))
+            SystemMessage(content=TASK_PARSER_PROMPT),
+            HumanMessage(content=tasks)
         ]
 
-        response = model.with_structured_output(DocumentToTaskMapper).invoke(messages)
-        response.task = task
-        state.document_to_task_mapper.append(response)
+        response = await model.with_structured_output(Tasks).ainvoke(messages)
 
-    logger.info("🎉 Document-to-task mapping completed!")
-    return state
+        logger.info(f"✅ Successfully parsed {len(response.tasks)} tasks:")
+        for i, task in enumerate(response.tasks, 1):
+            logger.info(f"   {i}. 🎯 {task}")
 
+        return {"tasks_parsed": response}
 
-def execution_agent(state: State):
-    logger.info("⚡ Starting task execution...")
-    
-    for item in state.document_to_task_mapper:
-        docs_content = ""
-        i = 1
-        for doc in item.docs:
-            docs_content += "\n\n" + str(i) + ". File Name: " + doc.name + "\nFile Content: \n<document_content " + doc.name + ">\n" + doc.content + "\n</document_content " + doc.name + ">\n\n"
-            i += 1
+    except Exception as e:
+        logger.error(f"❌ Error in task parsing: {str(e)}")
+        raise
+
+
+@lru_cache(maxsize=4096)
+def document_tokens(doc_id: str) -> int:
+    # Document IDs are content hashes, so a count never goes stale; only the count is kept, not the text
+    return estimate_tokens(document_store.get(doc_id), MODEL_NAME)
+
+
+def mapper_entry(name: str, purpose: str, possible_use_cases: str, doc_id: str, max_tokens: int) -> Tuple[str, int]:
+    header = "File Name: " + name + "\nFile Purpose: " + purpose + "\nFile Possible Use Cases: " + possible_use_cases + "\nFile Content: \n<start document_content of " + name + ">\n"
+    footer = "\n<end document_content of " + name + ">"
+    content = document_store.get(doc_id)
+    content_tokens = document_tokens(doc_id)
+    overhead = estimate_tokens(header + footer, MODEL_NAME) + TRUNCATION_NOTE_TOKENS
+    if content_tokens + overhead > max_tokens:
+        # Deciding whether a document is needed does not take all of it, so one that cannot fit a call is cut short
+        content = truncate_to_tokens(content, max_tokens - overhead, MODEL_NAME) + TRUNCATION_NOTE
+        content_tokens = estimate_tokens(content, MODEL_NAME)
+        logger.info(f"✂️ Truncated {name} to fit the mapper's context")
+    return header + content + footer, content_tokens + overhead
+
+
+def format_documents_for_mapper(entries: List[str]) -> str:
+    # The block leads every mapper prompt, so callers build it once per pack and reuse it across that pack's calls
+    return "".join("\n\n" + str(i) + ". " + entry + "\n\n" for i, entry in enumerate(entries, 1))
+
+
+def mapper_packs(docs: List[DocumentWithMetadata], prompt_tokens: int) -> List[List[str]]:
+    """
+    Plan the documents of each mapper call: all of them in one call when they fit the input budget,
+    otherwise packs of whole documents in their mapped order.
+    """
+    available = input_budget(MODEL_NAME) - prompt_tokens
+    entries = [mapper_entry(doc.name, doc.purpose, doc.possible_use_cases, doc.doc_id, available) for doc in docs]
+    packs = pack_by_budget([entry for entry, _ in entries], [tokens for _, tokens in entries], available)
+    if len(packs) > 1:
+        logger.info(f"📦 {len(docs)} documents exceed the model context, mapping them in {len(packs)} calls")
+    return packs or [[]]
+
+
+def split_entries(entries: List[str]) -> List[List[str]]:
+    if len(entries) > 1:
+        half = len(entries) // 2
+        return [entries[:half], entries[half:]]
+    if not entries:
+        return [entries]
+    entry = entries[0]
+    return [[truncate_to_tokens(entry, estimate_tokens(entry, MODEL_NAME) // 2, MODEL_NAME) + TRUNCATION_NOTE]]
+
+
+def merge_mappings(tasks: List[str], pack_mappings: List[List[DocumentToTaskMapper]]) -> List[DocumentToTaskMapper]:
+    if len(pack_mappings) == 1:
+        return pack_mappings[0]
+
+    merged = []
+    for index, task in enumerate(tasks):
+        docs = []
+        for mappings in pack_mappings:
+            docs += [doc for doc in mappings[index].docs if doc not in docs]
+        merged.append(DocumentToTaskMapper(docs=docs, task=task))
+    return merged
+
+
+def per_task_mapper_messages(task: str, organized_docs: str) -> list:
+    return [
+        SystemMessage(content=DOCUMENT_TO_TASK_MAPPER_PROMPT),
+        HumanMessage(content="Documents to map: " + str(organized_docs) + "\n\nTask: " + task)
+    ]
+
+
+def per_task_prompt_tokens(tasks: List[str]) -> int:
+    return estimate_tokens(DOCUMENT_TO_TASK_MAPPER_PROMPT, MODEL_NAME) + max((estimate_tokens(task, MODEL_NAME) for task in tasks), default=0) + MESSAGE_OVERHEAD_TOKENS
+
+
+def docs_by_unique_name(docs: List[DocumentWithMetadata]) -> dict:
+    docs_by_name = {}
+    for doc in docs:
+        docs_by_name.setdefault(doc.name, doc)
+    return docs_by_name
+
+
+def selected_documents(task_number: int, names: List[str], docs_by_name: dict) -> List[DocumentWithMetadata]:
+    selected_docs = []
+    for name in names:
+        if name not in docs_by_name:
+            logger.warning(f"⚠️ Mapper returned unknown document '{name}' for task {task_number}")
+            continue
+        if docs_by_name[name] not in selected_docs:
+            selected_docs.append(docs_by_name[name])
+    return selected_docs
+
+
+def map_documents_per_task(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    # The model returns file names only, so it never spends output tokens echoing document content
+    docs_by_name = docs_by_unique_name(docs)
+    structured = model.with_structured_output(TaskDocumentSelection)
+
+    def run(entries: List[str]) -> List[DocumentToTaskMapper]:
+        organized_docs = format_documents_for_mapper(entries)
+        mappings = []
+        for i, task in enumerate(tasks, 1):
+            response = structured.invoke(per_task_mapper_messages(task, organized_docs))
+            mappings.append(DocumentToTaskMapper(docs=selected_documents(i, response.document_names, docs_by_name), task=task))
+        return mappings
+
+    pack_mappings = []
+    for entries in mapper_packs(docs, per_task_prompt_tokens(tasks)):
+        pack_mappings += call_with_split(run, entries, split_entries)
+    return merge_mappings(tasks, pack_mappings)
+
+
+async def amap_documents_per_task(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    docs_by_name = docs_by_unique_name(docs)
+    structured = model.with_structured_output(TaskDocumentSelection)
+
+    async def run(entries: List[str]) -> List[DocumentToTaskMapper]:
+        organized_docs = format_documents_for_mapper(entries)
+        responses = await gather_prefix_warmed([structured.ainvoke(per_task_mapper_messages(task, organized_docs)) for task in tasks])
+        return [
+            DocumentToTaskMapper(docs=selected_documents(i, response.document_names, docs_by_name), task=task)
+            for i, (task, response) in enumerate(zip(tasks, responses), 1)
+        ]
+
+    # Loading and measuring the documents is blocking work, so it stays off the event loop
+    packs = await asyncio.to_thread(mapper_packs, docs, per_task_prompt_tokens(tasks))
+    results = await gather_bounded([acall_with_split(run, entries, split_entries) for entries in packs])
+    return merge_mappings(tasks, [mappings for pack_results in results for mappings in pack_results])
+
+
+def task_batches(tasks: List[str]) -> List[tuple]:
+    batches = []
+    for start in range(0, len(tasks), MAPPER_TASK_BATCH_SIZE):
+        batch = tasks[start:start + MAPPER_TASK_BATCH_SIZE]
+        batches.append((start, batch, "\n".join(f"{start + i + 1}. {task}" for i, task in enumerate(batch))))
+    return batches
+
+
+def batched_mapper_messages(tasks: List[str], organized_docs: str) -> List[tuple]:
+    batches = []
+    for start, batch, tasks_list in task_batches(tasks):
+        logger.info(f"🧩 Mapping tasks {start + 1}-{start + len(batch)} of {len(tasks)} in one call")
 
         messages = [
-            SystemMessage(content=EXECUTION_AGENT_PROMPT),
-            HumanMessage(content="Task: " + str(item.task) + "\nDocuments: \n" + docs_content)
+            SystemMessage(content=BATCHED_DOCUMENT_TO_TASK_MAPPER_PROMPT),
+            HumanMessage(content="Documents to map: " + organized_docs + "\n\nTasks:\n" + tasks_list)
         ]
+        batches.append((start, len(batch), messages))
+    return batches
+
+
+def batched_prompt_tokens(tasks: List[str]) -> int:
+    return estimate_tokens(BATCHED_DOCUMENT_TO_TASK_MAPPER_PROMPT, MODEL_NAME) + max((estimate_tokens(tasks_list, MODEL_NAME) for _, _, tasks_list in task_batches(tasks)), default=0) + MESSAGE_OVERHEAD_TOKENS
+
+
+def mappings_from_assignments(tasks: List[str], docs: List[DocumentWithMetadata], batches: List[tuple], responses: List[TaskDocumentAssignments]) -> List[DocumentToTaskMapper]:
+    docs_by_name = docs_by_unique_name(docs)
+
+    selected_names = {}
+    for (start, size, _), response in zip(batches, responses):
+        for assignment in response.assignments:
+            if start < assignment.task_number <= start + size:
+                selected_names[assignment.task_number - 1] = assignment.document_names
+
+    mappings = []
+    for index, task in enumerate(tasks):
+        if index not in selected_names:
+            logger.warning(f"⚠️ No document assignment returned for task {index + 1}: {task}")
+
+        mappings.append(DocumentToTaskMapper(docs=selected_documents(index + 1, selected_names.get(index, []), docs_by_name), task=task))
+    return mappings
+
+
+def map_documents_batched(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    structured = model.with_structured_output(TaskDocumentAssignments)
+
+    def run(entries: List[str]) -> List[DocumentToTaskMapper]:
+        batches = batched_mapper_messages(tasks, format_documents_for_mapper(entries))
+        responses = [structured.invoke(messages) for _, _, messages in batches]
+        return mappings_from_assignments(tasks, docs, batches, responses)
+
+    pack_mappings = []
+    for entries in mapper_packs(docs, batched_prompt_tokens(tasks)):
+        pack_mappings += call_with_split(run, entries, split_entries)
+    return merge_mappings(tasks, pack_mappings)
+
+
+async def amap_documents_batched(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    structured = model.with_structured_output(TaskDocumentAssignments)
+
+    async def run(entries: List[str]) -> List[DocumentToTaskMapper]:
+        batches = batched_mapper_messages(tasks, format_documents_for_mapper(entries))
+        responses = await gather_prefix_warmed([structured.ainvoke(messages) for _, _, messages in batches])
+        return mappings_from_assignments(tasks, docs, batches, responses)
+
+    packs = await asyncio.to_thread(mapper_packs, docs, batched_prompt_tokens(tasks))
+    results = await gather_bounded([acall_with_split(run, entries, split_entries) for entries in packs])
+    return merge_mappings(tasks, [mappings for pack_results in results for mappings in pack_results])
+
+
+def router_entry(doc: DocumentWithMetadata) -> str:
+    schemas = detect_table_schemas(doc.content)
+    sample = content_sample(doc.content, MAPPER_SAMPLE_CHARS)
+    return "File Name: " + doc.name + "\nFile Purpose: " + (doc.purpose or "(unknown)") + "\nFile Possible Use Cases: " + (doc.possible_use_cases or "(unknown)") + "\nDetected Schema: " + ("; ".join(schemas) if schemas else "n/a") + "\nContent Sample (" + str(len(sample)) + " of " + str(len(doc.content)) + " characters): \n<start document_sample of " + doc.name + ">\n" + sample + "\n<end document_sample of " + doc.name + ">"
+
+
+def router_packs(docs: List[DocumentWithMetadata], prompt_tokens: int) -> List[List[str]]:
+    # Samples are short, but hundreds of them can still overflow one call, so they are packed like full documents
+    available = input_budget(MODEL_NAME) - prompt_tokens
+    entries = [router_entry(doc) for doc in docs]
+    packs = pack_by_budget(entries, [estimate_tokens(entry, MODEL_NAME) + BLOCK_OVERHEAD_TOKENS for entry in entries], available)
+    if len(packs) > 1:
+        logger.info(f"📦 {len(docs)} document samples exceed the model context, routing them in {len(packs)} calls")
+    return packs or [[]]
+
+
+def routing_messages(tasks: List[str], routed_docs: str) -> List[tuple]:
+    batches = []
+    for start, batch, tasks_list in task_batches(tasks):
+        logger.info(f"🧭 Routing tasks {start + 1}-{start + len(batch)} of {len(tasks)} from document metadata")
+
+        messages = [
+            SystemMessage(content=METADATA_DOCUMENT_ROUTER_PROMPT),
+            HumanMessage(content="Documents to map: " + routed_docs + "\n\nTasks:\n" + tasks_list)
+        ]
+        batches.append((start, len(batch), messages))
+    return batches
+
+
+def routing_prompt_tokens(tasks: List[str]) -> int:
+    return estimate_tokens(METADATA_DOCUMENT_ROUTER_PROMPT, MODEL_NAME) + max((estimate_tokens(tasks_list, MODEL_NAME) for _, _, tasks_list in task_batches(tasks)), default=0) + MESSAGE_OVERHEAD_TOKENS
+
 
-        response = model.with_structured_output(ExecutionAgent).invoke(messages)
-        state.execution_task_output.append(ExecutionAgent(task=item.task, output=response.output, pass_or_fail=response.pass_or_fail, file_name=doc.name))
-        logger.info(f"✅ Task {item.task} executed successfully!")
+def collect_routing(docs_by_name: dict, batches: List[tuple], responses: List[TaskDocumentRouting]) -> tuple:
+    selected_names = {}
+    ambiguous_names = {}
+    for (start, size, _), response in zip(batches, responses):
+        for assignment in response.assignments:
+            if start < assignment.task_number <= start + size:
+                index = assignment.task_number - 1
+                selected_names[index] = [name for name in assignment.document_names if name in docs_by_name]
+                ambiguous_names[index] = [
+                    name for name in assignment.ambiguous_document_names
+                    if name in docs_by_name and name not in selected_names[index]
+                ]
+    return selected_names, ambiguous_names
+
+
+def ambiguous_routing(tasks: List[str], docs_by_name: dict, selected_names: dict, ambiguous_names: dict) -> tuple:
+    # Only the ambiguous documents are re-checked, and only against the tasks that flagged them
+    ambiguous_tasks = [index for index in range(len(tasks)) if ambiguous_names.get(index) or index not in selected_names]
+    ambiguous_docs = []
+    for index in ambiguous_tasks:
+        for name in ambiguous_names.get(index, list(docs_by_name)):
+            if docs_by_name[name] not in ambiguous_docs:
+                ambiguous_docs.append(docs_by_name[name])
+    if ambiguous_tasks:
+        logger.info(f"🔎 Resolving {len(ambiguous_tasks)} tasks against the full content of {len(ambiguous_docs)} ambiguous documents")
+    return ambiguous_tasks, ambiguous_docs
+
+
+def routed_mappings(tasks: List[str], docs_by_name: dict, selected_names: dict, ambiguous_names: dict, ambiguous_tasks: List[int], resolved: List[DocumentToTaskMapper]) -> List[DocumentToTaskMapper]:
+    for index, mapping in zip(ambiguous_tasks, resolved):
+        allowed = set(ambiguous_names.get(index, docs_by_name))
+        selected_names.setdefault(index, [])
+        selected_names[index] += [doc.name for doc in mapping.docs if doc.name in allowed and doc.name not in selected_names[index]]
+
+    return [
+        DocumentToTaskMapper(docs=[docs_by_name[name] for name in selected_names.get(index, [])], task=task)
+        for index, task in enumerate(tasks)
+    ]
+
+
+def merge_routings(pack_routings: List[tuple]) -> tuple:
+    # A task answered by any pack counts as routed; a document one pack selected is not ambiguous
+    selected_names = {}
+    ambiguous_names = {}
+    for pack_selected, pack_ambiguous in pack_routings:
+        for index, names in pack_selected.items():
+            selected_names.setdefault(index, [])
+            selected_names[index] += [name for name in names if name not in selected_names[index]]
+        for index, names in pack_ambiguous.items():
+            ambiguous_names.setdefault(index, [])
+            ambiguous_names[index] += [name for name in names if name not in ambiguous_names[index]]
+    for index, names in ambiguous_names.items():
+        ambiguous_names[index] = [name for name in names if name not in selected_names.get(index, [])]
+    return selected_names, ambiguous_names
+
+
+def map_documents_by_metadata(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    docs_by_name = docs_by_unique_name(docs)
+    structured = model.with_structured_output(TaskDocumentRouting)
+
+    def run(entries: List[str]) -> tuple:
+        batches = routing_messages(tasks, format_documents_for_mapper(entries))
+        responses = [structured.invoke(messages) for _, _, messages in batches]
+        return collect_routing(docs_by_name, batches, responses)
+
+    pack_routings = []
+    for entries in router_packs(docs, routing_prompt_tokens(tasks)):
+        pack_routings += call_with_split(run, entries, split_entries)
+    selected_names, ambiguous_names = merge_routings(pack_routings)
+
+    ambiguous_tasks, ambiguous_docs = ambiguous_routing(tasks, docs_by_name, selected_names, ambiguous_names)
+    resolved = []
+    if ambiguous_tasks:
+        resolved = map_documents_batched([tasks[index] for index in ambiguous_tasks], ambiguous_docs)
+    return routed_mappings(tasks, docs_by_name, selected_names, ambiguous_names, ambiguous_tasks, resolved)
+
+
+async def amap_documents_by_metadata(tasks: List[str], docs: List[DocumentWithMetadata]) -> List[DocumentToTaskMapper]:
+    docs_by_name = docs_by_unique_name(docs)
+    structured = model.with_structured_output(TaskDocumentRouting)
+
+    async def run(entries: List[str]) -> tuple:
+        batches = routing_messages(tasks, format_documents_for_mapper(entries))
+        responses = await gather_prefix_warmed([structured.ainvoke(messages) for _, _, messages in batches])
+        return collect_routing(docs_by_name, batches, responses)
+
+    # Sampling the documents and detecting their schemas loads them, so it stays off the event loop
+    packs = await asyncio.to_thread(router_packs, docs, routing_prompt_tokens(tasks))
+    results = await gather_bounded([acall_with_split(run, entries, split_entries) for entries in packs])
+    selected_names, ambiguous_names = merge_routings([routing for pack_results in results for routing in pack_results])
+
+    ambiguous_tasks, ambiguous_docs = ambiguous_routing(tasks, docs_by_name, selected_names, ambiguous_names)
+    resolved = []
+    if ambiguous_tasks:
+        resolved = await amap_documents_batched([tasks[index] for index in ambiguous_tasks], ambiguous_docs)
+    return routed_mappings(tasks, docs_by_name, selected_names, ambiguous_names, ambiguous_tasks, resolved)
+
+
+def retrieval_candidates(tasks: List[str], docs: List[DocumentWithMetadata], data_path: str) -> List[List[DocumentWithMetadata]]:
+    docs_by_name = docs_by_unique_name(docs)
+
+    index = load_or_build_index(local_data_path(data_path), [(doc.name, doc.purpose + "\n" + doc.possible_use_cases + "\n" + doc.content) for doc in docs_by_name.values()])
+    candidates = []
+    for index_in_list, task in enumerate(tasks, 1):
+        hits = index.search(task, RETRIEVAL_TOP_K)
+        logger.info(f"📚 Task {index_in_list} retrieval candidates: {[(name, round(score, 2)) for name, score in hits]}")
+        if not hits:
+            # No shared terms is no proof the documents are irrelevant, so the task keeps every document (and the reranker, when on, picks among them)
+            logger.warning(f"⚠️ Task {index_in_list} matched no documents by keyword, keeping all {len(docs_by_name)} documents as candidates")
+            candidates.append(list(docs_by_name.values()))
+            continue
+        candidates.append([docs_by_name[name] for name, _ in hits])
+    return candidates
+
+
+def rerank_batches(tasks: List[str], candidates: List[List[DocumentWithMetadata]]) -> List[tuple]:
+    batches = []
+    for start in range(0, len(tasks), MAPPER_TASK_BATCH_SIZE):
+        batch_tasks = tasks[start:start + MAPPER_TASK_BATCH_SIZE]
+        batch_candidates = candidates[start:start + MAPPER_TASK_BATCH_SIZE]
+        batch_docs = []
+        for task_candidates in batch_candidates:
+            batch_docs += [doc for doc in task_candidates if doc not in batch_docs]
+        batches.append((batch_tasks, batch_candidates, batch_docs))
+    return batches
+
+
+def reranked_mappings(reranked: List[DocumentToTaskMapper], batch_candidates: List[List[DocumentWithMetadata]]) -> List[DocumentToTaskMapper]:
+    return [
+        DocumentToTaskMapper(docs=[doc for doc in mapping.docs if doc in task_candidates], task=mapping.task)
+        for mapping, task_candidates in zip(reranked, batch_candidates)
+    ]
+
+
+def map_documents_by_retrieval(tasks: List[str], docs: List[DocumentWithMetadata], data_path: str) -> List[DocumentToTaskMapper]:
+    candidates = retrieval_candidates(tasks, docs, data_path)
+    if not RETRIEVAL_RERANK:
+        return [DocumentToTaskMapper(docs=task_candidates, task=task) for task, task_candidates in zip(tasks, candidates)]
+
+    mappings = []
+    for batch_tasks, batch_candidates, batch_docs in rerank_batches(tasks, candidates):
+        reranked = map_documents_batched(batch_tasks, batch_docs)
+        mappings += reranked_mappings(reranked, batch_candidates)
+    return mappings
+
+
+async def amap_documents_by_retrieval(tasks: List[str], docs: List[DocumentWithMetadata], data_path: str) -> List[DocumentToTaskMapper]:
+    # Building or loading the index touches disk, so it stays off the event loop
+    candidates = await asyncio.to_thread(retrieval_candidates, tasks, docs, data_path)
+    if not RETRIEVAL_RERANK:
+        return [DocumentToTaskMapper(docs=task_candidates, task=task) for task, task_candidates in zip(tasks, candidates)]
+
+    batches = rerank_batches(tasks, candidates)
+    reranked = await gather_bounded([
+        amap_documents_batched(batch_tasks, batch_docs)
+        for batch_tasks, _, batch_docs in batches
+    ])
+    mappings = []
+    for batch_reranked, (_, batch_candidates, _) in zip(reranked, batches):
+        mappings += reranked_mappings(batch_reranked, batch_candidates)
+    return mappings
+
+
+def document_to_task_mapper(state: State):
+    logger.info(f"🔗 Starting document-to-task mapping (mode: {MAPPER_MODE})...")
+    
+    tasks = state.tasks_parsed.tasks
+
+    if MAPPER_MODE == "per_task":
+        mappings = map_documents_per_task(tasks, state.docs_content_with_metadata)
+    elif MAPPER_MODE == "metadata":
+        mappings = map_documents_by_metadata(tasks, state.docs_content_with_metadata)
+    elif MAPPER_MODE == "retrieval":
+        mappings = map_documents_by_retrieval(tasks, state.docs_content_with_metadata, state.data_path)
+    else:
+        mappings = map_documents_batched(tasks, state.docs_content_with_metadata)
+
+    for mapping in mappings:
+        logger.info(f"📎 {mapping.task} -> {[doc.name for doc in mapping.docs]}")
+
+    logger.info("🎉 Document-to-task mapping completed!")
+    return {"document_to_task_mapper": mappings}
+
+
+async def adocument_to_task_mapper(state: State):
+    logger.info(f"🔗 Starting document-to-task mapping (mode: {MAPPER_MODE})...")
+
+    tasks = state.tasks_parsed.tasks
+
+    if MAPPER_MODE == "per_task":
+        mappings = await amap_documents_per_task(tasks, state.docs_content_with_metadata)
+    elif MAPPER_MODE == "metadata":
+        mappings = await amap_documents_by_metadata(tasks, state.docs_content_with_metadata)
+    elif MAPPER_MODE == "retrieval":
+        mappings = await amap_documents_by_retrieval(tasks, state.docs_content_with_metadata, state.data_path)
+    else:
+        mappings = await amap_documents_batched(tasks, state.docs_content_with_metadata)
+
+    for mapping in mappings:
+        logger.info(f"📎 {mapping.task} -> {[doc.name for doc in mapping.docs]}")
+
+    logger.info("🎉 Document-to-task mapping completed!")
+    return {"document_to_task_mapper": mappings}
+
+
+def rule_engine(state: State):
+    if RULES_MODE == "off":
+        return {"rule_findings": []}
+
+    logger.info("🧮 Starting deterministic payroll checks...")
+    rules = []
+    file_names = []
+    for item in state.document_to_task_mapper:
+        task_rules = rules_for_task(item.task)
+        if not task_rules:
+            continue
+        rules += [rule for rule in task_rules if rule not in rules]
+        file_names += [doc.name for doc in item.docs if doc.name not in file_names]
+
+    if not rules:
+        logger.info("⏭️ No task matches a deterministic check")
+        return {"rule_findings": []}
+
+    findings = run_rules(local_data_path(state.data_path), file_names, rules)
+    for finding in findings:
+        logger.info(f"🧮 {finding.rule_id} on {finding.file_name}{' / ' + finding.sheet if finding.sheet else ''}: {len(finding.failing_rows)} failing of {finding.checked_rows} rows")
+
+    logger.info(f"🎉 Deterministic checks completed! {len(findings)} results")
+    return {"rule_findings": findings}
+
+
+async def arule_engine(state: State):
+    # The checks are pandas work with no network calls, so they run in a worker thread
+    return await asyncio.to_thread(rule_engine, state)
+
+
+def dispatch_tasks(state: State):
+    if not state.document_to_task_mapper:
+        logger.info("⚠️ No tasks to execute, skipping to reporter")
+        return "reporter"
+
+    logger.info(f"🚀 Fanning out {len(state.document_to_task_mapper)} tasks to the execution agent...")
+    sends = []
+    for i, item in enumerate(state.document_to_task_mapper):
+        rule_ids = {rule.rule_id for rule in rules_for_task(item.task)}
+        doc_names = {doc.name for doc in item.docs}
+        findings = [finding for finding in state.rule_findings if finding.rule_id in rule_ids and finding.file_name in doc_names]
+        sends.append(Send("execution_agent", TaskExecutionInput(task_index=i, item=item, rule_findings=findings)))
+    return sends
+
+
+def deterministic_execution_output(payload: TaskExecutionInput):
+    if not (payload.rule_findings and RULES_MODE == "auto"):
+        return None
+
+    # Only a task phrased as exactly the checks that ran is settled by them; anything broader still goes to the model with the findings
+    item = payload.item
+    task_rules = rules_for_task(item.task)
+    found_rule_ids = {finding.rule_id for finding in payload.rule_findings}
+    if not all(rule.covers(item.task) and rule.rule_id in found_rule_ids for rule in task_rules):
+        return None
+
+    failed = any(finding.failing_rows for finding in payload.rule_findings)
+    output = ExecutionAgent(
+        task=item.task,
+        output="Deterministic payroll checks:\n" + format_findings(payload.rule_findings),
+        pass_or_fail="FAIL" if failed else "PASS",
+        file_name=", ".join(dict.fromkeys(finding.file_name for finding in payload.rule_findings)),
+        task_index=payload.task_index,
+    )
+    logger.info(f"✅ Task {item.task} answered by deterministic checks: {output.pass_or_fail}")
+    return output
+
+
+def execution_documents(payload: TaskExecutionInput) -> List[tuple]:
+    item = payload.item
+    documents = []
+    budget = input_budget(MODEL_NAME)
+    for doc in item.docs:
+        fits_budget = estimate_tokens(doc.content, MODEL_NAME) <= budget
+        content = select_relevant_rows(item.task, doc.content, fits_budget, lambda columns: task_columns(item.task, columns))
+        if content is None:
+            content = doc.content
+        else:
+            logger.info(f"✂️ Sending {len(content)}/{len(doc.content)} characters of {doc.name} matching task {payload.task_index + 1}")
+        documents.append((doc.name, content))
+    return documents
+
+
+def execution_document_block(i: int, name: str, content: str) -> str:
+    return "\n\n" + str(i) + ". File Name: " + name + "\nFile Content: \n<document_content " + name + ">\n" + content + "\n</document_content " + name + ">\n\n"
+
+
+def execution_messages(payload: TaskExecutionInput, documents: List[tuple]) -> list:
+    item = payload.item
+    docs_content = "".join(execution_document_block(i, name, content) for i, (name, content) in enumerate(documents, 1))
+
+    checks = ""
+    if payload.rule_findings:
+        checks = "\nDeterministic check results (computed exactly over every row, treat them as authoritative): \n" + format_findings(payload.rule_findings) + "\n"
+
+    return [
+        SystemMessage(content=EXECUTION_AGENT_PROMPT),
+        HumanMessage(content="Documents: \n" + docs_content + "\nTask: " + str(item.task) + checks)
+    ]
+
+
+def document_parts(name: str, content: str, max_tokens: int) -> List[tuple]:
+    parts = split_content(content, max_tokens, MODEL_NAME)
+    if len(parts) == 1:
+        return [(name, content)]
+    return [(f"{name} (part {k}/{len(parts)})", part) for k, part in enumerate(parts, 1)]
+
+
+def execution_calls(payload: TaskExecutionInput) -> List[List[tuple]]:
+    """
+    Plan the model calls for a task: one call when its documents fit the input budget, otherwise packs
+    of whole documents in their mapped order, with documents too large for any call split into parts.
+    """
+    documents = execution_documents(payload)
+    prompt_tokens = sum(estimate_tokens(message.content, MODEL_NAME) for message in execution_messages(payload, [])) + MESSAGE_OVERHEAD_TOKENS
+    available = input_budget(MODEL_NAME) - prompt_tokens
+
+    blocks = []
+    for name, content in documents:
+        if estimate_tokens(content, MODEL_NAME) > available:
+            parts = document_parts(name, content, available - BLOCK_OVERHEAD_TOKENS)
+            logger.info(f"✂️ Splitting {name} into {len(parts)} parts to fit the model context for task {payload.task_index + 1}")
+            blocks += parts
+        else:
+            blocks.append((name, content))
+
+    calls = pack_by_budget(blocks, [estimate_tokens(execution_document_block(1, name, content), MODEL_NAME) for name, content in blocks], available)
+    if len(calls) > 1:
+        logger.info(f"📦 Task {payload.task_index + 1} needs {len(calls)} calls to fit its documents in the model context")
+    return calls or [[]]
+
+
+def split_documents(documents: List[tuple]) -> List[List[tuple]]:
+    if len(documents) > 1:
+        half = len(documents) // 2
+        return [documents[:half], documents[half:]]
+    if not documents:
+        return [documents]
+    name, content = documents[0]
+    return [[part] for part in document_parts(name, content, estimate_tokens(content, MODEL_NAME) // 2)]
+
+
+def execution_output(payload: TaskExecutionInput, responses: List[ExecutionAgent]) -> ExecutionAgent:
+    item = payload.item
+    if len(responses) == 1:
+        result, status = responses[0].output, responses[0].pass_or_fail
+    else:
+        # Each call saw part of the documents, so the task only passes when every part passed
+        result = "\n\n".join(f"Part {k}/{len(responses)}: {response.output}" for k, response in enumerate(responses, 1))
+        status = "PASS" if all(response.pass_or_fail.strip().upper() == "PASS" for response in responses) else "FAIL"
+
+    output = ExecutionAgent(
+        task=item.task,
+        output=result,
+        pass_or_fail=status,
+        file_name=", ".join(doc.name for doc in item.docs),
+        task_index=payload.task_index,
+    )
+    logger.info(f"✅ Task {item.task} executed successfully!")
+    return output
+
+
+def execution_agent(payload: TaskExecutionInput):
+    logger.info(f"⚡ Starting execution of task {payload.task_index + 1}: {payload.item.task}")
+
+    output = deterministic_execution_output(payload)
+    if output is None:
+        structured = model.with_structured_output(ExecutionAgent)
+        responses = []
+        for documents in execution_calls(payload):
+            responses += call_with_split(lambda part: structured.invoke(execution_messages(payload, part)), documents, split_documents)
+        output = execution_output(payload, responses)
     
-    logger.info("🎉 Task execution completed!")
-    return state
+    return {"execution_task_output": [output]}
+
+
+async def aexecution_agent(payload: TaskExecutionInput):
+    logger.info(f"⚡ Starting execution of task {payload.task_index + 1}: {payload.item.task}")
+
+    output = deterministic_execution_output(payload)
+    if output is None:
+        structured = model.with_structured_output(ExecutionAgent)
+
+        async def run(part: List[tuple]) -> ExecutionAgent:
+            return await structured.ainvoke(execution_messages(payload, part))
+
+        # Row selection and token counting scan large tables, so the calls are planned in a worker thread
+        calls = await asyncio.to_thread(execution_calls, payload)
+        results = await gather_bounded([acall_with_split(run, documents, split_documents) for documents in calls])
+        output = execution_output(payload, [response for call_responses in results for response in call_responses])
+
+    return {"execution_task_output": [output]}
 
 
 def reflector(state: State):
@@ -150,7 +926,6 @@ def reflector(state: State):
     
     try:
         logger.info("🧠 Reflecting on task execution results...")
-        state.is_in_reflection = True
 
         messages = [
             SystemMessage(content=REFLECTOR_PROMPT),
@@ -158,41 +933,146 @@ def reflector(state: State):
         ]
 
         response = model.invoke(messages)
-        state.reflector = response.content
+        reflection = response.content
         
         logger.info("✅ Reflection completed successfully!")
-        logger.info(f"🔍 Reflection preview: {state.reflector[:200]}..." if len(state.reflector) > 200 else f"🔍 Reflection: {state.reflector}")
+        logger.info(f"🔍 Reflection preview: {reflection[:200]}..." if len(reflection) > 200 else f"🔍 Reflection: {reflection}")
         
-        return state
+        return {"reflector": reflection, "is_in_reflection": True}
         
     except Exception as e:
         logger.error(f"❌ Error in reflection: {str(e)}")
         raise
 
-def reporter(state: State):
-    logger.info("📊 Starting final report generation...")
-    
-    if not state.relevance_to_sox_and_financial_standards.is_relevant:
-        state.reporter = "The given tasks are not relevant to SOX and financial standards, because of " + state.relevance_to_sox_and_financial_standards.reason
-        return state
 
-    state.reporter = ""
-    for item in state.execution_task_output:
-        task_report = "Task: " + str(item.task) + "\n" + "Output: " + str(item.output) + "\n" + "Pass or Fail: " + str(item.pass_or_fail) + "\n\n"
-    
+async def areflector(state: State):
+    logger.info("🔍 Starting reflection on task execution...")
+
+    try:
+        logger.info("🧠 Reflecting on task execution results...")
+
         messages = [
-            SystemMessage(content=REPORTER_PROMPT),
-            HumanMessage(content=task_report)
+            SystemMessage(content=REFLECTOR_PROMPT),
+            HumanMessage(content=str(state.execution_task_output))
         ]
 
-        response = model.with_structured_output(Reporter).invoke(messages)
-        state.reporter += "***********\n" + response.output + "***********\n"
+        response = await model.ainvoke(messages)
+        reflection = response.content
+
+        logger.info("✅ Reflection completed successfully!")
+        logger.info(f"🔍 Reflection preview: {reflection[:200]}..." if len(reflection) > 200 else f"🔍 Reflection: {reflection}")
+
+        return {"reflector": reflection, "is_in_reflection": True}
+
+    except Exception as e:
+        logger.error(f"❌ Error in reflection: {str(e)}")
+        raise
+
+
+def not_relevant_report(state: State) -> str:
+    return "The given tasks are not relevant to SOX and financial standards, because of " + state.relevance_to_sox_and_financial_standards.reason
+
+
+def reporter_messages(item: ExecutionAgent) -> list:
+    task_report = "Task: " + str(item.task) + "\n" + "Output: " + str(item.output) + "\n" + "Pass or Fail: " + str(item.pass_or_fail) + "\n\n"
+    return [
+        SystemMessage(content=REPORTER_PROMPT),
+        HumanMessage(content=task_report)
+    ]
+
+
+def format_task_report(item: ExecutionAgent) -> str:
+    # Same layout the reporter prompt asks the model for, rendered without a model call
+    return (
+        "***********\n"
+        + "Task: " + str(item.task) + "\n"
+        + "File Name: " + str(item.file_name) + "\n"
+        + "Output: " + str(item.output) + "\n"
+        + "Pass or Fail: " + str(item.pass_or_fail) + "\n"
+        + "***********\n"
+    )
+
 
+def summary_messages(outputs: List[ExecutionAgent]) -> list:
+    results = "\n\n".join(format_task_report(item) for item in outputs)
+    max_tokens = input_budget(MODEL_NAME) - estimate_tokens(REPORT_SUMMARY_PROMPT, MODEL_NAME) - MESSAGE_OVERHEAD_TOKENS
+    if estimate_tokens(results, MODEL_NAME) > max_tokens:
+        results = truncate_to_tokens(results, max_tokens - TRUNCATION_NOTE_TOKENS, MODEL_NAME) + TRUNCATION_NOTE
+    return [
+        SystemMessage(content=REPORT_SUMMARY_PROMPT),
+        HumanMessage(content=results)
+    ]
+
+
+def with_summary(report: str, summary: str) -> str:
+    return "Summary:\n" + summary.strip() + "\n\n" + report
+
+
+def log_report(report: str):
     logger.info("✅ Final report generated successfully!")
-    logger.info(f"📄 Report length: {len(state.reporter)} characters")
-    logger.info(f"📊 Report preview: {state.reporter[:200]}..." if len(state.reporter) > 200 else f"📊 Report: {state.reporter}")
+    logger.info(f"📄 Report length: {len(report)} characters")
+    logger.info(f"📊 Report preview: {report[:200]}..." if len(report) > 200 else f"📊 Report: {report}")
+
+
+def reporter(state: State):
+    logger.info(f"📊 Starting final report generation (mode: {REPORTER_MODE})...")
     
-    return state
+    if not state.relevance_to_sox_and_financial_standards.is_relevant:
+        return {"reporter": not_relevant_report(state)}
+
+    outputs = state.execution_task_output
+    if REPORTER_MODE == "llm":
+        report = ""
+        for i, item in enumerate(outputs, 1):
+            response = model.with_structured_output(Reporter).invoke(reporter_messages(item))
+            report += "***********\n" + response.output + "***********\n"
+            emit_progress("report", i, len(outputs), item.task)
+    else:
+        report = "".join(format_task_report(item) for item in outputs)
+        if REPORTER_MODE == "summary" and outputs:
+            try:
+                report = with_summary(report, model.invoke(summary_messages(outputs)).content)
+            except Exception as e:
+                # The per-task report is complete without the summary, so a failed summary does not fail the audit
+                logger.error(f"❌ Report summary failed, returning the report without it: {str(e)}")
+        emit_progress("report", len(outputs), len(outputs))
+
+    log_report(report)
+    return {"reporter": report}
+
+
+async def areporter(state: State):
+    logger.info(f"📊 Starting final report generation (mode: {REPORTER_MODE})...")
+
+    if not state.relevance_to_sox_and_financial_standards.is_relevant:
+        return {"reporter": not_relevant_report(state)}
+
+    outputs = state.execution_task_output
+    if REPORTER_MODE == "llm":
+        structured = model.with_structured_output(Reporter)
+        done = 0
+
+        async def report_task(item: ExecutionAgent) -> Reporter:
+            nonlocal done
+            response = await structured.ainvoke(reporter_messages(item))
+            done += 1
+            emit_progress("report", done, len(outputs), item.task)
+            return response
+
+        responses = await gather_bounded([report_task(item) for item in outputs])
+        report = "".join("***********\n" + response.output + "***********\n" for response in responses)
+    else:
+        report = "".join(format_task_report(item) for item in outputs)
+        if REPORTER_MODE == "summary" and outputs:
+            try:
+                response = await model.ainvoke(await asyncio.to_thread(summary_messages, outputs))
+                report = with_summary(report, response.content)
+            except Exception as e:
+                logger.error(f"❌ Report summary failed, returning the report without it: {str(e)}")
+        emit_progress("report", len(outputs), len(outputs))
+
+    log_report(report)
+    return {"reporter": report}
 
 
 def should_continue(state: State):
@@ -209,14 +1089,3 @@ def should_continue(state: State):
     else:
         logger.info("🏁 Maximum iterations reached, stopping reflection...")
         return 'stop' 
-
-
-def is_relevant(state: State):
-    logger.info("🔍 Evaluating relevance to SOX and financial standards...")
-    
-    if state.relevance_to_sox_and_financial_standards.is_relevant:
-        logger.info("✅ Task is relevant to SOX and financial standards")
-        return "continue"
-    else:
-        logger.info("❌ Task is not relevant to SOX and financial standards")
-        return "stop"
\ No newline at end of file
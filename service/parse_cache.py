@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Iterable, List, Optional
+
+import dotenv
+dotenv.load_dotenv()
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", "cache/parsed")
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Writes between full rescans of the cache directory, which also pick up entries written by other processes
+RESCAN_EVERY_PUTS = 200
+# Eviction frees space down to this share of max_bytes, so the writes that follow do not each trigger another pass
+EVICT_TARGET_RATIO = 0.9
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed file text, keyed by file content hash and parser version.
+    Entries are evicted least-recently-used first once the cache grows past max_bytes. The size is
+    tracked as a running total, so the directory is only walked when that total passes max_bytes
+    (or every RESCAN_EVERY_PUTS writes), not on every write.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._puts_since_scan = 0
+
+    def key_for(self, file_path: str, parser_version: str) -> str:
+        ext = os.path.splitext(file_path)[1].lower()
+        return hashlib.sha256(f"{parser_version}:{ext}:{hash_file(file_path)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            # Bump the mtime so eviction treats this entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        text = self.read(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        self.put_lines(key, [text])
+
+    def put_lines(self, key: str, lines: Iterable[str]) -> int:
+        """
+        Write newline-joined lines to the cache incrementally and return how many were written.
+        """
+        if not self.enabled:
+            return 0
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        written = 0
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in lines:
+                    if written:
+                        f.write("\n")
+                    f.write(line)
+                    written += 1
+            replaced = self._file_size(path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # The lines come from a parser that can fail partway, which must not leave a partial file behind
+            self._discard(tmp_path)
+            raise
+        self._grow(self._file_size(path) - replaced)
+        return written
+
+    def _file_size(self, path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _grow(self, added: int):
+        with self._lock:
+            self._puts_since_scan += 1
+            if self._size is not None and self._puts_since_scan < RESCAN_EVERY_PUTS:
+                self._size += added
+                if self._size <= self.max_bytes:
+                    return
+        self.evict()
+
+    def _discard(self, tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pages.json")
+
+    def put_page_index(self, key: str, offsets: List[int]):
+        if not self.enabled:
+            return
+
+        path = self._index_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(offsets, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+
+    def get_page_index(self, key: str) -> Optional[List[int]]:
+        if not self.enabled or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._index_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_bytes(self, key: str, start: int, end: int) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def evict(self):
+        with self._lock:
+            self._puts_since_scan = 0
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for filename in files:
+                    if not filename.endswith(".txt"):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            self._size = total
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                try:
+                    os.remove(path[:-len(".txt")] + ".pages.json")
+                except OSError:
+                    pass
+                total -= size
+                self._size = total
+                if total <= self.max_bytes * EVICT_TARGET_RATIO:
+                    break
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES, enabled=PARSE_CACHE_ENABLED)
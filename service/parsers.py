@@ -1,17 +1,48 @@
 import os
 import fitz
-import pandas as pd
+import openpyxl
+import io
 import base64
+from PIL import Image, ImageOps
 from openai import OpenAI
 # from service.prompts import VISION_IMAGE_PROMPT
 import csv
 import mimetypes
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
+from service.parse_cache import parse_cache
+from service.progress import emit_progress
+from service.logger import logger
 
 import dotenv
 dotenv.load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Bump whenever a parser's output changes so stale parse cache entries are ignored
+PARSER_VERSION = "2"
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+SUPPORTED_EXTENSIONS = {'.pdf', '.txt', '.xlsx', '.csv'} | IMAGE_EXTENSIONS
+
+# Tables start at the first row with this many non-empty cells
+MIN_TABLE_CELLS = 4
+CSV_HEADER_SCAN_ROWS = int(os.getenv("CSV_HEADER_SCAN_ROWS", "1000"))
+
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(8, os.cpu_count() or 1))))
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "8"))
+VISION_MAX_DIMENSION = int(os.getenv("VISION_MAX_DIMENSION", "2048"))
+VISION_RECOMPRESS_MIN_BYTES = int(os.getenv("VISION_RECOMPRESS_MIN_BYTES", str(1024 * 1024)))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# OCR text depends on how the image was prepared, so changing these settings must not reuse cached results
+VISION_PARSER_VERSION = f"{PARSER_VERSION}:vision:{VISION_MAX_DIMENSION}:{VISION_RECOMPRESS_MIN_BYTES}:{VISION_JPEG_QUALITY}"
+
 VISION_IMAGE_PROMPT = """
 You are an intelligent assistant specialized in extracting structured information from images.
 
@@ -24,48 +55,180 @@ Preserve any introductory or header text exactly as it appears.
 Return the output in a clean, readable format.
 """
 
+def parse_file(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == '.pdf':
+        return parse_pdf(file_path)
+    elif ext == '.txt':
+        return parse_txt(file_path)
+    elif ext == '.xlsx':
+        return parse_excel(file_path)
+    elif ext == '.csv':
+        return parse_csv(file_path)
+    elif ext in IMAGE_EXTENSIONS:
+        return parse_image_with_vision(file_path)
+    return None
+
+
+def parse_with_cache(file_path, ext, cache_key):
+    text = parse_cache.get(cache_key)
+    if text is None and ext == '.csv' and parse_cache.enabled:
+        # Rows go straight to the cache file, so only the final text is ever held in memory
+        if parse_cache.put_lines(cache_key, iter_csv_rows(file_path)):
+            text = parse_cache.read(cache_key)
+        else:
+            text = "[No valid table found]"
+            parse_cache.put(cache_key, text)
+    if text is None and ext == '.pdf':
+        text, offsets = parse_pdf_with_index(file_path)
+        parse_cache.put(cache_key, text)
+        parse_cache.put_page_index(cache_key, offsets)
+    if text is None:
+        text = parse_file(file_path)
+        parse_cache.put(cache_key, text)
+    return text
+
+
+def ocr_images(image_paths):
+    """
+    Run vision OCR for {cache_key: file_path} concurrently, capped at VISION_MAX_CONCURRENCY,
+    caching each result. Returns {cache_key: text or Exception}.
+    """
+    results = {}
+    if not image_paths:
+        return results
+
+    logger.info(f"🖼️ Running vision OCR on {len(image_paths)} unique images (max in-flight: {VISION_MAX_CONCURRENCY})")
+    with ThreadPoolExecutor(max_workers=max(1, min(VISION_MAX_CONCURRENCY, len(image_paths)))) as executor:
+        futures = {cache_key: executor.submit(parse_image_with_vision, file_path) for cache_key, file_path in image_paths.items()}
+        for cache_key, future in futures.items():
+            try:
+                results[cache_key] = future.result()
+                parse_cache.put(cache_key, results[cache_key])
+            except Exception as e:
+                results[cache_key] = e
+    return results
+
+
 def parse_directory_files(directory_path):
-    parsed_files = []
+    entries = []
+    hits_before = parse_cache.hits
 
     for root, _, files in os.walk(directory_path):
         for filename in files:
             file_path = os.path.join(root, filename)
             ext = os.path.splitext(filename)[1].lower()
 
-            try:
-                if ext == '.pdf':
-                    text = parse_pdf(file_path)
-                elif ext == '.txt':
-                    text = parse_txt(file_path)
-                elif ext == '.xlsx':
-                    text = parse_excel(file_path)
-                elif ext == '.csv':
-                    text = parse_csv(file_path)
-                elif ext == '.png':
-                    text = parse_image_with_vision(file_path)
-                else:
+            if ext not in SUPPORTED_EXTENSIONS:
+                continue
+            entries.append((filename, file_path, ext))
+
+    contents = [None] * len(entries)
+    pending_images = {}
+    image_indices = {}
+    parsed = 0
+    for i, (filename, file_path, ext) in enumerate(entries):
+        try:
+            if ext in IMAGE_EXTENSIONS:
+                cache_key = parse_cache.key_for(file_path, VISION_PARSER_VERSION)
+                text = parse_cache.get(cache_key)
+                if text is None:
+                    # Identical images share a cache key, so each distinct image is sent to OCR once
+                    pending_images.setdefault(cache_key, file_path)
+                    image_indices[i] = cache_key
                     continue
+            else:
+                text = parse_with_cache(file_path, ext, parse_cache.key_for(file_path, PARSER_VERSION))
+            contents[i] = text
 
-                parsed_files.append({
-                    'file_name': filename,
-                    'content': text
-                })
+        except Exception as e:
+            contents[i] = f"[Error reading file: {str(e)}]"
 
-            except Exception as e:
-                parsed_files.append({
-                    'file_name': filename,
-                    'content': f"[Error reading file: {str(e)}]"
-                })
+        parsed += 1
+        emit_progress("parse", parsed, len(entries), filename)
 
-    return parsed_files
+    ocr_results = ocr_images(pending_images)
+    for i, cache_key in image_indices.items():
+        result = ocr_results[cache_key]
+        contents[i] = f"[Error reading file: {str(result)}]" if isinstance(result, Exception) else result
+        parsed += 1
+        emit_progress("parse", parsed, len(entries), entries[i][0])
 
+    logger.info(f"🗃️ Parse cache: {parse_cache.hits - hits_before}/{len(entries)} files served from cache, {len(image_indices) - len(pending_images)} duplicate images skipped | totals: {parse_cache.stats()}")
+    return [
+        {'file_name': filename, 'content': content}
+        for (filename, _, _), content in zip(entries, contents)
+    ]
 
-def parse_pdf(file_path):
-    text = ""
+
+def extract_pdf_page_range(file_path, start, end):
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, min(end, doc.page_count))]
+
+
+def get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn keeps worker start-up safe while the graph has other threads running
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def extract_pdf_pages(file_path):
     with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text.strip()
+        page_count = doc.page_count
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_MAX_WORKERS <= 1:
+        return extract_pdf_page_range(file_path, 0, page_count)
+
+    step = -(-page_count // (PDF_MAX_WORKERS * 2))
+    starts = list(range(0, page_count, step))
+    results = get_pdf_pool().map(extract_pdf_page_range, [file_path] * len(starts), starts, [start + step for start in starts])
+    return [page for pages in results for page in pages]
+
+
+def parse_pdf_with_index(file_path):
+    """
+    Extract a PDF's text together with the UTF-8 byte offset where each page starts in it,
+    so a page range can later be sliced out of the cached text without re-extracting the document.
+    """
+    pages = extract_pdf_pages(file_path)
+    text = ''.join(pages)
+    stripped = text.strip()
+    leading = len(text[:len(text) - len(text.lstrip())].encode('utf-8'))
+    total = len(stripped.encode('utf-8'))
+
+    offsets = []
+    position = 0
+    for page in pages:
+        offsets.append(min(max(position - leading, 0), total))
+        position += len(page.encode('utf-8'))
+    offsets.append(total)
+    return stripped, offsets
+
+
+def parse_pdf(file_path):
+    return parse_pdf_with_index(file_path)[0]
+
+
+def read_pdf_pages(file_path, first_page, last_page):
+    """
+    Return the text of pages first_page..last_page (1-based, inclusive), served from the parse cache's
+    page index when the document was already parsed, otherwise extracted from just those pages.
+    """
+    cache_key = parse_cache.key_for(file_path, PARSER_VERSION)
+    offsets = parse_cache.get_page_index(cache_key)
+    if offsets is not None:
+        first = max(first_page, 1) - 1
+        last = min(last_page, len(offsets) - 1)
+        if first < last:
+            text = parse_cache.read_bytes(cache_key, offsets[first], offsets[last])
+            if text is not None:
+                return text.decode('utf-8').strip()
+
+    return ''.join(extract_pdf_page_range(file_path, max(first_page, 1) - 1, last_page)).strip()
 
 
 def parse_txt(file_path):
@@ -74,66 +237,73 @@ def parse_txt(file_path):
 
 
 
-def parse_excel(file_path):
-    excel_data = pd.read_excel(file_path, sheet_name=None, header=None)
-    results = []
+def format_excel_cell(value):
+    if value is None:
+        return ''
+    return str(value).strip()
 
-    for sheet_name, df in excel_data.items():
-        rows = df.values.tolist()
 
-        start_idx = None
-        for i, row in enumerate(rows):
-            non_empty_count = sum(1 for cell in row if str(cell).strip() and str(cell).lower() != 'nan')
-            if non_empty_count >= 4:
-                start_idx = i
-                break
+def iter_excel_rows(worksheet):
+    """
+    Stream the numbered rows of a read-only worksheet, starting at the first row with at least 4 non-empty cells.
+    Row numbers count from that header row and keep counting across skipped empty rows.
+    """
+    row_number = 0
+    for row in worksheet.iter_rows(values_only=True):
+        cells = [format_excel_cell(value) for value in row]
 
-        if start_idx is None:
+        if row_number == 0 and sum(1 for cell in cells if cell and cell.lower() != 'nan') < MIN_TABLE_CELLS:
             continue
+        row_number += 1
 
-        table_rows = rows[start_idx:]
+        while cells and cells[-1] == '':
+            cells.pop()
+        if any(cells):
+            yield f"Row {row_number}," + ','.join(cells)
 
-        cleaned_rows = []
-        for i, row in enumerate(table_rows):
-            str_row = [str(cell).strip() if pd.notna(cell) else '' for cell in row]
-            while str_row and str_row[-1] == '':
-                str_row.pop()
-            if any(str_row):
-                row_number = f"Row {i+1}"
-                cleaned_rows.append(f"{row_number}," + ','.join(str_row))
 
-        if cleaned_rows:
-            results.append(f"Sheet: {sheet_name}\n" + '\n'.join(cleaned_rows))
-
-    return '\n\n'.join(results).strip() if results else "[No valid table found in Excel]"
+def parse_excel(file_path):
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    results = []
 
+    try:
+        for worksheet in workbook.worksheets:
+            rows = '\n'.join(iter_excel_rows(worksheet))
+            if rows:
+                results.append(f"Sheet: {worksheet.title}\n" + rows)
+    finally:
+        workbook.close()
 
+    return '\n\n'.join(results).strip() if results else "[No valid table found in Excel]"
 
-def parse_csv(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = list(csv.reader(f))
 
-    table_start_index = None
-    for i, row in enumerate(lines):
-        non_empty_count = sum(1 for cell in row if cell.strip())
-        if non_empty_count >= 4:
-            table_start_index = i
-            break
 
-    if table_start_index is None:
-        return "[No valid table found]"
+def iter_csv_rows(file_path):
+    """
+    Lazily yield the numbered rows of a CSV file. Only the first CSV_HEADER_SCAN_ROWS rows are scanned
+    for the table start (the first row with at least 4 non-empty cells); nothing before it is kept.
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
 
-    clean_rows = []
-    for row in lines[table_start_index:]:
-        while row and row[-1].strip() == '':
-            row.pop()
-        if any(cell.strip() for cell in row):
-            clean_rows.append(','.join(cell.strip() for cell in row))
+        for row in islice(reader, CSV_HEADER_SCAN_ROWS):
+            if sum(1 for cell in row if cell.strip()) >= MIN_TABLE_CELLS:
+                break
+        else:
+            return
 
-    numbered_rows = [f"Row {i+1}," + row for i, row in enumerate(clean_rows)]
-    return '\n'.join(numbered_rows)
+        row_number = 0
+        for row in chain([row], reader):
+            while row and row[-1].strip() == '':
+                row.pop()
+            if any(cell.strip() for cell in row):
+                row_number += 1
+                yield f"Row {row_number}," + ','.join(cell.strip() for cell in row)
 
 
+def parse_csv(file_path):
+    text = '\n'.join(iter_csv_rows(file_path))
+    return text if text else "[No valid table found]"
 
 
 def encode_image(image_path):
@@ -146,9 +316,27 @@ def get_mime_type(image_path):
         raise ValueError(f"Unsupported image type for file: {image_path}")
     return mime_type
 
+def prepare_image(image_path):
+    """
+    Return (mime_type, base64 payload) for the vision call, downscaling images larger than
+    VISION_MAX_DIMENSION and recompressing heavy files as JPEG; small images are sent untouched.
+    """
+    with Image.open(image_path) as image:
+        oversized = max(image.size) > VISION_MAX_DIMENSION
+        heavy = os.path.getsize(image_path) > VISION_RECOMPRESS_MIN_BYTES
+        if not (oversized or heavy):
+            return get_mime_type(image_path), encode_image(image_path)
+
+        image = ImageOps.exif_transpose(image)
+        if oversized:
+            image.thumbnail((VISION_MAX_DIMENSION, VISION_MAX_DIMENSION), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+        return "image/jpeg", base64.b64encode(buffer.getvalue()).decode("utf-8")
+
 def parse_image_with_vision(image_path):
-    base64_image = encode_image(image_path)
-    mime_type = get_mime_type(image_path)
+    mime_type, base64_image = prepare_image(image_path)
 
     response = client.responses.create(
         model="gpt-4.1",
@@ -0,0 +1,118 @@
+from typing import List, Optional, Set
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langgraph.config import get_stream_writer
+
+
+def emit(event: str, **data):
+    """
+    Send a progress event to the custom stream of the graph run this is called from.
+    Does nothing when called outside a graph run, e.g. from scripts calling the parsers directly.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"event": event, **data})
+
+
+def emit_progress(stage: str, current: int, total: int, item: str = ""):
+    emit("progress", stage=stage, current=current, total=total, item=item)
+
+
+class ProgressTracker:
+    """
+    Turns the chunks of a graph run streamed with stream_mode=["updates", "custom", "values"]
+    into UI events, and keeps the last full state so the final result can be built from it.
+    """
+
+    def __init__(self):
+        self.usage = UsageMetadataCallbackHandler()
+        self.final_state: Optional[dict] = None
+        self.total_files = 0
+        self.total_tasks = 0
+        # Indices rather than counters, because a resumed run replays the updates of checkpointed files and tasks
+        self.finished_files: Set[int] = set()
+        self.finished_tasks: Set[int] = set()
+        self._reported_tokens = 0
+
+    def resume_from(self, values: dict):
+        # A resumed run only streams the remaining work, so counts start from the checkpointed state
+        self.final_state = values
+        self.total_files = len(values.get("parsed_files") or [])
+        self.finished_files = {document.file_index for document in values.get("docs_content_with_metadata") or []}
+        self.total_tasks = len(values.get("document_to_task_mapper") or [])
+        self.finished_tasks = {output.task_index for output in values.get("execution_task_output") or []}
+
+    @property
+    def completed_files(self) -> int:
+        return len(self.finished_files)
+
+    @property
+    def completed_tasks(self) -> int:
+        return len(self.finished_tasks)
+
+    def events(self, mode: str, chunk) -> List[dict]:
+        if mode == "values":
+            self.final_state = chunk
+            return []
+        if mode == "custom":
+            return [chunk] if isinstance(chunk, dict) and "event" in chunk else []
+
+        events = []
+        for node, update in chunk.items():
+            if node.startswith("__"):
+                continue
+            update = update or {}
+
+            if node == "file_parser":
+                self.total_files = len(update.get("parsed_files", []))
+                events.append({"event": "progress", "stage": "metadata", "current": 0, "total": self.total_files, "item": ""})
+
+            if node == "metadata_extractor":
+                for document in update.get("docs_content_with_metadata", []):
+                    self.finished_files.add(document.file_index)
+                    events.append({"event": "progress", "stage": "metadata", "current": self.completed_files, "total": self.total_files, "item": document.name})
+
+            if node == "document_to_task_mapper":
+                self.total_tasks = len(update.get("document_to_task_mapper", []))
+                events.append({"event": "progress", "stage": "execution", "current": 0, "total": self.total_tasks, "item": ""})
+
+            if node == "execution_agent":
+                for output in update.get("execution_task_output", []):
+                    self.finished_tasks.add(output.task_index)
+                    events.append({
+                        "event": "task_result",
+                        "task_index": output.task_index,
+                        "task": output.task,
+                        "status": output.pass_or_fail,
+                        "output": output.output,
+                        "file_name": output.file_name,
+                    })
+                    events.append({"event": "progress", "stage": "execution", "current": self.completed_tasks, "total": self.total_tasks, "item": output.task})
+
+            events.append({"event": "node", "node": node})
+
+        return events
+
+    def token_usage(self) -> dict:
+        usage = self.usage.usage_metadata
+        input_tokens = sum(model_usage.get("input_tokens", 0) for model_usage in usage.values())
+        output_tokens = sum(model_usage.get("output_tokens", 0) for model_usage in usage.values())
+        # Input tokens the provider served from its prompt cache, billed and processed at a discount
+        cached_input_tokens = sum((model_usage.get("input_token_details") or {}).get("cache_read", 0) for model_usage in usage.values())
+        return {
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "uncached_input_tokens": input_tokens - cached_input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def token_event(self) -> Optional[dict]:
+        usage = self.token_usage()
+        if usage["total_tokens"] == self._reported_tokens:
+            return None
+
+        self._reported_tokens = usage["total_tokens"]
+        return {"event": "tokens", **usage}
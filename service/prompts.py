@@ -13,8 +13,8 @@ DOCUMENT_TO_TASK_MAPPER_PROMPT = """
 You are a highly capable assistant specialized in identifying which documents are essential for executing a specific task.
 
 You will receive:
-- A task description from the user
 - A list of documents (including file names and extracted content)
+- A task description from the user, after the documents
 
 Your job is to return only the documents that are **necessary for the successful execution of the task**. Do **not** select documents based on general relevance — select them based on whether they directly **enable** the task to be completed or answered.
 
@@ -25,6 +25,46 @@ To do this:
 
 Your output must strictly follow this rule: include documents **only if they are required to perform the task**. Do not include extra or loosely relevant documents.
 
+Return only the file names of the selected documents, exactly as they appear in the documents. Do not repeat their content.
+
+Return your result using the provided schema.
+"""
+
+
+BATCHED_DOCUMENT_TO_TASK_MAPPER_PROMPT = """
+You are a highly capable assistant specialized in identifying which documents are essential for executing a list of tasks.
+
+You will receive:
+- A list of documents (including file names and extracted content)
+- A numbered list of tasks
+
+For every task, return only the file names of the documents that are **necessary for the successful execution of that task**. Do **not** select documents based on general relevance — select them based on whether they directly **enable** the task to be completed or answered.
+
+To do this:
+- Examine both the file name and the content of each document.
+- If the file name alone is not sufficient to determine its utility for a task, analyze its content.
+- Exclude any document that does not clearly contribute to executing the task, even if it's somewhat related.
+
+Return exactly one entry per task, using the task number from the list and the file names exactly as they appear in the documents.
+
+Return your result using the provided schema.
+"""
+
+
+METADATA_DOCUMENT_ROUTER_PROMPT = """
+You are a highly capable assistant specialized in routing documents to the tasks they are required for.
+
+You will receive:
+- A list of documents described only by their file name, purpose, possible use cases, detected table schema and a short content sample
+- A numbered list of tasks
+
+For every task:
+- Put a document in `document_names` only if its description makes it clear that the document is **necessary** to execute the task.
+- Put a document in `ambiguous_document_names` if it might be necessary but the description is not enough to decide (for example, the purpose is missing or the sample does not show the relevant columns).
+- Leave out every other document.
+
+Return exactly one entry per task, using the task number from the list and the file names exactly as they appear in the documents.
+
 Return your result using the provided schema.
 """
 
@@ -44,9 +84,12 @@ When completing the task:
 - Include any numerical values, row numbers (if applicable), and relevant observations
 - Clearly specify which document file names were used in your response
 
+Large tables may be trimmed to the row ranges (marked like "[Rows 201-400]") or columns that match the task. The header row is always included, and every row keeps its original "Row N" number — cite those numbers as they appear.
+A trimmed table starts with a note saying which rows or columns were left out. Do not treat a trimmed table as complete: if the task needs the omitted rows or columns, say so and return `"FAIL"` rather than passing on the rows you were given.
+
 You will receive:
-- A task description
 - A set of documents (with file names and content)
+- A task description, after the documents
 
 Return your response strictly following the required output schema.
 """
@@ -64,6 +107,19 @@ Output: <output> - include details of the task output including any numerical va
 Pass or Fail: <pass or fail>
 """
 
+REPORT_SUMMARY_PROMPT = """
+You are an intelligent assistant specialized in summarizing the results of an audit.
+
+You will receive the results of every audit task, each with the task, the files used, the output and whether it passed or failed.
+
+Write a short executive summary of the audit:
+- How many tasks passed and how many failed
+- The key findings of the failed tasks, including the numerical values and row numbers (if applicable) they report
+- Any pattern across the tasks worth the auditor's attention
+
+Base the summary only on the given results.
+"""
+
 REFLECTOR_PROMPT = """
 You are an intelligent assistant specialized in reflecting on the tasks.
 
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import math
+import hashlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "2000"))
+RETRIEVAL_INDEX_VERSION = "1"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "check", "for", "from", "if", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "verify", "was", "were", "with", "all", "any", "each",
+    "ensure", "row",
+}
+
+
+def normalize_token(token: str) -> str:
+    # Light plural folding so "accounts" matches an "Account" column header
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(content: str, max_chars: int) -> List[str]:
+    chunks = []
+    start = 0
+    while start < len(content):
+        end = min(len(content), start + max_chars)
+        if end < len(content):
+            # Prefer to break on a line boundary so table rows stay whole
+            newline = content.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1
+        chunks.append(content[start:end])
+        start = end
+    return chunks
+
+
+def corpus_fingerprint(docs: List[Tuple[str, str]]) -> str:
+    digest = hashlib.sha256(f"{RETRIEVAL_INDEX_VERSION}:{RETRIEVAL_CHUNK_CHARS}".encode("utf-8"))
+    for name, content in docs:
+        digest.update(name.encode("utf-8"))
+        digest.update(hashlib.sha256(content.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """
+    Offline BM25 index over chunked documents; documents are scored by their best matching chunk.
+    """
+
+    def __init__(self, fingerprint: str, chunk_docs: List[str], chunk_lengths: List[int], postings: Dict[str, Dict[str, int]]):
+        self.fingerprint = fingerprint
+        self.chunk_docs = chunk_docs
+        self.chunk_lengths = chunk_lengths
+        self.postings = postings
+        self.avg_length = sum(chunk_lengths) / len(chunk_lengths) if chunk_lengths else 0.0
+
+    @classmethod
+    def build(cls, docs: List[Tuple[str, str]]) -> "BM25Index":
+        chunk_docs = []
+        chunk_lengths = []
+        postings: Dict[str, Dict[str, int]] = {}
+
+        for name, content in docs:
+            for chunk in chunk_text(f"{name}\n{content}", RETRIEVAL_CHUNK_CHARS):
+                chunk_id = str(len(chunk_docs))
+                tokens = tokenize(chunk)
+                chunk_docs.append(name)
+                chunk_lengths.append(len(tokens))
+                for term, count in Counter(tokens).items():
+                    postings.setdefault(term, {})[chunk_id] = count
+
+        return cls(corpus_fingerprint(docs), chunk_docs, chunk_lengths, postings)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        total_chunks = len(self.chunk_docs)
+        if not total_chunks:
+            return []
+
+        chunk_scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (total_chunks - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for chunk_id, frequency in term_postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.chunk_lengths[int(chunk_id)] / (self.avg_length or 1)
+                chunk_scores[chunk_id] = chunk_scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+        doc_scores: Dict[str, float] = {}
+        for chunk_id, score in chunk_scores.items():
+            name = self.chunk_docs[int(chunk_id)]
+            doc_scores[name] = max(doc_scores.get(name, 0.0), score)
+
+        return sorted(doc_scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "chunk_docs": self.chunk_docs,
+                "chunk_lengths": self.chunk_lengths,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["fingerprint"], data["chunk_docs"], data["chunk_lengths"], data["postings"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def index_path_for(data_path: str) -> str:
+    return os.path.normpath(data_path) + ".retrieval.json"
+
+
+def load_or_build_index(data_path: str, docs: List[Tuple[str, str]]) -> BM25Index:
+    path = index_path_for(data_path)
+    fingerprint = corpus_fingerprint(docs)
+
+    index = BM25Index.load(path)
+    if index is not None and index.fingerprint == fingerprint:
+        logger.info(f"📚 Reusing retrieval index at {path}")
+        return index
+
+    index = BM25Index.build(docs)
+    try:
+        index.save(path)
+        logger.info(f"📚 Built retrieval index over {len(docs)} documents ({len(index.chunk_docs)} chunks) at {path}")
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save retrieval index to {path}: {str(e)}")
+    return index
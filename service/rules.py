@@ -0,0 +1,304 @@
+import os
+import re
+import csv
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from service.states import RuleFinding
+from service.parsers import CSV_HEADER_SCAN_ROWS, MIN_TABLE_CELLS
+from service.retrieval import tokenize
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+RULES_TOLERANCE = float(os.getenv("RULES_TOLERANCE", "0.01"))
+RULES_MAX_EXAMPLES = int(os.getenv("RULES_MAX_EXAMPLES", "20"))
+
+# Checked in order, so more specific roles claim their columns before the generic ones
+COLUMN_ALIASES = {
+    "employee_id": ["employee id", "emp id", "empid", "employee number", "employee no", "staff id", "worker id", "id"],
+    "bank_account": ["bank account number", "bank account", "account number", "account no", "iban"],
+    "overtime_rate": ["overtime rate", "ot rate", "overtime hourly rate"],
+    "overtime_pay": ["overtime pay", "ot pay", "overtime earnings", "overtime amount", "overtime wages"],
+    "regular_rate": ["regular rate", "hourly rate", "base rate", "pay rate", "rate"],
+    "regular_pay": ["regular pay", "basic pay", "base pay", "regular earnings", "regular wages", "base salary", "basic salary"],
+    "gross": ["gross pay", "gross wages", "gross salary", "total gross", "gross earnings", "gross"],
+    "deductions": ["total deductions", "deductions", "deduction"],
+    "net": ["net pay", "net salary", "net wages", "take home pay", "net"],
+}
+KEY_ROLES = {"employee_id", "bank_account"}
+
+
+def normalize_column(name) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def resolve_columns(columns: List[str]) -> Dict[str, str]:
+    normalized = {column: normalize_column(column) for column in columns}
+    resolved = {}
+    claimed = set()
+
+    for exact in (True, False):
+        for role, aliases in COLUMN_ALIASES.items():
+            if role in resolved:
+                continue
+            for alias in aliases:
+                match = next((
+                    column for column, name in normalized.items()
+                    if column not in claimed and (name == alias if exact else (" " in alias and alias in name))
+                ), None)
+                if match is not None:
+                    resolved[role] = match
+                    claimed.add(match)
+                    break
+    return resolved
+
+
+def to_number(series: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(series, errors="coerce")
+    # Only values like "$1,200.00" need cleaning, so the slow string path runs on those rows alone
+    dirty = numbers.isna() & series.notna()
+    if dirty.any():
+        cleaned = series[dirty].astype(str).str.replace(r"[,\s$£€]", "", regex=True)
+        numbers[dirty] = pd.to_numeric(cleaned, errors="coerce")
+    return numbers
+
+
+def to_key(series: pd.Series) -> pd.Series:
+    values = np.char.upper(np.char.strip(series.fillna("").to_numpy(dtype=str)))
+    keys = pd.Series(values, index=series.index)
+    return keys.mask(keys == "")
+
+
+class PayrollTable:
+    def __init__(self, file_name: str, sheet: str, frame: pd.DataFrame, row_numbers: np.ndarray):
+        self.file_name = file_name
+        self.sheet = sheet
+        self.frame = frame
+        self.row_numbers = row_numbers
+        self.columns = resolve_columns(list(frame.columns))
+        self._converted = {}
+
+    def has(self, *roles: str) -> bool:
+        return all(role in self.columns for role in roles)
+
+    def number(self, role: str) -> pd.Series:
+        if ("number", role) not in self._converted:
+            self._converted[("number", role)] = to_number(self.frame[self.columns[role]])
+        return self._converted[("number", role)]
+
+    def key(self, role: str) -> pd.Series:
+        if ("key", role) not in self._converted:
+            self._converted[("key", role)] = to_key(self.frame[self.columns[role]])
+        return self._converted[("key", role)]
+
+
+def find_csv_table_start(file_path: str) -> Tuple[Optional[int], List[str]]:
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        for i, row in enumerate(islice(csv.reader(f), CSV_HEADER_SCAN_ROWS)):
+            if sum(1 for cell in row if cell.strip()) >= MIN_TABLE_CELLS:
+                return i, row
+    return None, []
+
+
+def load_csv_tables(file_path: str, file_name: str) -> List[PayrollTable]:
+    start, header = find_csv_table_start(file_path)
+    if start is None:
+        return []
+
+    # Amounts are parsed natively by the C reader; identifiers stay text so leading zeros survive
+    key_columns = {column for role, column in resolve_columns(header).items() if role in KEY_ROLES}
+    frame = pd.read_csv(
+        file_path, skiprows=start, header=0, keep_default_na=False, na_values=[""], skipinitialspace=True,
+        dtype={column: str for column in key_columns}, encoding="utf-8",
+    )
+    frame.columns = [str(column).strip() for column in frame.columns]
+    # parse_csv drops empty rows before numbering, and the header is Row 1
+    frame = frame[frame.notna().any(axis=1)].reset_index(drop=True)
+    return [PayrollTable(file_name, "", frame, np.arange(2, len(frame) + 2))]
+
+
+def load_excel_tables(file_path: str, file_name: str) -> List[PayrollTable]:
+    tables = []
+    for sheet_name, sheet in pd.read_excel(file_path, sheet_name=None, header=None, dtype=object).items():
+        non_empty = sheet.notna() & sheet.astype("string").apply(lambda column: column.str.strip() != "").fillna(False)
+        header_rows = np.flatnonzero(non_empty.sum(axis=1).to_numpy() >= MIN_TABLE_CELLS)
+        if not len(header_rows):
+            continue
+
+        start = header_rows[0]
+        header = [str(cell).strip() if pd.notna(cell) else f"Column {i + 1}" for i, cell in enumerate(sheet.iloc[start])]
+        frame = sheet.iloc[start + 1:].copy()
+        frame.columns = header
+        keep = non_empty.iloc[start + 1:].any(axis=1).to_numpy()
+        # parse_excel numbers rows by position from the header, counting skipped empty rows
+        row_numbers = np.arange(2, len(frame) + 2)[keep]
+        tables.append(PayrollTable(file_name, str(sheet_name), frame[keep].reset_index(drop=True), row_numbers))
+    return tables
+
+
+def load_tables(file_path: str, file_name: str) -> List[PayrollTable]:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".csv":
+        return load_csv_tables(file_path, file_name)
+    if ext == ".xlsx":
+        return load_excel_tables(file_path, file_name)
+    return []
+
+
+def check_gross_equals_components(table: PayrollTable) -> Tuple[np.ndarray, np.ndarray, Callable[[int], str]]:
+    gross, regular, overtime = table.number("gross"), table.number("regular_pay"), table.number("overtime_pay")
+    expected = regular + overtime
+    checked = (gross.notna() & expected.notna()).to_numpy()
+    failed = checked & ((gross - expected).abs() > RULES_TOLERANCE).to_numpy()
+    return checked, failed, lambda i: f"gross {gross.iat[i]} != regular {regular.iat[i]} + overtime {overtime.iat[i]} ({expected.iat[i]})"
+
+
+def check_overtime_rate_minimum(table: PayrollTable) -> Tuple[np.ndarray, np.ndarray, Callable[[int], str]]:
+    overtime_rate, regular_rate = table.number("overtime_rate"), table.number("regular_rate")
+    minimum = regular_rate * 1.5
+    checked = (overtime_rate.notna() & minimum.notna()).to_numpy()
+    failed = checked & (overtime_rate < minimum - RULES_TOLERANCE).to_numpy()
+    return checked, failed, lambda i: f"overtime rate {overtime_rate.iat[i]} < 1.5 x regular rate {regular_rate.iat[i]} ({minimum.iat[i]})"
+
+
+def check_net_equals_gross_minus_deductions(table: PayrollTable) -> Tuple[np.ndarray, np.ndarray, Callable[[int], str]]:
+    net, gross, deductions = table.number("net"), table.number("gross"), table.number("deductions")
+    expected = gross - deductions
+    checked = (net.notna() & expected.notna()).to_numpy()
+    failed = checked & ((net - expected).abs() > RULES_TOLERANCE).to_numpy()
+    return checked, failed, lambda i: f"net {net.iat[i]} != gross {gross.iat[i]} - deductions {deductions.iat[i]} ({expected.iat[i]})"
+
+
+def check_duplicate_employee_ids(table: PayrollTable) -> Tuple[np.ndarray, np.ndarray, Callable[[int], str]]:
+    employee_ids = table.key("employee_id")
+    checked = employee_ids.notna().to_numpy()
+    failed = checked & employee_ids.duplicated(keep=False).to_numpy()
+    return checked, failed, lambda i: f"employee ID {employee_ids.iat[i]} appears more than once"
+
+
+def check_duplicate_bank_accounts(table: PayrollTable) -> Tuple[np.ndarray, np.ndarray, Callable[[int], str]]:
+    accounts = table.key("bank_account")
+    checked = accounts.notna().to_numpy()
+    if table.has("employee_id"):
+        # An account is only suspicious when it pays more than one distinct employee
+        employees_per_account = table.key("employee_id").groupby(accounts).transform("nunique")
+        failed = checked & (employees_per_account > 1).fillna(False).to_numpy()
+    else:
+        failed = checked & accounts.duplicated(keep=False).to_numpy()
+    return checked, failed, lambda i: f"bank account {accounts.iat[i]} is shared with another record"
+
+
+class Rule:
+    def __init__(self, rule_id: str, description: str, roles: Tuple[str, ...], keyword_groups: List[set], check, exact_patterns: Tuple[str, ...] = ()):
+        self.rule_id = rule_id
+        self.description = description
+        self.roles = roles
+        self.keyword_groups = keyword_groups
+        self.check = check
+        self.exact_patterns = [re.compile(pattern) for pattern in exact_patterns]
+
+    def matches(self, task: str) -> bool:
+        terms = set(tokenize(task))
+        return all(group & terms for group in self.keyword_groups)
+
+    def covers(self, task: str) -> bool:
+        # A keyword match only says the check is relevant; the task must be phrased as exactly this check for the result to be the whole verdict
+        normalized = normalize_column(task)
+        return any(pattern.fullmatch(normalized) for pattern in self.exact_patterns)
+
+
+# Exact phrasings are matched against the task after normalize_column, so punctuation has become spaces
+TASK_VERB = r"(?:(?:check|verify|confirm|ensure|validate)(?: that)? )?"
+TASK_SCOPE = r"(?: (?:for|across) (?:all|every|each) (?:employees?|rows?|records?))?"
+
+
+RULES = [
+    Rule("gross_equals_components", "Gross pay equals regular pay plus overtime pay", ("gross", "regular_pay", "overtime_pay"),
+         [{"gross"}, {"regular", "overtime", "base", "basic", "component", "sum", "add", "total"}], check_gross_equals_components,
+         (TASK_VERB + r"(?:the )?gross pay (?:equals|is equal to|matches|is) (?:the sum of )?(?:the )?regular pay (?:plus|and) (?:the )?overtime pay" + TASK_SCOPE,)),
+    Rule("overtime_rate_minimum", "Overtime rate is at least 1.5x the regular rate", ("overtime_rate", "regular_rate"),
+         [{"overtime", "ot"}, {"rate", "1.5", "premium", "time-and-a-half", "multiplier"}], check_overtime_rate_minimum,
+         (TASK_VERB + r"(?:the )?overtime rate is (?:at least|not less than|no less than) 1 5(?: ?x| times)? (?:the )?regular rate" + TASK_SCOPE,)),
+    Rule("net_equals_gross_minus_deductions", "Net pay equals gross pay minus deductions", ("net", "gross", "deductions"),
+         [{"net"}, {"gross", "deduction"}], check_net_equals_gross_minus_deductions,
+         (TASK_VERB + r"(?:the )?net pay (?:equals|is equal to|matches|is) (?:the )?gross pay minus (?:the )?(?:total )?deductions" + TASK_SCOPE,)),
+    Rule("duplicate_employee_ids", "Employee IDs are unique", ("employee_id",),
+         [{"duplicate", "duplicated", "unique", "uniqueness", "repeated"}, {"employee", "id", "staff", "worker"}], check_duplicate_employee_ids,
+         (TASK_VERB + r"(?:all |each |every )?employee ids? (?:are|is) unique", TASK_VERB + r"(?:there are )?no duplicated? employee ids?")),
+    Rule("duplicate_bank_accounts", "Bank accounts are not shared between employees", ("bank_account",),
+         [{"duplicate", "duplicated", "unique", "uniqueness", "shared", "same"}, {"bank", "account", "iban"}], check_duplicate_bank_accounts,
+         (TASK_VERB + r"(?:no bank account (?:is )?shared|bank accounts (?:are )?not shared) (?:between|by) (?:more than one |multiple |two or more )?employees",
+          TASK_VERB + r"(?:there are )?no duplicated? bank accounts?")),
+]
+
+
+def rules_for_task(task: str) -> List[Rule]:
+    return [rule for rule in RULES if rule.matches(task)]
+
+
+def task_columns(task: str, columns: List[str]) -> List[str]:
+    # The columns the checks matching the task would read, so a projected table still holds what they compare
+    resolved = resolve_columns(columns)
+    return list(dict.fromkeys(resolved[role] for rule in rules_for_task(task) for role in rule.roles if role in resolved))
+
+
+def run_rule(rule: Rule, table: PayrollTable) -> RuleFinding:
+    checked, failed, describe = rule.check(table)
+    failing_positions = np.flatnonzero(failed)
+    return RuleFinding(
+        rule_id=rule.rule_id,
+        description=rule.description,
+        file_name=table.file_name,
+        sheet=table.sheet,
+        columns=[table.columns[role] for role in rule.roles],
+        checked_rows=int(checked.sum()),
+        failing_rows=[int(row) for row in table.row_numbers[failing_positions]],
+        examples=[f"Row {table.row_numbers[i]}: {describe(i)}" for i in failing_positions[:RULES_MAX_EXAMPLES]],
+    )
+
+
+def find_file_paths(data_path: str) -> Dict[str, str]:
+    paths = {}
+    for root, _, files in os.walk(data_path):
+        for filename in files:
+            paths.setdefault(filename, os.path.join(root, filename))
+    return paths
+
+
+def run_rules(data_path: str, file_names: List[str], rules: List[Rule]) -> List[RuleFinding]:
+    """
+    Run the given rules over every table found in the named files; rules only run on tables that have all the columns they need.
+    """
+    paths = find_file_paths(data_path)
+    findings = []
+    for file_name in file_names:
+        if file_name not in paths:
+            continue
+        try:
+            tables = load_tables(paths[file_name], file_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load {file_name} for rule checks: {str(e)}")
+            continue
+
+        for table in tables:
+            for rule in rules:
+                if table.has(*rule.roles):
+                    findings.append(run_rule(rule, table))
+    return findings
+
+
+def format_findings(findings: List[RuleFinding]) -> str:
+    lines = []
+    for finding in findings:
+        location = finding.file_name + (f" / sheet {finding.sheet}" if finding.sheet else "")
+        status = "PASS" if not finding.failing_rows else f"FAIL ({len(finding.failing_rows)} rows)"
+        lines.append(f"- {finding.description} [{location}; columns: {', '.join(finding.columns)}]: {status}, {finding.checked_rows} rows checked")
+        if finding.failing_rows:
+            lines.append(f"  Failing rows: {', '.join(str(row) for row in finding.failing_rows[:200])}" + (" ..." if len(finding.failing_rows) > 200 else ""))
+            lines += [f"  {example}" for example in finding.examples]
+    return "\n".join(lines)
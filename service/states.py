@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List
+from pydantic.json_schema import SkipJsonSchema
+from typing import Annotated, List
+from service.document_store import document_store
 
 
 
@@ -8,24 +10,89 @@ class DocMetadata(BaseModel):
     purpose: str = Field(description="The purpose of the document", default="")
     possible_use_cases: str = Field(description="The possible use cases of the document", default="")
 
-class DocumentWithMetadata(BaseModel):
+class StoredContent(BaseModel):
+    doc_id: str = Field(description="The ID of the document text in the document store", default="")
+
+    @property
+    def content(self) -> str:
+        # Only the ID is kept in state and checkpoints; the text is loaded from the document store on use
+        return document_store.get(self.doc_id)
+
+class DocumentWithMetadata(StoredContent):
     name: str = Field(description="The name of the document", default="")
     purpose: str = Field(description="The purpose of the document", default="")
     possible_use_cases: str = Field(description="The possible use cases of the document", default="")
-    content: str = Field(description="The content of the document", default="")
+    file_index: int = Field(description="The position of the document in the parsed file list", default=0)
+
+class ParsedFile(StoredContent):
+    file_name: str = Field(description="The name of the file", default="")
+
+class FileMetadataInput(BaseModel):
+    file_index: int = Field(description="The position of the file in the parsed file list", default=0)
+    file: ParsedFile = Field(description="The file to extract metadata from", default=ParsedFile())
+
+def merge_documents(current: List[DocumentWithMetadata], update: List[DocumentWithMetadata]) -> List[DocumentWithMetadata]:
+    # An empty update comes from a fresh run on an existing thread and clears previous documents
+    if not update:
+        return []
+    merged = {doc.file_index: doc for doc in current}
+    merged.update({doc.file_index: doc for doc in update})
+    return [merged[index] for index in sorted(merged)]
 
 class Tasks(BaseModel):
     tasks: List[str] = Field(description="The tasks to be executed", default=[])
 
+class TaskDocumentSelection(BaseModel):
+    document_names: List[str] = Field(description="The file names of the documents required to execute the task", default=[])
+
 class DocumentToTaskMapper(BaseModel):
     docs: List[DocumentWithMetadata] = Field(description="The documents that are most relevant to the task", default=[])
     task: str = Field(description="The description of the task", default="")
 
+class TaskDocuments(BaseModel):
+    task_number: int = Field(description="The number of the task as given in the task list", default=0)
+    document_names: List[str] = Field(description="The file names of the documents required to execute the task", default=[])
+
+class TaskDocumentAssignments(BaseModel):
+    assignments: List[TaskDocuments] = Field(description="The documents required for each task, one entry per task", default=[])
+
+class RoutedTaskDocuments(BaseModel):
+    task_number: int = Field(description="The number of the task as given in the task list", default=0)
+    document_names: List[str] = Field(description="The file names of the documents that are clearly required to execute the task", default=[])
+    ambiguous_document_names: List[str] = Field(description="The file names of the documents whose relevance to the task cannot be decided from their metadata and sample alone", default=[])
+
+class TaskDocumentRouting(BaseModel):
+    assignments: List[RoutedTaskDocuments] = Field(description="The routing decision for each task, one entry per task", default=[])
+
 class ExecutionAgent(BaseModel):
     task: str = Field(description="The description of the task", default="")
     output: str = Field(description="The output of the task", default="")
     pass_or_fail: str = Field(description="PASS if the task is executed successfully, FAIL if the task is not executed successfully", default="")
     file_name: str = Field(description="The name of the file", default="")
+    task_index: SkipJsonSchema[int] = Field(description="The position of the task in the parsed task list", default=0)
+
+class RuleFinding(BaseModel):
+    rule_id: str = Field(description="The identifier of the deterministic check", default="")
+    description: str = Field(description="What the check verifies", default="")
+    file_name: str = Field(description="The name of the file the check ran on", default="")
+    sheet: str = Field(description="The sheet the check ran on, empty for CSV files", default="")
+    columns: List[str] = Field(description="The columns the check used", default=[])
+    checked_rows: int = Field(description="The number of rows that had every value the check needs", default=0)
+    failing_rows: List[int] = Field(description="The row numbers that failed the check", default=[])
+    examples: List[str] = Field(description="Explanations for the first failing rows", default=[])
+
+class TaskExecutionInput(BaseModel):
+    task_index: int = Field(description="The position of the task in the parsed task list", default=0)
+    item: DocumentToTaskMapper = Field(description="The task and the documents selected for it", default=DocumentToTaskMapper())
+    rule_findings: List[RuleFinding] = Field(description="The deterministic check results that apply to the task", default=[])
+
+def merge_execution_outputs(current: List[ExecutionAgent], update: List[ExecutionAgent]) -> List[ExecutionAgent]:
+    # An empty update comes from a fresh run on an existing thread and clears previous results
+    if not update:
+        return []
+    merged = {item.task_index: item for item in current}
+    merged.update({item.task_index: item for item in update})
+    return [merged[index] for index in sorted(merged)]
 
 class Reporter(BaseModel):
     output: str = Field(description="The output of the task", default="")
@@ -39,11 +106,13 @@ class State(BaseModel):
     tasks_raw: str = Field(description="The raw tasks", default="") #input
 
 
-    docs_content_with_metadata: List[DocumentWithMetadata] = Field(description="The content of the documents with metadata", default=[])
+    parsed_files: List[ParsedFile] = Field(description="The parsed content of the files", default=[])
+    docs_content_with_metadata: Annotated[List[DocumentWithMetadata], merge_documents] = Field(description="The content of the documents with metadata", default=[])
     tasks_parsed: Tasks = Field(description="The parsed tasks", default=Tasks(tasks=[]))
     
     document_to_task_mapper: List[DocumentToTaskMapper] = Field(description="The documents selected for the tasks", default=[])
-    execution_task_output: List[ExecutionAgent] = Field(description="The execution agent", default=[])
+    rule_findings: List[RuleFinding] = Field(description="The deterministic check results over the mapped tables", default=[])
+    execution_task_output: Annotated[List[ExecutionAgent], merge_execution_outputs] = Field(description="The execution agent", default=[])
 
     reflector: str = Field(description="The reflector", default="")
     reporter: str = Field(description="The reporter", default="")
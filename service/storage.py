@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict
+
+from redis import Redis
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_MIRROR_DIR = os.getenv("STORAGE_MIRROR_DIR", "cache/sessions")
+STORAGE_TTL_SECONDS = int(os.getenv("STORAGE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+MANIFEST_NAME = ".manifest.json"
+
+
+class LocalFileStore:
+    """
+    Session files on the local filesystem. Several hosts can share it by mounting the same
+    directory (NFS, SMB, ...) at the data path.
+    """
+
+    def put(self, data_path: str, file_name: str, data: bytes) -> str:
+        os.makedirs(data_path, exist_ok=True)
+        file_path = os.path.join(data_path, file_name)
+        with open(file_path, "wb") as f:
+            f.write(data)
+        return file_path
+
+    def local_path(self, data_path: str) -> str:
+        return data_path
+
+
+class RedisFileStore:
+    """
+    Session files kept in Redis so any worker host can reach them. Each host mirrors a session
+    into a local directory on first use, and re-downloads only files whose content changed.
+    """
+
+    def __init__(self, redis_client: Redis, mirror_dir: str, ttl_seconds: int):
+        self.redis = redis_client
+        self.mirror_dir = mirror_dir
+        self.ttl_seconds = ttl_seconds
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _key(self, data_path: str) -> str:
+        return f"audit:files:{os.path.normpath(data_path)}"
+
+    def put(self, data_path: str, file_name: str, data: bytes) -> str:
+        key = self._key(data_path)
+        with self.redis.pipeline() as pipe:
+            pipe.hset(key, file_name, data)
+            pipe.hset(f"{key}:digests", file_name, hashlib.sha256(data).hexdigest())
+            pipe.expire(key, self.ttl_seconds)
+            pipe.expire(f"{key}:digests", self.ttl_seconds)
+            pipe.execute()
+        return f"{data_path}/{file_name}"
+
+    def _lock_for(self, data_path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(data_path, threading.Lock())
+
+    def local_path(self, data_path: str) -> str:
+        key = self._key(data_path)
+        mirror = os.path.join(self.mirror_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+        manifest_path = os.path.join(mirror, MANIFEST_NAME)
+
+        with self._lock_for(data_path):
+            digests = {name.decode("utf-8"): digest.decode("utf-8") for name, digest in self.redis.hgetall(f"{key}:digests").items()}
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    mirrored = json.load(f)
+            except (OSError, ValueError):
+                mirrored = {}
+
+            if mirrored == digests:
+                return mirror
+
+            os.makedirs(mirror, exist_ok=True)
+            changed = [name for name, digest in digests.items() if mirrored.get(name) != digest]
+            for name in changed:
+                data = self.redis.hget(key, name)
+                if data is None:
+                    continue
+                tmp_path = os.path.join(mirror, f".{name}.tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(mirror, name))
+            for name in set(mirrored) - set(digests):
+                try:
+                    os.remove(os.path.join(mirror, name))
+                except OSError:
+                    pass
+
+            tmp_manifest = f"{manifest_path}.tmp"
+            with open(tmp_manifest, "w", encoding="utf-8") as f:
+                json.dump(digests, f)
+            os.replace(tmp_manifest, manifest_path)
+            logger.info(f"📦 Mirrored {len(changed)} changed files of {data_path} to {mirror}")
+            return mirror
+
+
+def build_file_store():
+    if STORAGE_BACKEND == "redis":
+        return RedisFileStore(Redis.from_url(os.getenv("REDIS_URI")), STORAGE_MIRROR_DIR, STORAGE_TTL_SECONDS)
+    return LocalFileStore()
+
+
+file_store = build_file_store()
+
+
+def local_data_path(data_path: str) -> str:
+    """
+    Resolve a session's data path to a directory readable on this host.
+    """
+    return file_store.local_path(data_path)
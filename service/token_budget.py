@@ -0,0 +1,209 @@
+import os
+import threading
+from functools import lru_cache
+from typing import Awaitable, Callable, List, Sequence, TypeVar
+
+from service.chunking import CHUNK_ROWS, chunk_table_content, render_chunks
+from service.documents import content_sample
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "0"))
+MODEL_OUTPUT_RESERVE_TOKENS = int(os.getenv("MODEL_OUTPUT_RESERVE_TOKENS", "25000"))
+TOKEN_BUDGET_MARGIN = float(os.getenv("TOKEN_BUDGET_MARGIN", "0.9"))
+
+# Longest matching prefix wins; MODEL_CONTEXT_TOKENS overrides the lookup for models not listed here
+CONTEXT_WINDOWS = {
+    "gpt-5": 400000,
+    "gpt-4.1": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o4-mini": 200000,
+    "o3": 200000,
+    "o1-mini": 128000,
+    "o1": 200000,
+}
+DEFAULT_CONTEXT_TOKENS = 128000
+
+CHARS_PER_TOKEN = 4
+EXACT_ESTIMATE_CHARS = 200000
+MAX_SPLIT_DEPTH = 8
+CONTEXT_OVERFLOW_MARKERS = ("context_length_exceeded", "maximum context length", "context window", "too many tokens", "string_above_max_length")
+
+_encoding_lock = threading.Lock()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def context_window(model_name: str) -> int:
+    if MODEL_CONTEXT_TOKENS > 0:
+        return MODEL_CONTEXT_TOKENS
+    name = (model_name or "").lower()
+    matches = [prefix for prefix in CONTEXT_WINDOWS if name.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_TOKENS
+
+
+def input_budget(model_name: str) -> int:
+    """
+    Tokens a single request may spend on its input, after reserving room for the (reasoning) output.
+    The reserve is capped at a quarter of the context window, so a reserve sized for large reasoning
+    models does not leave a small window like gpt-4's with no room for input.
+    """
+    window = context_window(model_name)
+    reserve = min(MODEL_OUTPUT_RESERVE_TOKENS, window // 4)
+    budget = int((window - reserve) * TOKEN_BUDGET_MARGIN)
+    if budget <= 0:
+        raise ValueError(f"No input budget for {model_name}: context window {window}, output reserve {reserve}, margin {TOKEN_BUDGET_MARGIN}")
+    return budget
+
+
+def encoding_for(model_name: str):
+    if tiktoken is None:
+        return None
+    # Parallel nodes would otherwise each try to load (and download) the encoding on first use
+    with _encoding_lock:
+        return load_encoding(model_name)
+
+
+@lru_cache(maxsize=8)
+def load_encoding(model_name: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its encodings on first use, which fails on hosts without internet access
+        logger.warning(f"⚠️ Could not load a tokenizer for {model_name}, estimating {CHARS_PER_TOKEN} characters per token: {str(e)}")
+        return None
+
+
+def estimate_tokens(text: str, model_name: str) -> int:
+    encoding = encoding_for(model_name or "")
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    if len(text) <= EXACT_ESTIMATE_CHARS:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Very large texts are extrapolated from an exact count of their start, which is close enough to plan with
+    sample = text[:EXACT_ESTIMATE_CHARS]
+    return int(len(encoding.encode(sample, disallowed_special=())) * len(text) / len(sample)) + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
+    tokens = estimate_tokens(text, model_name)
+    if tokens <= max_tokens:
+        return text
+    max_chars = int(len(text) * max_tokens / tokens)
+    truncated = content_sample(text, max_chars)
+    while truncated and estimate_tokens(truncated, model_name) > max_tokens:
+        truncated = content_sample(truncated, int(len(truncated) * 0.9))
+    return truncated
+
+
+def split_lines(content: str, max_tokens: int, model_name: str) -> List[str]:
+    total = estimate_tokens(content, model_name)
+    max_chars = max(1, int(len(content) * max_tokens / total))
+    parts = []
+    rest = content
+    while rest:
+        part = content_sample(rest, max_chars)
+        parts.append(part)
+        rest = rest[len(part):].lstrip("\n")
+    return parts
+
+
+def split_content(content: str, max_tokens: int, model_name: str) -> List[str]:
+    """
+    Split text into parts of at most max_tokens. Parsed tables are split on row-range chunks and
+    every part repeats its sheet and header row; other text is split on line boundaries.
+    """
+    if estimate_tokens(content, model_name) <= max_tokens:
+        return [content]
+
+    chunks = chunk_table_content(content)
+    if not chunks:
+        return split_lines(content, max_tokens, model_name)
+
+    # Sized as rendered, header included, so a full pack does not spill over the budget once its header is added
+    sizes = [estimate_tokens(render_chunks([chunk]), model_name) for chunk in chunks]
+    if max(sizes) > max_tokens:
+        # Wide rows: chunk again with fewer rows each, so every part still carries its header
+        chunks = chunk_table_content(content, max(1, int(CHUNK_ROWS * max_tokens / max(sizes) * 0.9)))
+        sizes = [estimate_tokens(render_chunks([chunk]), model_name) for chunk in chunks]
+
+    parts = []
+    for pack in pack_by_budget(list(chunks), sizes, max_tokens):
+        part = render_chunks(pack)
+        # A single row can still be too wide for the budget on its own
+        parts += split_lines(part, max_tokens, model_name) if estimate_tokens(part, model_name) > max_tokens else [part]
+    return parts
+
+
+def pack_by_budget(items: Sequence[T], sizes: Sequence[int], budget: int) -> List[List[T]]:
+    """
+    Group items into packs whose sizes add up to at most budget. Items are placed in priority order,
+    each into the first pack with room, so the highest-priority items share the first call.
+    An item larger than the budget gets a pack of its own.
+    """
+    packs: List[List[T]] = []
+    room: List[int] = []
+    for item, size in zip(items, sizes):
+        for i in range(len(packs)):
+            if size <= room[i]:
+                packs[i].append(item)
+                room[i] -= size
+                break
+        else:
+            packs.append([item])
+            room.append(budget - size)
+    return packs
+
+
+def is_context_overflow(e: Exception) -> bool:
+    if getattr(e, "code", None) == "context_length_exceeded":
+        return True
+    message = str(e).lower()
+    return any(marker in message for marker in CONTEXT_OVERFLOW_MARKERS)
+
+
+def call_with_split(run: Callable[[List[T]], R], items: List[T], split: Callable[[List[T]], List[List[T]]], depth: int = 0) -> List[R]:
+    """
+    Run one call over items. When the model rejects it for exceeding the context, split the items
+    and run each part on its own, recursively. Returns one result per call that succeeded.
+    """
+    try:
+        return [run(items)]
+    except Exception as e:
+        if not is_context_overflow(e) or depth >= MAX_SPLIT_DEPTH:
+            raise
+        parts = split(items)
+        if parts == [items]:
+            raise
+        logger.warning(f"✂️ Context overflow, retrying with smaller input in {len(parts)} call(s)")
+        return [result for part in parts for result in call_with_split(run, part, split, depth + 1)]
+
+
+async def acall_with_split(run: Callable[[List[T]], Awaitable[R]], items: List[T], split: Callable[[List[T]], List[List[T]]], depth: int = 0) -> List[R]:
+    try:
+        return [await run(items)]
+    except Exception as e:
+        if not is_context_overflow(e) or depth >= MAX_SPLIT_DEPTH:
+            raise
+        parts = split(items)
+        if parts == [items]:
+            raise
+        logger.warning(f"✂️ Context overflow, retrying with smaller input in {len(parts)} call(s)")
+        results = []
+        for part in parts:
+            results += await acall_with_split(run, part, split, depth + 1)
+        return results
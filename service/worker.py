@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from typing import Dict, List, Optional
+
+from service.jobs import job_store
+from service.graph import stream
+from service.logger import logger
+
+import dotenv
+dotenv.load_dotenv()
+
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "4")))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_INPROCESS_WORKERS = int(os.getenv("JOB_INPROCESS_WORKERS", "0"))
+
+
+def run_job(store, job: dict, worker_id: str, lease_lost: Optional[threading.Event] = None):
+    # A job claimed again after its lease expired continues from the last checkpoint of its thread
+    resume = job["attempts"] > 1
+    logger.info(f"🏃 Worker {worker_id} {'resuming' if resume else 'running'} audit job {job['id']} on thread {job['thread_id']}")
+    result = None
+    events = stream(job["thread_id"], job["data_path"], job["tasks"], resume=resume)
+    try:
+        for event in events:
+            if lease_lost is not None and lease_lost.is_set():
+                logger.warning(f"⚠️ Worker {worker_id} lost the lease on audit job {job['id']}, abandoning it")
+                return
+            if event["event"] == "result":
+                result = event["result"]
+                continue
+            try:
+                store.record_event(job["id"], event)
+            except Exception as e:
+                # Progress is only for watchers; losing an update must not fail a healthy audit
+                logger.error(f"❌ Could not record a {event['event']} event for audit job {job['id']}: {str(e)}")
+    except Exception as e:
+        logger.error(f"❌ Audit job {job['id']} crashed: {str(e)}")
+        result = {"success": False, "error": str(e), "execution_time": time.time() - job["started_at"]}
+    finally:
+        events.close()
+
+    store.finish(job["id"], result or {"success": False, "error": "The audit finished without a result"}, worker_id)
+
+
+class JobWorkerPool:
+    """
+    Fixed set of threads that claim queued jobs from the store and run them to completion.
+    A heartbeat thread renews the leases of running jobs and takes over jobs whose worker died,
+    so pools on any number of hosts can share one Redis job store.
+    """
+
+    def __init__(self, store, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS, heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS):
+        self.store = store
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.pool_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Dict[str, tuple] = {}
+        self._active_lock = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        logger.info(f"👷 Starting {self.workers} audit job workers as {self.pool_id} (polling every {self.poll_seconds}s)")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(f"{self.pool_id}/{i + 1}",), name=f"audit-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="audit-worker-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                self._work_once(worker_id)
+            except Exception:
+                # A job store outage must not end the thread, or the pool would shrink silently
+                logger.exception(f"❌ Worker {worker_id} failed, polling again")
+                self._stop.wait(self.poll_seconds)
+
+    def _work_once(self, worker_id: str):
+        try:
+            job = self.store.claim(worker_id)
+        except Exception as e:
+            logger.error(f"❌ Could not claim a job: {str(e)}")
+            job = None
+
+        if job is None:
+            self._stop.wait(self.poll_seconds)
+            return
+
+        lease_lost = threading.Event()
+        with self._active_lock:
+            self._active[job["id"]] = (worker_id, lease_lost)
+        try:
+            run_job(self.store, job, worker_id, lease_lost)
+        finally:
+            with self._active_lock:
+                self._active.pop(job["id"], None)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._active_lock:
+                active = list(self._active.items())
+            for job_id, (worker_id, lease_lost) in active:
+                try:
+                    if not self.store.heartbeat(job_id, worker_id):
+                        lease_lost.set()
+                except Exception as e:
+                    logger.error(f"❌ Heartbeat for audit job {job_id} failed: {str(e)}")
+            try:
+                self.store.reclaim_expired()
+            except Exception as e:
+                logger.error(f"❌ Could not reclaim expired jobs: {str(e)}")
+
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def ensure_local_workers(workers: int = JOB_INPROCESS_WORKERS):
+    """
+    Start a worker pool inside the calling process once, for setups without a separate worker process.
+    Does nothing when workers is 0.
+    """
+    global _local_pool
+    if workers <= 0:
+        return None
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = JobWorkerPool(job_store, workers)
+            _local_pool.start()
+        return _local_pool
+
+
+def main():
+    pool = JobWorkerPool(job_store)
+    pool.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopping audit job workers...")
+        pool.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
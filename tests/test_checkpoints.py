@@ -0,0 +1,92 @@
+import asyncio
+import os
+import unittest
+import uuid
+from unittest import mock
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.redis.jsonplus_redis import JsonPlusRedisSerializer
+from redis import Redis
+from redis.exceptions import ConnectionError
+
+# The model clients are created at import time; they are never called here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MODEL_NAME", "gpt-4o")
+
+from service import graph
+from service.checkpoints import CompactRedisSaver, CompactSerializer
+from service.states import DocumentWithMetadata
+
+# The saver round trip needs Redis with the search and JSON modules (Redis Stack), e.g. redis://localhost:6379
+TEST_REDIS_URI = os.getenv("TEST_REDIS_URI")
+
+VALUES = {
+    "docs_content_with_metadata": [DocumentWithMetadata(name=f"payroll_{i}.csv", purpose="Payroll register", doc_id=str(i)) for i in range(50)],
+    "tasks": ["Check overtime approvals"] * 20,
+    "reporter": "",
+}
+
+
+class CompactSerializerTest(unittest.TestCase):
+    def test_round_trip_for_each_encoding(self):
+        for compression in ("zstd", "zlib", "raw"):
+            serde = CompactSerializer(compression=compression, min_bytes=256)
+            for value in VALUES.values():
+                type_, blob = serde.dumps_typed(value)
+                self.assertEqual(serde.loads_typed((type_, blob)), value)
+
+    def test_small_values_are_not_compressed(self):
+        serde = CompactSerializer(compression="zstd", min_bytes=256)
+        self.assertEqual(serde.dumps_typed("short")[0], "raw_msgpack")
+        self.assertEqual(serde.dumps_typed(VALUES["docs_content_with_metadata"])[0], "zstd_msgpack")
+
+    def test_values_written_by_the_default_serializer_still_load(self):
+        type_, blob = JsonPlusRedisSerializer().dumps_typed({"tasks": ["Check overtime approvals"]})
+        self.assertEqual(CompactSerializer().loads_typed((type_, blob)), {"tasks": ["Check overtime approvals"]})
+
+
+class CompactRedisSaverTest(unittest.TestCase):
+    def test_blobs_load_through_the_library(self):
+        # _dump_blobs overrides a private helper, so its output must keep loading through the library's own reader
+        saver = CompactRedisSaver(redis_client=Redis())
+        versions = {"docs_content_with_metadata": "1", "tasks": "1", "reporter": "1", "removed": "1"}
+        blobs = saver._dump_blobs("thread", "", VALUES, versions)
+        self.assertEqual(saver._load_blobs({blob["channel"]: blob for _, blob in blobs}), VALUES)
+
+    @unittest.skipUnless(TEST_REDIS_URI, "TEST_REDIS_URI is not set")
+    def test_put_get_round_trip(self):
+        saver = CompactRedisSaver(redis_client=Redis.from_url(TEST_REDIS_URI))
+        saver.setup()
+        config = {"configurable": {"thread_id": f"test-{uuid.uuid4()}", "checkpoint_ns": ""}}
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = dict(VALUES)
+        checkpoint["channel_versions"] = {channel: saver.get_next_version(None, None) for channel in VALUES}
+
+        saved_config = saver.put(config, checkpoint, {"source": "input", "step": -1}, checkpoint["channel_versions"])
+        loaded = saver.get_tuple(saved_config)
+
+        self.assertEqual(loaded.checkpoint["id"], checkpoint["id"])
+        self.assertEqual(loaded.checkpoint["channel_values"], VALUES)
+
+
+@mock.patch.dict(os.environ, {"REDIS_URI": "redis://localhost:6379"})
+class CreateCheckpointerTest(unittest.TestCase):
+    def test_pool_is_disconnected_when_redis_is_unreachable(self):
+        pool = mock.Mock()
+        with mock.patch.object(graph.ConnectionPool, "from_url", return_value=pool), mock.patch.object(graph, "Redis") as redis:
+            redis.return_value.ping.side_effect = ConnectionError("connection refused")
+            with self.assertRaises(ConnectionError):
+                graph.create_checkpointer()
+        pool.disconnect.assert_called_once_with()
+
+    def test_async_pool_is_disconnected_when_redis_is_unreachable(self):
+        pool = mock.AsyncMock()
+        with mock.patch.object(graph.AsyncConnectionPool, "from_url", return_value=pool), mock.patch.object(graph, "AsyncRedis") as redis:
+            redis.return_value.ping = mock.AsyncMock(side_effect=ConnectionError("connection refused"))
+            with self.assertRaises(ConnectionError):
+                asyncio.run(graph.acreate_checkpointer())
+        pool.disconnect.assert_awaited_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
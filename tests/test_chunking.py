@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+
+from service import chunking
+from service.chunking import chunk_table_content, select_relevant_rows
+
+
+def payroll_table(rows: int, rare_rows=()) -> str:
+    lines = ["Row 1,Employee ID,Department,Gross Pay,Net Pay"]
+    for i in range(2, rows + 2):
+        department = "Treasury" if i in rare_rows else "Operations"
+        lines.append(f"Row {i},E{i:05d},{department},{1000 + i}.00,{800 + i}.00")
+    return "\n".join(lines)
+
+
+class ChunkTableContentTest(unittest.TestCase):
+    def test_chunks_carry_header_and_row_numbers(self):
+        chunks = chunk_table_content(payroll_table(450), rows_per_chunk=200)
+        self.assertEqual([(chunk.start_row, chunk.end_row) for chunk in chunks], [(2, 201), (202, 401), (402, 451)])
+        self.assertTrue(all(chunk.header.startswith("Row 1,Employee ID") for chunk in chunks))
+
+    def test_non_table_content_is_not_chunked(self):
+        self.assertIsNone(chunk_table_content("Quarterly memo\nNothing tabular here"))
+
+    def test_cache_is_keyed_by_hash_and_bounded(self):
+        for i in range(chunking.CHUNK_CACHE_ENTRIES + 5):
+            chunk_table_content(payroll_table(10 + i))
+        self.assertEqual(len(chunking._chunk_cache), chunking.CHUNK_CACHE_ENTRIES)
+        self.assertTrue(all(isinstance(digest, str) and len(digest) == 64 for digest, _ in chunking._chunk_cache))
+
+
+@mock.patch.object(chunking, "CHUNKING_MIN_CHARS", 0)
+@mock.patch.object(chunking, "CHUNK_ROWS", 100)
+class SelectRelevantRowsTest(unittest.TestCase):
+    def test_small_tables_are_sent_whole(self):
+        with mock.patch.object(chunking, "CHUNKING_MIN_CHARS", 10 ** 9):
+            self.assertIsNone(select_relevant_rows("Check Treasury gross pay", payroll_table(1000)))
+
+    def test_filtered_rows_come_with_an_omitted_rows_note(self):
+        content = payroll_table(1000, rare_rows=set(range(2, 302)))
+        with mock.patch.object(chunking, "chunk_table_content", lambda c: chunking.chunk_table_rows(chunking.iter_lines(c), 100)):
+            selected = select_relevant_rows("Check gross pay for Treasury employees", content)
+        first_line = selected.splitlines()[0]
+        self.assertIn("this table is incomplete", first_line)
+        self.assertIn("300 of 1000 data rows", first_line)
+        self.assertIn("Omitted: rows 302-1001 (700 rows)", first_line)
+        self.assertIn("[Rows 2-101]", selected)
+        self.assertNotIn("Row 500,", selected)
+
+    def test_falls_back_when_the_filter_keeps_too_few_rows(self):
+        content = payroll_table(2000, rare_rows={5})
+        with mock.patch.object(chunking, "chunk_table_content", lambda c: chunking.chunk_table_rows(chunking.iter_lines(c), 100)):
+            selected = select_relevant_rows("Check Treasury net pay", content)
+        # Only 1 of 20 chunks matches "treasury", so the rows are kept and only the named columns are projected
+        self.assertIn("Only the columns named in the task or read by its checks are included", selected)
+        self.assertIn("Row 500,", selected)
+        self.assertIn("omitted columns Department.", selected)
+
+    def test_columns_are_only_projected_when_the_table_does_not_fit(self):
+        content = payroll_table(2000, rare_rows={5})
+        with mock.patch.object(chunking, "chunk_table_content", lambda c: chunking.chunk_table_rows(chunking.iter_lines(c), 100)):
+            self.assertIsNone(select_relevant_rows("Check Treasury net pay", content, fits_budget=True))
+
+    def test_projection_keeps_the_columns_the_checks_read(self):
+        content = payroll_table(2000, rare_rows={5})
+        with mock.patch.object(chunking, "chunk_table_content", lambda c: chunking.chunk_table_rows(chunking.iter_lines(c), 100)):
+            selected = select_relevant_rows("Check Treasury net pay", content, check_columns=lambda columns: ["Gross Pay"])
+        self.assertIn("Row 1,Employee ID,Gross Pay,Net Pay", selected)
+        self.assertIn("omitted columns Department.", selected)
+
+    def test_full_table_when_nothing_narrows_it_down(self):
+        content = payroll_table(2000, rare_rows={5})
+        with mock.patch.object(chunking, "chunk_table_content", lambda c: chunking.chunk_table_rows(chunking.iter_lines(c), 100)):
+            self.assertIsNone(select_relevant_rows("Treasury approvals", content))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import tempfile
+import unittest
+
+from service.document_store import DocumentStore
+
+
+class DocumentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = DocumentStore(tempfile.mkdtemp(), ttl_seconds=3600, memory_chars=100)
+
+    def test_ids_are_content_addressed(self):
+        doc_id = self.store.put("payroll register")
+        self.assertEqual(self.store.put("payroll register"), doc_id)
+        self.assertEqual(self.store.get(doc_id), "payroll register")
+        self.assertEqual(self.store.get(""), "")
+        with self.assertRaises(KeyError):
+            self.store.get("0" * 64)
+
+    def test_memory_is_bounded_by_characters(self):
+        doc_ids = [self.store.put(str(i) * 40) for i in range(4)]
+        self.assertEqual(list(self.store._memory), doc_ids[2:])
+        self.assertLessEqual(self.store._memory_size, 100)
+        # Evicted documents are still served from disk
+        self.assertEqual(self.store.get(doc_ids[0]), "0" * 40)
+
+    def test_documents_larger_than_the_limit_stay_on_disk_only(self):
+        doc_id = self.store.put("x" * 500)
+        self.assertNotIn(doc_id, self.store._memory)
+        self.assertEqual(self.store._memory_size, 0)
+        self.assertEqual(self.store.get(doc_id), "x" * 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
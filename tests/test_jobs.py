@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+from redis import Redis
+
+from service.jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, LEASE_EXPIRED_ERROR, JobStore, RedisJobStore
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it to run the Lua scripts
+except ImportError:
+    fakeredis = None
+
+# Set to run the Redis store against a real server instead of fakeredis, e.g. redis://localhost:6379
+TEST_REDIS_URI = os.getenv("TEST_REDIS_URI")
+
+
+class LeaseTests:
+    """
+    Lease behaviour both job stores must share; subclasses provide store().
+    """
+
+    def test_jobs_are_claimed_once_in_submission_order(self):
+        store = self.store()
+        first = store.submit("data/a", ["Check overtime"])
+        second = store.submit("data/b", ["Check deductions"])
+
+        job = store.claim("worker-1")
+        self.assertEqual((job["id"], job["status"], job["worker_id"], job["attempts"]), (first, JOB_RUNNING, "worker-1", 1))
+        self.assertEqual(job["thread_id"], first)
+        self.assertEqual(store.claim("worker-2")["id"], second)
+        self.assertIsNone(store.claim("worker-3"))
+
+    def test_heartbeat_and_finish_require_the_lease(self):
+        store = self.store()
+        job_id = store.submit("data/a", ["Check overtime"])
+        store.claim("worker-1")
+
+        self.assertTrue(store.heartbeat(job_id, "worker-1"))
+        self.assertFalse(store.heartbeat(job_id, "worker-2"))
+        self.assertFalse(store.finish(job_id, {"success": True}, "worker-2"))
+        self.assertTrue(store.finish(job_id, {"success": True}, "worker-1"))
+        self.assertEqual(store.get(job_id)["status"], JOB_SUCCEEDED)
+        self.assertFalse(store.heartbeat(job_id, "worker-1"))
+
+    def test_expired_leases_are_queued_again(self):
+        # A negative lease is already expired when it is granted
+        store = self.store(lease_seconds=-1)
+        job_id = store.submit("data/a", ["Check overtime"])
+        store.claim("worker-1")
+
+        self.assertEqual(store.reclaim_expired(), 1)
+        self.assertEqual(store.get(job_id)["status"], JOB_QUEUED)
+        self.assertEqual(store.claim("worker-2")["attempts"], 2)
+        # The first worker's late result must not overwrite the run that took over
+        self.assertFalse(store.finish(job_id, {"success": True}, "worker-1"))
+
+    def test_jobs_out_of_attempts_fail(self):
+        store = self.store(lease_seconds=-1, max_attempts=2)
+        job_id = store.submit("data/a", ["Check overtime"])
+        for worker_id in ("worker-1", "worker-2"):
+            store.claim(worker_id)
+            store.reclaim_expired()
+
+        job = store.get(job_id)
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertEqual(job["result"], {"success": False, "error": LEASE_EXPIRED_ERROR})
+        self.assertIsNone(store.claim("worker-3"))
+
+    def test_events_are_recorded(self):
+        store = self.store()
+        job_id = store.submit("data/a", ["Check overtime"])
+        store.record_event(job_id, {"event": "task_result", "task_index": 0, "pass_or_fail": "PASS"})
+        store.record_event(job_id, {"event": "progress", "stage": "execute", "done": 1, "total": 1})
+
+        job = store.get(job_id)
+        self.assertEqual(job["partial_results"], [{"event": "task_result", "task_index": 0, "pass_or_fail": "PASS"}])
+        self.assertEqual(job["progress"]["done"], 1)
+
+
+class JobStoreLeaseTest(LeaseTests, unittest.TestCase):
+    def store(self, lease_seconds: int = 60, max_attempts: int = 3) -> JobStore:
+        return JobStore(os.path.join(tempfile.mkdtemp(), "jobs.sqlite"), lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+@unittest.skipUnless(TEST_REDIS_URI or fakeredis, "needs TEST_REDIS_URI, or fakeredis with lupa for Lua scripting")
+class RedisJobStoreLeaseTest(LeaseTests, unittest.TestCase):
+    def setUp(self):
+        self.redis = Redis.from_url(TEST_REDIS_URI) if TEST_REDIS_URI else fakeredis.FakeRedis()
+        self.prefix = f"test:jobs:{uuid.uuid4().hex}"
+        self.addCleanup(self.cleanup)
+
+    def cleanup(self):
+        keys = list(self.redis.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self.redis.delete(*keys)
+
+    def store(self, lease_seconds: int = 60, max_attempts: int = 3) -> RedisJobStore:
+        return RedisJobStore(self.redis, lease_seconds=lease_seconds, max_attempts=max_attempts, prefix=self.prefix)
+
+
+if __name__ == "__main__":
+    unittest.main()
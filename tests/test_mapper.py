@@ -0,0 +1,96 @@
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+# The model clients are created at import time; they are replaced here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MODEL_NAME", "gpt-4o")
+
+from service import nodes, states, token_budget
+from service.document_store import DocumentStore
+from service.states import DocumentWithMetadata, RoutedTaskDocuments, TaskDocumentRouting
+
+
+class ContextOverflow(Exception):
+    code = "context_length_exceeded"
+
+
+class FakeRouter:
+    """
+    Routes every task to the payroll files named in the prompt, rejecting prompts over max_chars.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.prompt_sizes = []
+
+    def with_structured_output(self, schema):
+        return self
+
+    def invoke(self, messages):
+        prompt = "".join(message.content for message in messages)
+        if len(prompt) > self.max_chars:
+            raise ContextOverflow("This model's maximum context length is exceeded")
+        self.prompt_sizes.append(len(prompt))
+        names = [name for name in re.findall(r"File Name: (\S+)", prompt) if name.startswith("payroll")]
+        task_numbers = [int(number) for number in re.findall(r"^(\d+)\. Check", prompt, re.MULTILINE)]
+        return TaskDocumentRouting(assignments=[RoutedTaskDocuments(task_number=number, document_names=names) for number in task_numbers])
+
+
+@mock.patch.object(token_budget, "encoding_for", lambda model_name: None)
+class MetadataRouterTest(unittest.TestCase):
+    def setUp(self):
+        store = DocumentStore(tempfile.mkdtemp(), ttl_seconds=3600, memory_chars=10 ** 7)
+        for target in (states, nodes):
+            patcher = mock.patch.object(target, "document_store", store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.docs = [
+            DocumentWithMetadata(
+                name=f"{'payroll' if i % 4 == 0 else 'memo'}_{i}.txt", purpose="Register", possible_use_cases="Audit",
+                doc_id=store.put(f"Document {i}\n" + "Approved and reviewed by finance.\n" * 40), file_index=i,
+            )
+            for i in range(40)
+        ]
+        self.tasks = ["Check overtime approvals", "Check net pay"]
+
+    def route(self, router: FakeRouter, budget_tokens: int):
+        with mock.patch.object(nodes, "model", router), mock.patch.object(nodes, "input_budget", lambda model_name: budget_tokens):
+            return nodes.map_documents_by_metadata(self.tasks, self.docs)
+
+    def test_samples_are_packed_to_the_input_budget(self):
+        router = FakeRouter(max_chars=10 ** 9)
+        mappings = self.route(router, 6000)
+
+        self.assertGreater(len(router.prompt_sizes), 1)
+        self.assertTrue(all(size <= 6000 * token_budget.CHARS_PER_TOKEN for size in router.prompt_sizes))
+        payroll = [doc.name for doc in self.docs if doc.name.startswith("payroll")]
+        self.assertEqual([[doc.name for doc in mapping.docs] for mapping in mappings], [payroll, payroll])
+
+    def test_overflowing_packs_are_split(self):
+        # The budget lets one call take every sample, but the model accepts only a fraction of that
+        router = FakeRouter(max_chars=12000)
+        mappings = self.route(router, 10 ** 6)
+
+        self.assertGreater(len(router.prompt_sizes), 1)
+        self.assertEqual(len(mappings[0].docs), 10)
+
+
+class FakeIndex:
+    def search(self, task: str, top_k: int):
+        return [("payroll_0.txt", 3.2)] if "overtime" in task.lower() else []
+
+
+class RetrievalCandidatesTest(unittest.TestCase):
+    def test_tasks_without_hits_keep_every_document(self):
+        docs = [DocumentWithMetadata(name=name, file_index=i) for i, name in enumerate(["payroll_0.txt", "file_1.txt", "file_2.txt"])]
+        with mock.patch.object(nodes, "load_or_build_index", lambda path, entries: FakeIndex()):
+            candidates = nodes.retrieval_candidates(["Check overtime approvals", "Check net pay"], docs, "data")
+        self.assertEqual([[doc.name for doc in task_docs] for task_docs in candidates], [["payroll_0.txt"], ["payroll_0.txt", "file_1.txt", "file_2.txt"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
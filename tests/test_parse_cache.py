@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from service import parse_cache as parse_cache_module
+from service.parse_cache import ParseCache
+
+
+def cache_files(cache_dir: str) -> list:
+    return sorted(filename for _, _, files in os.walk(cache_dir) for filename in files)
+
+
+def cache_bytes(cache_dir: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, filename)) for root, _, files in os.walk(cache_dir) for filename in files)
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def test_put_and_get(self):
+        cache = ParseCache(self.cache_dir, 10 ** 9)
+        self.assertEqual(cache.put_lines("a" * 64, iter(["header", "row"])), 2)
+        self.assertEqual(cache.get("a" * 64), "header\nrow")
+        self.assertIsNone(cache.get("b" * 64))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_failed_write_leaves_no_files(self):
+        cache = ParseCache(self.cache_dir, 10 ** 9)
+
+        def lines():
+            yield "header"
+            raise ValueError("parser failed")
+
+        with self.assertRaises(ValueError):
+            cache.put_lines("a" * 64, lines())
+        self.assertEqual(cache_files(self.cache_dir), [])
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = ParseCache(self.cache_dir, 1000)
+        for i in range(20):
+            key = f"{i:064x}"
+            cache.put(key, "x" * 100)
+            path = cache._path(key)
+            os.utime(path, (i, i))
+
+        cache.put("f" * 64, "x" * 100)
+        self.assertLessEqual(cache_bytes(self.cache_dir), 1000)
+        self.assertIsNone(cache.read(f"{0:064x}"))
+        self.assertIsNotNone(cache.read("f" * 64))
+
+    def test_running_size_avoids_walking_the_cache_on_every_put(self):
+        cache = ParseCache(self.cache_dir, 50000)
+        with mock.patch.object(parse_cache_module.os, "walk", wraps=os.walk) as walk:
+            for i in range(1000):
+                cache.put(f"{i:064x}", "x" * 100)
+        self.assertLess(walk.call_count, 50)
+        self.assertLessEqual(cache_bytes(self.cache_dir), 50000)
+        self.assertEqual(cache._size, cache_bytes(self.cache_dir))
+
+    def test_overwrite_updates_the_running_size(self):
+        cache = ParseCache(self.cache_dir, 10 ** 9)
+        cache.put("a" * 64, "x" * 500)
+        cache.put("a" * 64, "x" * 100)
+        self.assertEqual(cache._size, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# The vision client is created at import time; it is never called here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import fitz
+
+from service import parsers
+from service.parse_cache import ParseCache
+
+
+def write_pdf(path: str, pages: int):
+    with fitz.open() as doc:
+        for i in range(1, pages + 1):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Page {i} café payroll controls")
+        doc.save(path)
+
+
+class ReadPdfPagesTest(unittest.TestCase):
+    def setUp(self):
+        self.pdf_path = os.path.join(tempfile.mkdtemp(), "policy.pdf")
+        write_pdf(self.pdf_path, 6)
+        self.cache = ParseCache(tempfile.mkdtemp(), 10 ** 9)
+        patcher = mock.patch.object(parsers, "parse_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expected(self, first: int, last: int) -> str:
+        return "".join(parsers.extract_pdf_page_range(self.pdf_path, first - 1, last)).strip()
+
+    def test_cached_documents_are_sliced_by_the_page_index(self):
+        parsers.parse_with_cache(self.pdf_path, ".pdf", self.cache.key_for(self.pdf_path, parsers.PARSER_VERSION))
+        expected = {(first, last): self.expected(first, last) for first, last in [(1, 1), (2, 4), (5, 6), (6, 9)]}
+
+        with mock.patch.object(parsers, "extract_pdf_page_range", side_effect=AssertionError("re-extracted")):
+            for (first, last), text in expected.items():
+                self.assertEqual(parsers.read_pdf_pages(self.pdf_path, first, last), text)
+        self.assertIn("Page 3 café", expected[(2, 4)])
+        self.assertNotIn("Page 5", expected[(2, 4)])
+
+    def test_uncached_documents_extract_only_the_requested_pages(self):
+        with mock.patch.object(parsers, "extract_pdf_page_range", wraps=parsers.extract_pdf_page_range) as extract:
+            text = parsers.read_pdf_pages(self.pdf_path, 2, 3)
+        extract.assert_called_once_with(self.pdf_path, 1, 3)
+        self.assertIn("Page 2 café", text)
+        self.assertNotIn("Page 4", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
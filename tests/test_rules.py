@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# The model clients are created at import time; they are never called here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MODEL_NAME", "gpt-4o")
+
+from service import nodes
+from service.rules import RULES, rules_for_task, run_rules, task_columns
+from service.states import DocumentToTaskMapper, TaskExecutionInput
+
+PAYROLL_CSV = """Payroll export,,,,,,
+Employee ID,Regular Pay,Overtime Pay,Gross Pay,Deductions,Net Pay,Bank Account
+E001,1000,200,1200,200,1000,111
+E002,1000,100,1150,150,1000,222
+E002,900,0,900,100,800,111
+"""
+
+
+def rule(rule_id: str):
+    return next(rule for rule in RULES if rule.rule_id == rule_id)
+
+
+class RuleMatchTest(unittest.TestCase):
+    def test_keywords_select_relevant_rules(self):
+        task = "Verify gross pay equals regular plus overtime"
+        self.assertEqual([rule.rule_id for rule in rules_for_task(task)], ["gross_equals_components"])
+        self.assertEqual(rules_for_task("Summarise the payroll policy"), [])
+
+    def test_exact_phrasing_covers_the_task(self):
+        self.assertTrue(rule("gross_equals_components").covers("Check that gross pay equals regular pay plus overtime pay for all employees."))
+        self.assertTrue(rule("overtime_rate_minimum").covers("Verify the overtime rate is at least 1.5x the regular rate"))
+        self.assertTrue(rule("duplicate_employee_ids").covers("There are no duplicate employee IDs"))
+        self.assertTrue(rule("duplicate_bank_accounts").covers("Ensure no bank account is shared between employees"))
+
+    def test_broader_tasks_match_without_covering(self):
+        task = "Check that gross pay equals regular pay plus overtime pay and that overtime was approved by a manager"
+        self.assertTrue(rule("gross_equals_components").matches(task))
+        self.assertFalse(rule("gross_equals_components").covers(task))
+
+    def test_task_columns_are_the_ones_its_checks_read(self):
+        header = ["Employee ID", "Department", "Gross Pay", "Total Deductions", "Net Pay"]
+        self.assertEqual(task_columns("Check net pay against gross pay for Treasury employees", header), ["Net Pay", "Gross Pay", "Total Deductions"])
+        self.assertEqual(task_columns("Summarise the payroll policy", header), [])
+
+class RunRulesTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.data_dir, "payroll.csv"), "w", encoding="utf-8") as f:
+            f.write(PAYROLL_CSV)
+
+    def findings(self, *rule_ids: str) -> dict:
+        findings = run_rules(self.data_dir, ["payroll.csv", "missing.csv"], [rule(rule_id) for rule_id in rule_ids])
+        return {finding.rule_id: finding for finding in findings}
+
+    def test_failing_rows_use_sheet_row_numbers(self):
+        findings = self.findings("gross_equals_components", "net_equals_gross_minus_deductions")
+        # Rows are numbered as parse_csv does: the header is Row 1 whatever precedes it, so data starts at Row 2
+        self.assertEqual(findings["gross_equals_components"].checked_rows, 3)
+        self.assertEqual(findings["gross_equals_components"].failing_rows, [3])
+        self.assertEqual(findings["net_equals_gross_minus_deductions"].failing_rows, [])
+
+    def test_duplicate_checks(self):
+        findings = self.findings("duplicate_employee_ids", "duplicate_bank_accounts")
+        self.assertEqual(findings["duplicate_employee_ids"].failing_rows, [3, 4])
+        self.assertEqual(findings["duplicate_bank_accounts"].failing_rows, [2, 4])
+
+    def test_rules_without_their_columns_are_skipped(self):
+        self.assertEqual(self.findings("overtime_rate_minimum"), {})
+
+
+class DeterministicExecutionOutputTest(unittest.TestCase):
+    def payload(self, task: str) -> TaskExecutionInput:
+        data_dir = tempfile.mkdtemp()
+        with open(os.path.join(data_dir, "payroll.csv"), "w", encoding="utf-8") as f:
+            f.write(PAYROLL_CSV)
+        findings = run_rules(data_dir, ["payroll.csv"], rules_for_task(task))
+        return TaskExecutionInput(item=DocumentToTaskMapper(task=task), rule_findings=findings)
+
+    def test_assist_mode_never_short_circuits(self):
+        with mock.patch.object(nodes, "RULES_MODE", "assist"):
+            self.assertIsNone(nodes.deterministic_execution_output(self.payload("Net pay equals gross pay minus deductions")))
+
+    def test_auto_mode_only_settles_covered_tasks(self):
+        with mock.patch.object(nodes, "RULES_MODE", "auto"):
+            output = nodes.deterministic_execution_output(self.payload("Gross pay equals regular pay plus overtime pay"))
+            self.assertEqual(output.pass_or_fail, "FAIL")
+            broader = self.payload("Check gross pay equals regular pay plus overtime pay and matches the approved timesheets")
+            self.assertTrue(broader.rule_findings)
+            self.assertIsNone(nodes.deterministic_execution_output(broader))
+
+
+if __name__ == "__main__":
+    unittest.main()
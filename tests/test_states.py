@@ -0,0 +1,36 @@
+import unittest
+
+from service.states import DocumentWithMetadata, ExecutionAgent, merge_documents, merge_execution_outputs
+
+
+def doc(file_index: int, purpose: str = "") -> DocumentWithMetadata:
+    return DocumentWithMetadata(name=f"file_{file_index}.csv", purpose=purpose, file_index=file_index)
+
+
+def output(task_index: int, pass_or_fail: str = "PASS") -> ExecutionAgent:
+    return ExecutionAgent(task=f"task {task_index}", pass_or_fail=pass_or_fail, task_index=task_index)
+
+
+class ReducerTest(unittest.TestCase):
+    def test_documents_are_kept_in_file_order(self):
+        merged = merge_documents([], [doc(2)])
+        merged = merge_documents(merged, [doc(0)])
+        merged = merge_documents(merged, [doc(1)])
+        self.assertEqual([item.file_index for item in merged], [0, 1, 2])
+
+    def test_a_replayed_document_replaces_its_earlier_version(self):
+        # A resumed run re-extracts a file that was not checkpointed, so the same index can arrive twice
+        merged = merge_documents([doc(0, "old"), doc(1)], [doc(0, "new")])
+        self.assertEqual([(item.file_index, item.purpose) for item in merged], [(0, "new"), (1, "")])
+
+    def test_execution_outputs_are_kept_in_task_order(self):
+        merged = merge_execution_outputs([output(1)], [output(0, "FAIL"), output(1, "FAIL")])
+        self.assertEqual([(item.task_index, item.pass_or_fail) for item in merged], [(0, "FAIL"), (1, "FAIL")])
+
+    def test_an_empty_update_clears_the_previous_run(self):
+        self.assertEqual(merge_documents([doc(0)], []), [])
+        self.assertEqual(merge_execution_outputs([output(0)], []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
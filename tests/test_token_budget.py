@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from service import token_budget
+from service.token_budget import acall_with_split, call_with_split, estimate_tokens, input_budget, pack_by_budget, split_content
+
+
+class ContextOverflow(Exception):
+    code = "context_length_exceeded"
+
+
+def payroll_table(rows: int) -> str:
+    lines = ["Row 1,Employee ID,Department,Gross Pay,Net Pay"]
+    lines += [f"Row {i},E{i:05d},Operations,{1000 + i}.00,{800 + i}.00" for i in range(2, rows + 2)]
+    return "\n".join(lines)
+
+
+def halves(items: list) -> list:
+    half = len(items) // 2
+    return [items[:half], items[half:]] if len(items) > 1 else [items]
+
+
+# Estimates fall back to 4 characters per token, so the tests do not depend on downloading a tokenizer
+@mock.patch.object(token_budget, "encoding_for", lambda model_name: None)
+class InputBudgetTest(unittest.TestCase):
+    @mock.patch.object(token_budget, "MODEL_CONTEXT_TOKENS", 0)
+    @mock.patch.object(token_budget, "MODEL_OUTPUT_RESERVE_TOKENS", 25000)
+    @mock.patch.object(token_budget, "TOKEN_BUDGET_MARGIN", 0.9)
+    def test_reserve_is_capped_for_small_windows(self):
+        self.assertEqual(input_budget("gpt-4o"), int((128000 - 25000) * 0.9))
+        self.assertEqual(input_budget("gpt-4-0613"), int((8192 - 2048) * 0.9))
+        self.assertEqual(input_budget("gpt-3.5-turbo"), int((16385 - 4096) * 0.9))
+
+    @mock.patch.object(token_budget, "MODEL_CONTEXT_TOKENS", 1)
+    def test_no_budget_is_an_error(self):
+        with self.assertRaises(ValueError):
+            input_budget("gpt-4o")
+
+    def test_pack_by_budget(self):
+        # Each item goes to the first pack with room; one larger than the budget is packed alone
+        self.assertEqual(pack_by_budget(["a", "b", "c", "d"], [6, 5, 4, 20], 10), [["a", "c"], ["b"], ["d"]])
+
+    def test_tables_are_split_on_rows_with_the_header_repeated(self):
+        content = payroll_table(1000)
+        parts = split_content(content, 2000, "gpt-4o")
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            self.assertTrue(part.startswith("Row 1,Employee ID"))
+            self.assertLessEqual(estimate_tokens(part, "gpt-4o"), 2000)
+        self.assertIn("Row 1001,", parts[-1])
+
+    def test_text_is_split_on_lines(self):
+        content = "\n".join(f"Control {i} is reviewed quarterly by the finance team." for i in range(500))
+        parts = split_content(content, 500, "gpt-4o")
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(estimate_tokens(part, "gpt-4o") <= 500 for part in parts))
+        self.assertEqual(split_content("short", 500, "gpt-4o"), ["short"])
+
+
+class CallWithSplitTest(unittest.TestCase):
+    def run_call(self, items: list) -> list:
+        if len(items) > 2:
+            raise ContextOverflow("This model's maximum context length is 8192 tokens")
+        return items
+
+    def test_overflowing_calls_are_split_until_they_fit(self):
+        self.assertEqual(call_with_split(self.run_call, list(range(7)), halves), [[0], [1, 2], [3, 4], [5, 6]])
+
+    def test_other_errors_are_raised(self):
+        def fail(items):
+            raise RuntimeError("rate limited")
+
+        with self.assertRaises(RuntimeError):
+            call_with_split(fail, [1, 2, 3], halves)
+
+    def test_unsplittable_input_is_raised(self):
+        with self.assertRaises(ContextOverflow):
+            call_with_split(lambda items: self.run_call(items * 3), [1], halves)
+
+    def test_async_split_matches_sync(self):
+        async def run(items):
+            return self.run_call(items)
+
+        self.assertEqual(asyncio.run(acall_with_split(run, list(range(7)), halves)), [[0], [1, 2], [3, 4], [5, 6]])
+
+
+if __name__ == "__main__":
+    unittest.main()
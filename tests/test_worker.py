@@ -0,0 +1,64 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+# The model clients are created at import time; they are never called here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MODEL_NAME", "gpt-4o")
+
+from service import worker
+
+JOB = {"id": "job-1", "thread_id": "job-1", "data_path": "data/a", "tasks": ["Check overtime"], "attempts": 1, "started_at": 0.0}
+
+
+def audit_events(*args, **kwargs):
+    yield {"event": "progress", "stage": "parse", "done": 1, "total": 1}
+    yield {"event": "result", "result": {"success": True}}
+
+
+class FlakyStore:
+    def __init__(self, jobs: list, fail_finish: bool = False):
+        self.jobs = list(jobs)
+        self.fail_finish = fail_finish
+        self.finished = []
+        self.claimed = threading.Event()
+
+    def claim(self, worker_id: str):
+        if not self.jobs:
+            self.claimed.set()
+            return None
+        return dict(self.jobs.pop(0))
+
+    def record_event(self, job_id: str, event: dict):
+        raise ConnectionError("job store unavailable")
+
+    def finish(self, job_id: str, result: dict, worker_id: str) -> bool:
+        if self.fail_finish:
+            self.fail_finish = False
+            raise ConnectionError("job store unavailable")
+        self.finished.append((job_id, result))
+        return True
+
+
+@mock.patch.object(worker, "stream", audit_events)
+class WorkerTest(unittest.TestCase):
+    def test_failed_progress_updates_do_not_fail_the_audit(self):
+        store = FlakyStore([])
+        worker.run_job(store, JOB, "worker-1")
+        self.assertEqual(store.finished, [("job-1", {"success": True})])
+
+    def test_workers_keep_polling_after_a_store_error(self):
+        store = FlakyStore([JOB, {**JOB, "id": "job-2", "thread_id": "job-2"}], fail_finish=True)
+        pool = worker.JobWorkerPool(store, workers=1, poll_seconds=0.01, heartbeat_seconds=60)
+        pool.start()
+        try:
+            self.assertTrue(store.claimed.wait(5))
+        finally:
+            pool.stop(timeout=5)
+        # The first result was lost to the store error, and the same thread went on to run the second job
+        self.assertEqual(store.finished, [("job-2", {"success": True})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,7 +10,8 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 try:
-    from service.graph import invoke
+    from service.jobs import job_store, JOB_FINISHED_STATUSES
+    from service.worker import ensure_local_workers, JOB_POLL_SECONDS
 except ImportError as e:
     st.error(f"❌ Import Error: {e}")
     st.error("Please ensure the service module is properly installed")
@@ -24,7 +25,8 @@ from ui.components import (
     render_file_upload, 
     render_tasks_input,
     render_execution_section,
-    render_execution_results
+    render_execution_results,
+    render_job_progress
 )
 from ui.utils import create_uuid_folder, save_uploaded_file, setup_data_directory
 
@@ -38,6 +40,8 @@ def initialize_session_state():
         st.session_state.current_uuid = None
     if 'execution_in_progress' not in st.session_state:
         st.session_state.execution_in_progress = False
+    if 'current_job' not in st.session_state:
+        st.session_state.current_job = None
 
 
 def configure_page():
@@ -112,70 +116,17 @@ def handle_execution(tasks_input):
                         st.session_state.execution_in_progress = True
                         logger.info("⚡ Execution started - setting progress flag")
                         
-                        with st.spinner("🔄 Executing audit... This may take a few minutes"):
-                            progress_bar = st.progress(0)
-                            status_text = st.empty()
-                            
-                            progress_bar.progress(20)
-                            status_text.text("🔍 Analyzing uploaded files...")
-                            logger.info("🔍 Progress: 20% - Starting file analysis")
-                            
-                            start_time = time.time()
-                            
-                            data_path = f"data/{st.session_state.current_uuid}"
-                            logger.info(f"📁 Execution data path: {data_path}")
-                            
-                            try:
-                                progress_bar.progress(40)
-                                status_text.text("🧠 Processing with AI...")
-                                logger.info("🧠 Progress: 40% - Starting AI processing")
-                                
-                                logger.info("🎬 Calling invoke function with parameters:")
-                                logger.info(f"   🆔 Thread ID: {st.session_state.current_uuid}")
-                                logger.info(f"   📁 Data path: {data_path}")
-                                logger.info(f"   📝 Tasks count: {len(tasks)}")
-                                
-                                result = invoke(
-                                    thread_id=st.session_state.current_uuid,
-                                    data_path=data_path,
-                                    tasks=tasks
-                                )
-                                
-                                progress_bar.progress(100)
-                                execution_time = time.time() - start_time
-                                logger.info(f"⏱️ Streamlit execution completed in {execution_time:.2f} seconds")
-                                
-                                st.session_state.execution_results = {
-                                    **result,
-                                    "execution_time": execution_time,
-                                    "timestamp": time.time()
-                                }
-                                
-                                if result.get("success", False):
-                                    logger.info("✅ Audit execution successful!")
-                                    logger.info(f"📊 Documents processed: {result.get('documents_processed', 0)}")
-                                    logger.info(f"🎯 Tasks completed: {result.get('tasks_count', 0)}")
-                                else:
-                                    logger.error(f"❌ Audit execution failed: {result.get('error', 'Unknown error')}")
-                                
-                                status_text.text("✅ Audit completed successfully!")
-                                time.sleep(1)
-                                
-                            except Exception as e:
-                                execution_time = time.time() - start_time
-                                logger.error(f"💥 Streamlit execution error after {execution_time:.2f}s: {str(e)}")
-                                st.error(f"❌ Error during execution: {str(e)}")
-                                result = {
-                                    "success": False,
-                                    "error": str(e),
-                                    "execution_time": execution_time
-                                }
-                                st.session_state.execution_results = result
-                            
-                            finally:
-                                st.session_state.execution_in_progress = False
-                                logger.info("🏁 Execution completed - clearing progress flag")
-                                st.rerun()
+                        data_path = f"data/{st.session_state.current_uuid}"
+                        logger.info(f"📁 Execution data path: {data_path}")
+                        
+                        job_id = job_store.submit(data_path=data_path, tasks=tasks)
+                        logger.info(f"📨 Submitted audit job {job_id}")
+                        
+                        # The job ID in the URL lets a refreshed or shared page pick the audit back up
+                        st.session_state.current_job = job_id
+                        st.session_state.execution_results = None
+                        st.query_params["job"] = job_id
+                        st.rerun()
             else:
                 st.info("🚀 AI audit in progress... Intelligence analysis underway!")
         else:
@@ -185,12 +136,43 @@ def handle_execution(tasks_input):
                 st.warning("✨ Define your audit mission to begin the intelligence analysis!")
 
 
+def load_current_job():
+    job_id = st.query_params.get("job") or st.session_state.current_job
+    if not job_id:
+        return None
+
+    job = job_store.get(job_id)
+    if job is None:
+        logger.warning(f"⚠️ Unknown audit job in URL: {job_id}")
+        st.session_state.current_job = None
+        st.query_params.clear()
+        return None
+
+    st.session_state.current_job = job_id
+    if st.session_state.current_uuid is None:
+        st.session_state.current_uuid = os.path.basename(job["data_path"])
+
+    if job["status"] in JOB_FINISHED_STATUSES:
+        st.session_state.execution_in_progress = False
+        if st.session_state.execution_results is None:
+            logger.info(f"📥 Audit job {job_id} finished with status {job['status']}")
+            st.session_state.execution_results = {
+                **(job["result"] or {"success": False, "error": job["error"]}),
+                "timestamp": job["finished_at"]
+            }
+    else:
+        st.session_state.execution_in_progress = True
+    return job
+
+
 def main():
     configure_page()
     initialize_session_state()
     log_app_startup()
     
     setup_data_directory()
+    ensure_local_workers()
+    job = load_current_job()
     
     render_header()
     render_reset_button()
@@ -207,6 +189,9 @@ def main():
     render_execution_section()
     handle_execution(tasks_input)
     
+    if job is not None and st.session_state.execution_in_progress:
+        render_job_progress(job)
+    
     if st.session_state.execution_results:
         logger.info("📊 Displaying audit results to user")
         results = st.session_state.execution_results
@@ -215,6 +200,11 @@ def main():
                    f"Docs={results.get('documents_processed', 0)}")
         
         render_execution_results(results)
+    
+    if st.session_state.execution_in_progress:
+        # Poll the job store until the worker finishes the audit
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 import streamlit as st
 import json
-from ui.utils import format_execution_time
+from ui.utils import format_execution_time, progress_from_event
 from ui.markdown_viewer import render_markdown, render_report_section
 
 
@@ -22,6 +22,7 @@ def render_reset_button():
             if st.session_state.current_uuid:
                 logger.info(f"🗑️ Clearing session: {st.session_state.current_uuid}")
             st.session_state.clear()
+            st.query_params.clear()
             logger.info("✅ Session reset completed")
             st.rerun()
 
@@ -70,6 +71,45 @@ def render_execution_section():
     """, unsafe_allow_html=True)
 
 
+def render_live_task_result(event):
+    status_color = "green" if event['status'] == "PASS" else "red"
+    with st.expander(f"Task {event['task_index'] + 1}: {event['task']} — :{status_color}[{event['status']}]", expanded=False):
+        if event.get('file_name'):
+            st.caption(f"📄 {event['file_name']}")
+        render_markdown(event['output'])
+
+
+def render_job_progress(job):
+    st.markdown(f"**Audit job** `{job['id'][:8]}...` · {job['status']}")
+    if job['status'] == "queued":
+        st.progress(0)
+        st.info("⏳ Waiting for a free audit worker...")
+        return
+
+    # The bar only moves forward, even when stages report out of order
+    percent = 0
+    status = "🔍 Analyzing uploaded files..."
+    for event in (job.get('progress'), job.get('last_node')):
+        progress = progress_from_event(event) if event else None
+        if progress and progress[0] >= percent:
+            percent, status = progress
+    percent = max(percent, st.session_state.get('job_percent', {}).get(job['id'], 0))
+    st.session_state.setdefault('job_percent', {})[job['id']] = percent
+
+    st.progress(percent)
+    st.text(status)
+    if job.get('tokens'):
+        tokens = job['tokens']
+        st.caption(f"🔢 Tokens used so far: {tokens['total_tokens']:,} ({tokens['input_tokens']:,} in, {tokens.get('cached_input_tokens', 0):,} of them cached / {tokens['output_tokens']:,} out)")
+
+    if job['partial_results']:
+        st.markdown("#### ⚡ Live Task Results")
+        # A job resumed by another worker can report a finished task again, so keep one result per task
+        latest = {event['task_index']: event for event in job['partial_results']}
+        for task_index in sorted(latest):
+            render_live_task_result(latest[task_index])
+
+
 def render_execution_results(results):
     st.markdown("""
     <div class="results-section floating">
@@ -2,6 +2,7 @@ import os
 import uuid
 from pathlib import Path
 from ui.logger import logger
+from service.storage import file_store
 
 
 def create_uuid_folder():
@@ -13,15 +14,14 @@ def create_uuid_folder():
 
 
 def save_uploaded_file(uploaded_file, save_path: str):
-    file_path = Path(save_path) / uploaded_file.name
     file_size = uploaded_file.size
     logger.info(f"💾 Saving file: {uploaded_file.name} ({file_size} bytes) to {save_path}")
     
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # The file store puts the file where every audit worker can read it (local/shared disk or Redis)
+    file_path = file_store.put(save_path, uploaded_file.name, bytes(uploaded_file.getbuffer()))
     
     logger.info(f"✅ Successfully saved file: {uploaded_file.name}")
-    return str(file_path)
+    return file_path
 
 
 def format_execution_time(seconds: float) -> str:
@@ -37,6 +37,41 @@ def format_execution_time(seconds: float) -> str:
         return f"{int(hours)}h {int(minutes)}m"
 
 
+# Share of the progress bar each streamed stage fills, as (start, end) percentages
+STAGE_PROGRESS = {
+    "parse": (0, 20, "📄 Parsing files"),
+    "metadata": (20, 45, "🔍 Analyzing files"),
+    "execution": (50, 90, "⚡ Executing tasks"),
+    "report": (90, 99, "📊 Writing report"),
+}
+
+NODE_PROGRESS = {
+    "relevance_to_sox_and_financial_standards": (5, "🧭 Checked audit relevance"),
+    "file_parser": (20, "📄 Files parsed"),
+    "tasks_parser": (5, "📋 Tasks parsed"),
+    "document_to_task_mapper": (50, "🔗 Documents mapped to tasks"),
+    "rule_engine": (50, "🧮 Deterministic checks done"),
+    "reporter": (100, "✅ Report ready"),
+}
+
+
+def progress_from_event(event: dict):
+    """
+    Map a streamed graph event to (percent, status text), or None when it does not move the bar.
+    """
+    if event["event"] == "progress" and event["stage"] in STAGE_PROGRESS:
+        start, end, label = STAGE_PROGRESS[event["stage"]]
+        total = event["total"] or 1
+        percent = start + (end - start) * event["current"] // total
+        item = f" · {event['item']}" if event.get("item") else ""
+        return percent, f"{label} ({event['current']}/{event['total']}){item}"
+
+    if event["event"] == "node" and event["node"] in NODE_PROGRESS:
+        return NODE_PROGRESS[event["node"]]
+
+    return None
+
+
 def setup_data_directory():
     data_dir = Path("data")
     if not data_dir.exists():